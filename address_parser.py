@@ -0,0 +1,338 @@
+import re
+
+from spoken_forms import DIGIT_WORDS, REPEAT_WORDS
+
+# Incremental parser for spoken US street addresses ("one two three main street, san
+# francisco, california, nine four one oh five"). Fragments are fed as the caller says them;
+# each call only looks at the new tokens, the parse state carries over in between.
+
+TEENS = {
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+}
+TENS = {
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+MULTIPLIERS = {"hundred": 100, "thousand": 1000}
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7, "eighth": 8,
+    "ninth": 9, "tenth": 10, "eleventh": 11, "twelfth": 12, "thirteenth": 13, "fourteenth": 14,
+    "fifteenth": 15, "sixteenth": 16, "seventeenth": 17, "eighteenth": 18, "nineteenth": 19,
+    "twentieth": 20, "thirtieth": 30, "fortieth": 40, "fiftieth": 50,
+}
+ORDINAL_REGEX = re.compile(r"^\d+(st|nd|rd|th)$")
+
+STREET_SUFFIXES = {
+    "street": "Street", "st": "Street", "avenue": "Avenue", "ave": "Avenue", "av": "Avenue",
+    "road": "Road", "rd": "Road", "lane": "Lane", "ln": "Lane", "drive": "Drive", "dr": "Drive",
+    "way": "Way", "court": "Court", "ct": "Court", "boulevard": "Boulevard", "blvd": "Boulevard",
+    "place": "Place", "pl": "Place", "terrace": "Terrace", "ter": "Terrace", "circle": "Circle",
+    "cir": "Circle", "parkway": "Parkway", "pkwy": "Parkway", "highway": "Highway", "hwy": "Highway",
+    "square": "Square", "sq": "Square", "trail": "Trail", "trl": "Trail", "plaza": "Plaza", "loop": "Loop",
+    "alley": "Alley",
+}
+UNIT_WORDS = {"apartment": "Apt", "apt": "Apt", "unit": "Unit", "suite": "Suite", "ste": "Suite", "number": "#"}
+
+STATES = {
+    "alabama": "AL", "alaska": "AK", "arizona": "AZ", "arkansas": "AR", "california": "CA", "colorado": "CO",
+    "connecticut": "CT", "delaware": "DE", "district of columbia": "DC", "florida": "FL", "georgia": "GA",
+    "hawaii": "HI", "idaho": "ID", "illinois": "IL", "indiana": "IN", "iowa": "IA", "kansas": "KS",
+    "kentucky": "KY", "louisiana": "LA", "maine": "ME", "maryland": "MD", "massachusetts": "MA",
+    "michigan": "MI", "minnesota": "MN", "mississippi": "MS", "missouri": "MO", "montana": "MT",
+    "nebraska": "NE", "nevada": "NV", "new hampshire": "NH", "new jersey": "NJ", "new mexico": "NM",
+    "new york": "NY", "north carolina": "NC", "north dakota": "ND", "ohio": "OH", "oklahoma": "OK",
+    "oregon": "OR", "pennsylvania": "PA", "rhode island": "RI", "south carolina": "SC", "south dakota": "SD",
+    "tennessee": "TN", "texas": "TX", "utah": "UT", "vermont": "VT", "virginia": "VA", "washington": "WA",
+    "west virginia": "WV", "wisconsin": "WI", "wyoming": "WY",
+    # Spelled out by the transcriber
+    "d c": "DC",
+}
+STATE_CODES = {code.lower(): code for code in STATES.values()}
+# Codes that are also everyday words only count when transcribed in capitals ("Portland, OR")
+AMBIGUOUS_STATE_CODES = {"in", "me", "or", "oh", "hi", "ok", "de", "pa", "co", "al", "ma", "la", "id", "wa"}
+# Longest state name in words ("district of columbia")
+MAX_STATE_WORDS = 3
+
+LEAD_IN_WORDS = {
+    "my", "address", "is", "it's", "its", "it", "i", "live", "at", "the", "we're", "we", "are", "on", "so",
+}
+# Before the city only: "main street in san francisco"
+CITY_LEAD_IN_WORDS = {"in", "at"}
+FILLER_WORDS = {"um", "uh", "uhh", "umm", "er", "like", "comma", "zip", "code", "zipcode", "and"}
+
+TOKEN_REGEX = re.compile(r"[A-Za-z0-9']+(?:-[A-Za-z0-9']+)*|#")
+
+# Weight of each component in the confidence score, summing to 1
+COMPONENT_WEIGHTS = {"number": 0.2, "street": 0.15, "suffix": 0.15, "city": 0.15, "state": 0.15, "zip": 0.2}
+# Subtracted for every token the grammar couldn't place
+UNPLACED_PENALTY = 0.1
+
+
+def _number_kind(word: str):
+    if word.isdigit():
+        return "digits"
+    if word in DIGIT_WORDS and word != "o":
+        return "unit"
+    if word in TEENS:
+        return "teen"
+    if word in TENS:
+        return "tens"
+    if word in MULTIPLIERS:
+        return "multiplier"
+    if word in REPEAT_WORDS:
+        return "repeat"
+    return None
+
+
+def spoken_number(words: list) -> str:
+    """
+    Number words as said in addresses -> digits. Digits and pairs are concatenated the way
+    house numbers and ZIPs are read: "one two three" -> "123", "fourteen fifty" -> "1450",
+    "nine four one oh five" -> "94105", "four hundred five" -> "405".
+    """
+    # Each group is [value, largest value that can still be added to it]
+    groups = []
+    repeat = 1
+    for word in words:
+        kind = _number_kind(word)
+        last = groups[-1] if groups else None
+        if kind == "digits":
+            groups.append([word, 0])
+        elif kind == "unit":
+            value = int(DIGIT_WORDS[word])
+            if last and last[1] >= 9 and value:
+                last[0], last[1] = str(int(last[0]) + value), 0
+            else:
+                groups.extend([str(value), 0] for _ in range(repeat))
+        elif kind == "teen":
+            if last and last[1] >= 19:
+                last[0], last[1] = str(int(last[0]) + TEENS[word]), 0
+            else:
+                groups.append([str(TEENS[word]), 0])
+        elif kind == "tens":
+            if last and last[1] >= 99:
+                last[0], last[1] = str(int(last[0]) + TENS[word]), 9
+            else:
+                groups.append([str(TENS[word]), 9])
+        elif kind == "multiplier":
+            multiplier = MULTIPLIERS[word]
+            if last:
+                last[0], last[1] = str(int(last[0]) * multiplier), multiplier - 1
+            else:
+                groups.append([str(multiplier), multiplier - 1])
+        repeat = REPEAT_WORDS.get(word, 1)
+    return "".join(value for value, _ in groups)
+
+
+def _ordinal(number: int) -> str:
+    suffix = "th" if 10 <= number % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return f"{number}{suffix}"
+
+
+class AddressParser:
+    """
+    Left-to-right parse of [lead-in] number street suffix [unit] city state zip. feed() is
+    O(new tokens) and `confidence` is kept up to date, so callers can decide after every
+    fragment whether the address is done and whether it still needs the LLM to clean it up.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.phase = "lead_in"
+        self.number_words = []
+        self.street_words = []
+        self.suffix = None
+        self.unit_label = None
+        self.unit_words = []
+        self.city_words = []
+        self.state = None
+        self.zip_words = []
+        self.unplaced = 0
+        self.word_count = 0
+
+    def feed(self, fragment: str) -> "AddressParser":
+        for token in TOKEN_REGEX.findall(fragment):
+            for part in token.split("-"):
+                if part:
+                    self._token(part)
+        return self
+
+    def _token(self, raw: str):
+        word = raw.lower()
+        self.word_count += 1
+        if word in FILLER_WORDS:
+            return
+        getattr(self, f"_in_{self.phase}")(word, raw)
+
+    def _in_lead_in(self, word: str, raw: str):
+        if _number_kind(word):
+            self.phase = "number"
+            self.number_words.append(word)
+        elif word not in LEAD_IN_WORDS:
+            self.unplaced += 1
+
+    def _in_number(self, word: str, raw: str):
+        if _number_kind(word):
+            self.number_words.append(word)
+            return
+        self.phase = "street"
+        if word in ORDINALS and self.number_words and self.number_words[-1] in TENS and len(self.number_words) > 1:
+            # "one two three forty second street": the tens word starts the street name
+            tens = self.number_words.pop()
+            self.street_words.append(_ordinal(TENS[tens] + ORDINALS[word]))
+            return
+        self._in_street(word, raw)
+
+    def _in_street(self, word: str, raw: str):
+        if word.isdigit() and len(word) in (5, 9) and self.street_words:
+            # A ZIP before any suffix ("500 Broadway, Portland, OR 97205"): leave it to the LLM
+            self.zip_words.append(word)
+            self.phase = "done"
+        elif word in STREET_SUFFIXES and self.street_words:
+            self.suffix = STREET_SUFFIXES[word]
+            self.phase = "after_street"
+        elif word in ORDINALS and self.street_words and self.street_words[-1].lower() in TENS:
+            # "west fifty seventh street"
+            tens = self.street_words.pop().lower()
+            self.street_words.append(_ordinal(TENS[tens] + ORDINALS[word]))
+        elif word in ORDINALS:
+            self.street_words.append(_ordinal(ORDINALS[word]))
+        elif ORDINAL_REGEX.match(word):
+            self.street_words.append(word)
+        else:
+            self.street_words.append(word.capitalize())
+
+    def _in_after_street(self, word: str, raw: str):
+        if word in UNIT_WORDS or word == "#":
+            self.unit_label = UNIT_WORDS.get(word, "#")
+            self.phase = "unit"
+        elif word in STREET_SUFFIXES and not self.city_words:
+            # "court street": the first suffix was part of the name
+            self.street_words.append(self.suffix)
+            self.suffix = STREET_SUFFIXES[word]
+        else:
+            self.phase = "city"
+            self._in_city(word, raw)
+
+    def _in_unit(self, word: str, raw: str):
+        if _number_kind(word) or (len(word) == 1 and word.isalpha()) or (word.isalnum() and any(c.isdigit() for c in word)):
+            self.unit_words.append(word)
+        elif self.unit_words:
+            self.phase = "city"
+            self._in_city(word, raw)
+        else:
+            self.unplaced += 1
+
+    def _in_city(self, word: str, raw: str):
+        if _number_kind(word) and self.city_words:
+            # ZIP without a state
+            self.phase = "zip"
+            self._in_zip(word, raw)
+            return
+        if not self.city_words and word in CITY_LEAD_IN_WORDS:
+            return
+        # The state may be several words long: check the last few words of the city
+        candidates = self.city_words + [word]
+        for size in range(min(MAX_STATE_WORDS, len(candidates) - 1), 0, -1):
+            name = " ".join(candidates[-size:])
+            if name in STATES:
+                del self.city_words[len(self.city_words) - size + 1:]
+                self.state = STATES[name]
+                self.phase = "zip"
+                return
+        if self.city_words and word in STATE_CODES and (word not in AMBIGUOUS_STATE_CODES or raw.isupper()):
+            self.state = STATE_CODES[word]
+            self.phase = "zip"
+            return
+        self.city_words.append(word)
+
+    def _in_zip(self, word: str, raw: str):
+        if _number_kind(word) and len(spoken_number(self.zip_words)) < 9:
+            self.zip_words.append(word)
+            return
+        if self.zip_words:
+            # Anything after the ZIP ends the address
+            self.phase = "done"
+        self.unplaced += 1
+
+    def _in_done(self, word: str, raw: str):
+        self.unplaced += 1
+
+    @property
+    def number(self) -> str:
+        return spoken_number(self.number_words)
+
+    @property
+    def zip_code(self) -> str:
+        digits = spoken_number(self.zip_words)
+        if len(digits) == 9:
+            return f"{digits[:5]}-{digits[5:]}"
+        return digits if len(digits) == 5 else ""
+
+    @property
+    def street(self) -> str:
+        return " ".join(self.street_words)
+
+    @property
+    def unit(self) -> str:
+        if not self.unit_label or not self.unit_words:
+            return ""
+        value = spoken_number([w for w in self.unit_words if _number_kind(w)])
+        value += "".join(w.upper() for w in self.unit_words if not _number_kind(w))
+        return f"{self.unit_label} {value}" if self.unit_label != "#" else f"# {value}"
+
+    @property
+    def city(self) -> str:
+        return " ".join(word.capitalize() for word in self.city_words)
+
+    def components(self) -> dict:
+        return {
+            "number": self.number,
+            "street": self.street,
+            "suffix": self.suffix or "",
+            "unit": self.unit,
+            "city": self.city,
+            "state": self.state or "",
+            "zip": self.zip_code,
+        }
+
+    def address(self) -> dict:
+        """The parse in validators.extract_address's shape."""
+        address = {
+            "street": f"{self.number} {self.street} {self.suffix or ''}".strip(),
+            "unit": self.unit,
+            "city": self.city,
+            "state": self.state or "",
+            "zip": self.zip_code,
+        }
+        address["missing_fields"] = [field for field in ("street", "city", "state", "zip") if not address[field]]
+        return address
+
+    @property
+    def confidence(self) -> float:
+        components = self.components()
+        score = sum(weight for name, weight in COMPONENT_WEIGHTS.items() if components[name])
+        return max(0.0, round(score - UNPLACED_PENALTY * self.unplaced, 2))
+
+    @property
+    def complete(self) -> bool:
+        """Every component of a deliverable address was heard."""
+        components = self.components()
+        return all(components[name] for name in COMPONENT_WEIGHTS)
+
+    @property
+    def looks_complete(self) -> bool:
+        """
+        The caller got to the end of an address (the ZIP, or something that ends the parse)
+        but the parse isn't confident: hand the buffer to the LLM for cleanup.
+        """
+        return bool(self.number and self.street and (self.zip_code or self.phase == "done"))
+
+    def format(self) -> str:
+        """'123 Main Street Apt 4B, San Francisco, CA 94105'"""
+        line = f"{self.number} {self.street} {self.suffix}"
+        if self.unit:
+            line += f" {self.unit}"
+        return f"{line}, {self.city}, {self.state or ''} {self.zip_code}".strip()
@@ -0,0 +1,142 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+
+from config import config
+from resilience import bounded, get_breaker, timeout_for
+
+STREET_SUFFIXES = {
+    "street": "st", "avenue": "ave", "road": "rd", "lane": "ln", "drive": "dr",
+    "court": "ct", "boulevard": "blvd", "place": "pl", "terrace": "ter", "highway": "hwy",
+}
+PUNCTUATION_REGEX = re.compile(r"[^\w\s]")
+
+
+class AddressVerificationError(Exception):
+    """SmartyStreets could not be reached or answered with an error; nothing was cached."""
+
+
+def normalize_address_key(street: str, city: str, state: str, zip_code: str = None) -> tuple:
+    """Lowercase, strip punctuation and abbreviate suffixes so spoken variants of one address share an entry."""
+    def normalize(value):
+        words = PUNCTUATION_REGEX.sub(" ", (value or "").lower()).split()
+        return " ".join(STREET_SUFFIXES.get(word, word) for word in words)
+
+    return normalize(street), normalize(city), normalize(state), normalize(zip_code)[:5]
+
+
+class AddressVerifier:
+    """
+    Async SmartyStreets street-address lookup on a pooled httpx client.
+
+    Results are cached by normalized address: found addresses (the candidate list) for
+    positive_ttl seconds, not-found addresses for the shorter negative_ttl. Upstream
+    failures are raised and never cached. Lookups are bounded by the turn deadline and
+    fail fast with CircuitOpenError while the "smartystreets" circuit breaker is open.
+    """
+
+    def __init__(self, auth_id: str, auth_token: str, base_url: str, positive_ttl: float = 86400,
+                 negative_ttl: float = 600, max_entries: int = 10000, timeout: float = 5.0,
+                 max_connections: int = 50):
+        self.auth_id = auth_id
+        self.auth_token = auth_token
+        self.base_url = base_url.rstrip("/")
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout),
+        )
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.upstream_calls = 0
+
+    def _cached(self, key: tuple):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires_at, candidates = entry
+            if expires_at <= time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry
+
+    def _store(self, key: tuple, candidates: list):
+        ttl = self.positive_ttl if candidates else self.negative_ttl
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl, candidates)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def verify(self, street: str, city: str, state: str, zip_code: str = None) -> list:
+        """Candidate list from SmartyStreets; empty if the address doesn't exist."""
+        self.lookups += 1
+        key = normalize_address_key(street, city, state, zip_code)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached[1]
+
+        params = {
+            "street": street,
+            "city": city,
+            "state": state,
+            "auth-id": self.auth_id,
+            "auth-token": self.auth_token,
+        }
+        if zip_code:
+            params["zipcode"] = zip_code
+
+        timeout = timeout_for(self.timeout, "smartystreets")
+        with get_breaker("smartystreets").guard((AddressVerificationError,)):
+            self.upstream_calls += 1
+            try:
+                response = await bounded(
+                    self.http_client.get(f"{self.base_url}/street-address", params=params, timeout=timeout),
+                    "smartystreets",
+                )
+            except httpx.HTTPError as e:
+                raise AddressVerificationError(f"SmartyStreets request failed: {e}") from e
+            if response.status_code != 200:
+                raise AddressVerificationError(f"SmartyStreets returned {response.status_code}")
+
+        candidates = response.json()
+        self._store(key, candidates)
+        return candidates
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "upstream_calls": self.upstream_calls,
+            "calls_saved": self.lookups - self.upstream_calls,
+            "entries": len(self._cache),
+        }
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+
+_address_verifier = None
+
+
+def get_address_verifier() -> AddressVerifier:
+    global _address_verifier
+    if _address_verifier is None:
+        smarty = config.smartystreets
+        _address_verifier = AddressVerifier(
+            smarty.auth_id,
+            smarty.api_key,
+            smarty.base_url,
+            positive_ttl=smarty.positive_ttl,
+            negative_ttl=smarty.negative_ttl,
+            timeout=smarty.timeout,
+        )
+    return _address_verifier
@@ -5,11 +5,20 @@ from livekit.agents import RoomInputOptions
 
 import asyncio
 from speech_services import on_transcript
-from helpers import convert_appointments_to_natural_language, infer_address_with_llm, next_prompt_type
-from file_storage import get_doctors_appointments
+from helpers import next_open_state, stream_appointments_in_natural_language
+from file_storage import format_free_slots, get_free_slots, on_write_transcript
+from config import config
+from conversation import SessionState
+from address_parser import AddressParser
+from spoken_forms import record_fast_path
+from validators import AddressHandoff, extract_address, format_address
+from session_store import get_session_store
+from email_outbox import get_email_outbox
+from transcript_writer import get_transcript_writer
+from metrics import configure_tracing, span, start_metrics_server
+from log import configure_logging, get_logger
 
-
-MAX_RETRIES = 10
+logger = get_logger(__name__)
 
 
 class HealthcareAssistant(Agent):
@@ -40,7 +49,7 @@ class HealthcareAssistant(Agent):
         - check_can_proceed: Returns PROCEED/STOP based on validation
         - check_current_state: Validates you're on the correct step
         - buffer_address_input: Use for address collection only
-        - If PROCEED, continue to next step
+        - If PROCEED, continue with the step it names, callers sometimes answer several questions at once
         - If STOP, repeat current question with helpful guidance
 
         SPECIAL ADDRESS HANDLING:
@@ -59,31 +68,23 @@ class HealthcareAssistant(Agent):
             tools=tools
         )
         
-        self.session_state = {
-            "state": "name", 
-            "last_response_valid": True,
-            "retries": {"name": 0, "insurance_payer": 0, "insurance_id": 0, "address": 0, "topic_of_call": 0, "phone": 0, "email": 0, "schedule_appointment": 0},
-            "patient_name": None,
-            "insurance_payer": None,
-            "insurance_id": None,
-            "address": None,
-            "topic_of_call": None,
-            "phone": None,
-            "email": None,
-            "appointment_data": None,
-            # Add buffering for address
-            "address_buffer": "",
-            "address_buffer_timeout": None,
-        }
+        self.session_state = SessionState()
 
 
 async def entrypoint(ctx: agents.JobContext):
+    # Jobs can run in their own process, which never ran __main__
+    configure_logging()
+    configure_tracing()
+    get_email_outbox().ensure_started()
+    get_transcript_writer().ensure_started()
     await ctx.connect()
+    address_parser = AddressParser()
+    address_handoff = AddressHandoff()
 
     @function_tool
     async def buffer_address_input(user_input: str) -> str:
         """Buffer address input pieces and return the complete address when ready"""
-        print(f"🏠 BUFFER FUNCTION CALLED with input: {user_input}")
+        logger.debug("address fragment received", extra={"chars": len(user_input)})
         
         current_state = assistant.session_state.get("state", "name")
         
@@ -97,29 +98,41 @@ async def entrypoint(ctx: agents.JobContext):
             assistant.session_state["address_buffer"] = user_input
         
         buffered_address = assistant.session_state["address_buffer"]
-        print(f"🏠 Address buffer now contains: {buffered_address}")
-        
-        # Simple heuristic to detect if address seems complete
-        has_number = any(char.isdigit() for char in buffered_address)
-        has_street_words = any(word.lower() in buffered_address.lower() 
-                              for word in ['street', 'st', 'avenue', 'ave', 'road', 'rd', 'lane', 'ln', 'drive', 'dr', 'way', 'court', 'ct'])
-        word_count = len(buffered_address.split())
-        
-        if has_number and has_street_words and word_count >= 4:
-            complete_address = assistant.session_state["address_buffer"]
-            assistant.session_state["address_buffer"] = "" 
+        # Only the new fragment is parsed, the parser keeps its state between fragments
+        address_parser.feed(user_input)
+        logger.debug("address buffer updated", extra={"chars": len(buffered_address), "confidence": address_parser.confidence})
 
-            cleaned_address = await infer_address_with_llm(complete_address)
-            print(f"🏠 Address appears complete: {cleaned_address}")
-            return f"COMPLETE_ADDRESS: {cleaned_address}"
+        if address_parser.confidence >= config.extraction.address_min_confidence:
+            assistant.session_state["address_buffer"] = ""
+            parsed_address = address_parser.format()
+            address_handoff.offer(address_parser.address())
+            address_parser.reset()
+            record_fast_path("address", True)
+            logger.info("address parsed locally")
+            return f"COMPLETE_ADDRESS: {parsed_address}"
+        if address_parser.looks_complete:
+            record_fast_path("address", False)
+            address = await extract_address(buffered_address)
+            address_handoff.offer(address)
+            if address is not None and address["missing_fields"]:
+                # Keep buffering, the caller is asked for the parts that weren't heard
+                return f"PARTIAL_ADDRESS: I have '{format_address(address)}' so far. Please give the {', '.join(address['missing_fields'])}."
+            assistant.session_state["address_buffer"] = ""
+            address_parser.reset()
+            if address is None:
+                return "PARTIAL_ADDRESS: I couldn't understand the address. Please repeat the full address."
+            logger.info("address buffer complete")
+            return f"COMPLETE_ADDRESS: {format_address(address)}"
         else:
+            address_handoff.offer(None)
             return f"PARTIAL_ADDRESS: I have '{buffered_address}' so far. Please continue with the rest of your address."
 
     @function_tool
     async def clear_address_buffer() -> str:
         """Clear the address buffer if needed"""
         assistant.session_state["address_buffer"] = ""
-        print("🏠 Address buffer cleared")
+        address_parser.reset()
+        logger.info("address buffer cleared")
         return "Address buffer cleared."
 
 
@@ -127,25 +140,53 @@ async def entrypoint(ctx: agents.JobContext):
     @function_tool
     async def check_can_proceed() -> bool:
         """Check if the last response was valid and we can proceed to the next step"""
-        print(f"assistant.session_state[\"last_response_valid\"]: {assistant.session_state["last_response_valid"]}")
+        logger.debug("can proceed check", extra={"last_response_valid": assistant.session_state["last_response_valid"]})
         if assistant.session_state["last_response_valid"] == True: 
-            return "PROCEED"
+            # Steps the caller already answered in an earlier utterance are skipped
+            return f"PROCEED: next step is {assistant.session_state['state']}"
         return "STOP"
 
     @function_tool
     async def get_available_appointments() -> str:
         """Get all available appointment slots for the next two weeks"""
         try:
-            print("📅 Fetching available appointments...")
-            doctors_appointments = get_doctors_appointments()
-            appointments_text = convert_appointments_to_natural_language(doctors_appointments)
-            print(f"📋 Available appointments: {appointments_text}")
-            return f"Here are the available appointment times for the next two weeks: {appointments_text}. Which time works best for you?"
-        except Exception as e:
-            print(f"❌ Error getting appointments: {e}")
+            logger.info("fetching available appointments")
+            free_slots = format_free_slots(await asyncio.to_thread(get_free_slots))
+            failed = []
+
+            async def read_out():
+                try:
+                    async for sentence in stream_appointments_in_natural_language(free_slots):
+                        yield sentence
+                except Exception:
+                    failed.append(True)
+                    logger.exception("failed to read out appointments", extra={"call_id": call_id})
+
+            def on_read_out_done(handle):
+                if failed:
+                    session.generate_reply(instructions="Reading out the appointment times failed partway. Apologize and offer to transfer the caller to our scheduling team.")
+                elif handle.interrupted:
+                    logger.info("appointment read-out interrupted", extra={"call_id": call_id})
+
+            # Stream the list straight into TTS so the caller hears the first slots while
+            # the rest is still being generated, instead of waiting for the whole answer.
+            # Not awaited: the speech is queued behind this tool call's own turn, so the
+            # outcome is only known later and a failure is reported with a follow-up reply.
+            session.say(read_out(), allow_interruptions=True).add_done_callback(on_read_out_done)
+            return "The available appointment times for the next two weeks will be read to the caller right after this. Do not list them yourself; once they have been read, ask which time works best."
+        except Exception:
+            logger.exception("failed to get appointments")
             return "I'm having trouble accessing our appointment system. Let me transfer you to our scheduling team."
     # Create assistant with the tools
     assistant = HealthcareAssistant([get_available_appointments, check_can_proceed,buffer_address_input, clear_address_buffer])
+    # A call that was handed over from another worker picks up at its last checkpoint
+    call_id = ctx.room.name
+    session_store = get_session_store()
+    restored_state = await asyncio.to_thread(session_store.load, call_id)
+    if restored_state is not None:
+        assistant.session_state = restored_state
+        address_parser.feed(restored_state.address_buffer)
+        logger.info("resumed call", extra={"call_id": call_id, "session": restored_state.summary()})
     # Add this before creating the session
     try:
         from livekit.plugins import silero
@@ -160,30 +201,47 @@ async def entrypoint(ctx: agents.JobContext):
         vad=vad_model,  # Add this line
     )
 
+    @ctx.room.on("participant_disconnected")
+    def on_caller_disconnected(participant):
+        # The caller hung up: there is nothing left to resume, and the transcript is complete
+        asyncio.create_task(asyncio.to_thread(session_store.delete, call_id))
+        asyncio.create_task(get_transcript_writer().close_session(call_id))
+        logger.info("caller disconnected", extra={"call_id": call_id})
+
     @session.on("conversation_item_added")
     def on_conversation_item(event):
         try:
+            if event.item.text_content:
+                on_write_transcript(f"{event.item.role}: {event.item.text_content}", {"sid": call_id})
             # Only process user messages (not agent messages)
             if event.item.role == "user" and event.item.text_content:
                 user_input = event.item.text_content
-                print(f"👤 User said: {user_input}")
+                logger.debug("user utterance", extra={"call_id": call_id, "chars": len(user_input)})
+                # The buffer tool extracts the address from this utterance, the turn reuses it
+                address_wait = None
+                if assistant.session_state["state"] == "address":
+                    address_wait = address_handoff.expect(config.extraction.address_handoff_wait)
                 
                 async def process_transcript():
                     try:
                         # Call our function that handles the logic extraction on the BE
                         previous_current_state = assistant.session_state["state"]
                         assistant.session_state["last_response_valid"] = False
-                        result, updated_session_state = await on_transcript(user_input, assistant.session_state)
+                        address = await address_wait if address_wait is not None else None
+                        with span("turn", previous_current_state):
+                            result, updated_session_state = await on_transcript(user_input, assistant.session_state, address)
                         assistant.session_state = updated_session_state            
-                        print(f"🔍 Result: {result}")
-                        print(f"📊 State: {assistant.session_state}")
+                        logger.info("turn handled", extra={"call_id": call_id, **result, "session": assistant.session_state.summary()})
                         
                         # If we are ending the call then close the session
                         if result.get("end_call", False):
-                            print("🔚 Call ending")
-                            await session.generate_reply(
-                                instructions="Thank the patient and confirm their appointment has been scheduled. Tell them to check their email for confirmation. End the call politely."
-                            )
+                            logger.info("call ending", extra={"call_id": call_id})
+                            with span("reply_generation", previous_current_state):
+                                await session.generate_reply(
+                                    instructions="Thank the patient and confirm their appointment has been scheduled. Tell them to check their email for confirmation. End the call politely."
+                                )
+                            await asyncio.to_thread(session_store.delete, call_id)
+                            await get_transcript_writer().close_session(call_id)
                             await session.aclose()
 
                         else:
@@ -193,36 +251,45 @@ async def entrypoint(ctx: agents.JobContext):
                             if result.get("retry") == True:
                                 assistant.session_state["last_response_valid"] = False
 
-                                # Need to check if the number of times tried is beyond 3, if so then we need to close the session
-                                # Can only try 3 times to get the right information
-                                if assistant.session_state["retries"][current_state] >= MAX_RETRIES:
-                                    print(f"❌ Max retries exceeded for {current_state}")
+                                # An upstream failed, not the caller: they are asked again without
+                                # spending the step's retry budget
+                                if result.get("degraded"):
+                                    logger.warning("turn degraded, asking again", extra={"call_id": call_id, "state": current_state})
+                                    return
+
+                                # Each step has its own retry budget, once it is spent we close the session
+                                if not assistant.session_state.record_retry(current_state):
+                                    logger.warning("retry budget exhausted", extra={"call_id": call_id, "state": current_state})
                                     assistant.session_state["last_response_valid"] = False
-                                    await session.generate_reply(instructions="I'm having trouble understanding. Give us a call back later when you are in a better place to speak.")
+                                    with span("reply_generation", current_state):
+                                        await session.generate_reply(instructions="I'm having trouble understanding. Give us a call back later when you are in a better place to speak.")
+                                    await asyncio.to_thread(session_store.delete, call_id)
+                                    await get_transcript_writer().close_session(call_id)
                                     await session.aclose()
                                     return
 
-                                retry_count = assistant.session_state["retries"][current_state] + 1
-                                assistant.session_state["retries"][current_state] = retry_count
-                                print(f"❌ Invalid info - Retry {retry_count} for {current_state}")
+                                logger.info("invalid answer", extra={"call_id": call_id, "state": current_state, "retry": assistant.session_state.retries[current_state]})
                             else: 
                                 assistant.session_state["last_response_valid"] = True
-                                assistant.session_state["retries"][current_state] = 0
-                                print(assistant.session_state[assistant.session_state["state"]])
-                                assistant.session_state["state"] = next_prompt_type(current_state)
-                                print(f"✅ Valid info - Reset retries for {current_state}")
+                                assistant.session_state.reset_retries(current_state)
+                                assistant.session_state["state"] = next_open_state(current_state, assistant.session_state)
+                                # The write runs on a thread while the next turn may already change
+                                # the live state, so it checkpoints a copy
+                                checkpoint = SessionState.restore(assistant.session_state.snapshot())
+                                await asyncio.to_thread(session_store.save, call_id, checkpoint)
+                                logger.info("answer accepted", extra={"call_id": call_id, "state": current_state})
                     
                     # If we get an exception then we will just close the session for now
                     except Exception as transcript_error:
                         assistant.session_state["last_response_valid"] = False
-                        print(f"❌ Error processing transcript: {transcript_error}")
+                        logger.exception("failed to process transcript", extra={"call_id": call_id})
                         await session.generate_reply(instructions="I'm experiencing technical difficulties. Let me transfer you to our staff for assistance.")
                         raise transcript_error
 
                 asyncio.create_task(process_transcript())
                     
-        except Exception as e:
-            print(f"❌ Error: {e}")
+        except Exception:
+            logger.exception("failed to handle conversation item")
     
     room_input_options = RoomInputOptions(
     close_on_disconnect=True,
@@ -234,11 +301,18 @@ async def entrypoint(ctx: agents.JobContext):
         room_input_options=room_input_options
     ) 
     # Initial greeting - let the LLM start based on instructions
-    await session.generate_reply(
-        instructions="Start the conversation by greeting the patient and start asking them questions to follow our steps")
+    if restored_state is not None:
+        await session.generate_reply(
+            instructions=f"The call was interrupted. Apologize briefly and continue from step '{restored_state.state}', do not ask for details already given")
+    else:
+        await session.generate_reply(
+            instructions="Start the conversation by greeting the patient and start asking them questions to follow our steps")
 
 
 if __name__ == "__main__":
+    configure_logging()
+    if config.metrics.port:
+        start_metrics_server(config.metrics.port)
     agents.cli.run_app(
         agents.WorkerOptions(
             entrypoint_fnc=entrypoint, 
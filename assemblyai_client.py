@@ -3,37 +3,141 @@ import base64
 import json
 import websockets
 from config import config
+from log import get_logger
 
+logger = get_logger(__name__)
+
+
+# 16-bit mono PCM
+BYTES_PER_SAMPLE = 2
+
+
+class AssemblyAIConnectionError(Exception):
+    pass
 
 
 class AssemblyAIClient:
-    def __init__(self, api_key):
+    """
+    Realtime transcription over one websocket.
+
+    send_audio() copies incoming chunks into fixed-duration frames (AssemblyAI wants 50-1000 ms
+    per message) taken from a small pool of preallocated buffers, and queues them for the send
+    loop. The queue is bounded: when the connection can't keep up, send_audio() waits instead
+    of letting audio pile up in memory. Frames go out as binary messages; with
+    binary_frames=False they use the older base64 JSON envelope. If the send or receive loop
+    dies, the error is re-raised from the next send_audio() call and passed to on_error.
+    """
+
+    def __init__(self, api_key, frame_ms: int = None, max_queued_frames: int = None, binary_frames: bool = None,
+                 on_error=None):
         self.api_key = config.assemblyai.api_key
-        self.uri = "wss://api.assemblyai.com/v2/realtime/ws?sample_rate=16000"
+        self.uri = f"wss://api.assemblyai.com/v2/realtime/ws?sample_rate={config.assemblyai.sample_rate}"
         self.ws = None
         self.transcript_callback = None
+        self.on_error = on_error
+        self.binary_frames = config.assemblyai.binary_frames if binary_frames is None else binary_frames
+        self.frame_bytes = (frame_ms or config.assemblyai.frame_ms) * config.assemblyai.sample_rate * BYTES_PER_SAMPLE // 1000
+        max_queued_frames = max_queued_frames or config.assemblyai.max_queued_frames
+
+        # A buffer is reused only after every frame queued behind it has been sent: at most
+        # max_queued_frames are queued, one is being sent and one is being filled.
+        self._buffers = [bytearray(self.frame_bytes) for _ in range(max_queued_frames + 2)]
+        self._buffer_index = 0
+        self._fill = 0
+        self._queue = asyncio.Queue(maxsize=max_queued_frames)
+        self._tasks = []
+        self._error = None
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.backpressure_waits = 0
 
     def set_callback(self, callback):
         self.transcript_callback = callback
 
-    async def connect(self, on_transcript):
-        self.on_transcript = on_transcript
+    async def connect(self, on_transcript=None):
+        if on_transcript is not None:
+            self.transcript_callback = on_transcript
 
-        self.ws = await websockets.connect(
+        ws = await websockets.connect(
             self.uri,
             additional_headers={"Authorization": self.api_key},
             ping_interval=5,
             ping_timeout=20
         )
-        asyncio.create_task(self._receive_loop())
+        self.attach(ws)
+
+    def attach(self, ws):
+        """Start the send and receive loops on an open websocket."""
+        self.ws = ws
+        self._error = None
+        self._tasks = [
+            asyncio.create_task(self._send_loop()),
+            asyncio.create_task(self._receive_loop()),
+        ]
+        for task in self._tasks:
+            task.add_done_callback(self._loop_done)
+
+    def _loop_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+        error = task.exception()
+        if self._error is None:
+            self._error = error
+            logger.error("AssemblyAI connection failed", exc_info=error)
+            if self.on_error:
+                self.on_error(error)
+        # Unblock a send_audio() that is waiting on a queue nobody drains anymore
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise AssemblyAIConnectionError("AssemblyAI send/receive loop failed") from self._error
+        if self.ws is None:
+            raise AssemblyAIConnectionError("Not connected")
 
     async def send_audio(self, audio_chunk):
-        print("made it to send audio")
-        if self.ws:
-            payload = json.dumps({
-                "audio_data": base64.b64encode(audio_chunk).decode("utf-8")
-            })
-            await self.ws.send(payload)
+        self._raise_if_failed()
+        chunk = memoryview(audio_chunk).cast("B")
+        while chunk:
+            buffer = self._buffers[self._buffer_index]
+            take = min(len(chunk), self.frame_bytes - self._fill)
+            buffer[self._fill:self._fill + take] = chunk[:take]
+            self._fill += take
+            chunk = chunk[take:]
+            if self._fill == self.frame_bytes:
+                await self._enqueue_frame()
+
+    async def _enqueue_frame(self):
+        frame = memoryview(self._buffers[self._buffer_index])[:self._fill]
+        self._buffer_index = (self._buffer_index + 1) % len(self._buffers)
+        self._fill = 0
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put(frame)
+        self._raise_if_failed()
+
+    async def flush(self):
+        """Send the partially filled frame, e.g. at the end of an utterance."""
+        if self._fill:
+            await self._enqueue_frame()
+        await self._queue.join()
+
+    async def _send_loop(self):
+        while True:
+            frame = await self._queue.get()
+            try:
+                if frame is None:
+                    return
+                if self.binary_frames:
+                    await self.ws.send(frame)
+                else:
+                    await self.ws.send(json.dumps({"audio_data": base64.b64encode(frame).decode("ascii")}))
+                self.frames_sent += 1
+                self.bytes_sent += len(frame)
+            finally:
+                self._queue.task_done()
 
     async def _receive_loop(self):
         async for message in self.ws:
@@ -43,11 +147,22 @@ class AssemblyAIClient:
                 if text and self.transcript_callback:
                     await self.transcript_callback(text)
 
+    def stats(self) -> dict:
+        return {
+            "frames_sent": self.frames_sent,
+            "bytes_sent": self.bytes_sent,
+            "queued_frames": self._queue.qsize(),
+            "backpressure_waits": self.backpressure_waits,
+        }
+
     async def terminate(self):
         if self.ws:
-            await self.ws.send(json.dumps({"terminate_session": True}))
+            if self._error is None:
+                await self.flush()
+                await self._queue.put(None)
+                await self._tasks[0]
+                await self.ws.send(json.dumps({"terminate_session": True}))
             await self.ws.close()
+            for task in self._tasks:
+                task.cancel()
             self.ws = None
-    
-
- 
\ No newline at end of file
@@ -0,0 +1,158 @@
+import asyncio
+
+from prometheus_client import Counter, Histogram
+
+from config import config
+
+AUDIO_BUFFER_OVERRUN_BYTES = Counter(
+    "audio_buffer_overrun_bytes", "Audio bytes dropped because a call's buffer was full"
+)
+AUDIO_BUFFER_PEAK_FILL = Histogram(
+    "audio_buffer_peak_fill_ratio", "Highest fill level of a call's audio buffer, as a fraction of its capacity",
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity byte ring between the audio source and the STT uploader.
+
+    read() hands out a memoryview straight into the ring, with no copy. The view stays valid
+    until the next read() or release(). When the ring is full, the drop_oldest policy discards
+    the oldest unread audio so the caller is never delayed. The block policy makes write()
+    wait for the reader instead. Drops are whole samples (`align` bytes).
+    """
+
+    def __init__(self, capacity: int, policy: str = DROP_OLDEST, align: int = 2):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.capacity = capacity - capacity % align
+        self.policy = policy
+        self.align = align
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        # Absolute stream positions: [_tail, _read) is lent to the reader, [_read, _write) is unread
+        self._tail = 0
+        self._read = 0
+        self._write = 0
+        self._lent_bytes = 0
+        self._closed = False
+        self._data_ready = asyncio.Event()
+        self._space_ready = asyncio.Event()
+        self.peak_fill = 0
+        self.overruns = 0
+        self.dropped_bytes = 0
+        self.blocked_writes = 0
+
+    @property
+    def fill(self) -> int:
+        """Unread bytes."""
+        return self._write - self._read
+
+    def _free(self) -> int:
+        return self.capacity - (self._write - self._tail)
+
+    def _copy_in(self, data: memoryview):
+        start = self._write % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        self._view[:len(data) - first] = data[first:]
+        self._write += len(data)
+        self.peak_fill = max(self.peak_fill, self.fill)
+        self._data_ready.set()
+
+    def _drop(self, nbytes: int):
+        self.overruns += 1
+        self.dropped_bytes += nbytes
+        AUDIO_BUFFER_OVERRUN_BYTES.inc(nbytes)
+
+    def write_nowait(self, data) -> int:
+        """drop_oldest write: never waits. Returns how many bytes were dropped to make room."""
+        data = memoryview(data).cast("B")
+        if self._closed:
+            raise ValueError("Audio buffer is closed")
+        dropped = 0
+        shortfall = len(data) - self._free()
+        if shortfall > 0 and not self._lent_bytes:
+            # Skip the oldest unread audio
+            unread = self.fill - self.fill % self.align
+            skip = min(unread, shortfall + (-shortfall) % self.align)
+            self._read += skip
+            self._tail = self._read
+            dropped += skip
+            shortfall = len(data) - self._free()
+        if shortfall > 0:
+            # The reader holds a view (its bytes can't be reused yet) or the chunk is larger
+            # than the ring: keep the newest part of this chunk
+            cut = shortfall + (-shortfall) % self.align
+            data = data[cut:]
+            dropped += cut
+        if dropped:
+            self._drop(dropped)
+        self._copy_in(data)
+        return dropped
+
+    async def write(self, data):
+        if self.policy == DROP_OLDEST:
+            self.write_nowait(data)
+            return
+        data = memoryview(data).cast("B")
+        while data:
+            if self._closed:
+                raise ValueError("Audio buffer is closed")
+            free = self._free()
+            if not free:
+                self.blocked_writes += 1
+                self._space_ready.clear()
+                await self._space_ready.wait()
+                continue
+            self._copy_in(data[:free])
+            data = data[free:]
+
+    def release(self):
+        """Give the last view back to the ring."""
+        self._tail = self._read
+        self._lent_bytes = 0
+        self._space_ready.set()
+
+    async def read(self, max_bytes: int = None):
+        """The next contiguous run of unread audio as a memoryview, or None once closed and drained."""
+        self.release()
+        while not self.fill:
+            if self._closed:
+                return None
+            self._data_ready.clear()
+            await self._data_ready.wait()
+        start = self._read % self.capacity
+        nbytes = min(self.fill, self.capacity - start, max_bytes or self.capacity)
+        self._read += nbytes
+        self._lent_bytes = nbytes
+        return self._view[start:start + nbytes]
+
+    def close(self):
+        """No more audio; the reader drains what is left. Records the call's peak fill."""
+        if not self._closed:
+            self._closed = True
+            AUDIO_BUFFER_PEAK_FILL.observe(self.peak_fill / self.capacity)
+        self._data_ready.set()
+        self._space_ready.set()
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "fill": self.fill,
+            "peak_fill": self.peak_fill,
+            "overruns": self.overruns,
+            "dropped_bytes": self.dropped_bytes,
+            "blocked_writes": self.blocked_writes,
+            "bytes_written": self._write,
+        }
+
+
+def create_audio_buffer() -> AudioRingBuffer:
+    """Per-call buffer sized from AUDIO_BUFFER_MS of 16-bit mono audio at the STT sample rate."""
+    capacity = config.audio.buffer_ms * config.assemblyai.sample_rate * 2 // 1000
+    return AudioRingBuffer(capacity, config.audio.overflow_policy)
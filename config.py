@@ -7,10 +7,16 @@ load_dotenv()
 @dataclass
 class SendGridConfig:
     api_key:str
+    host: str = "https://api.sendgrid.com"
+    timeout: float = 10.0
 @dataclass
 class SmartyStreetsConfig:
     auth_id:str
     api_key:str
+    base_url: str = "https://us-street.api.smartystreets.com"
+    timeout: float = 5.0
+    positive_ttl: float = 86400
+    negative_ttl: float = 600
 
 @dataclass
 class TwilioConfig:
@@ -21,10 +27,100 @@ class TwilioConfig:
 @dataclass
 class AssemblyAIConfig:
     api_key: str
+    sample_rate: int
+    frame_ms: int
+    max_queued_frames: int
+    binary_frames: bool
 
 @dataclass
 class OpenAIConfig:
     api_key: str
+    base_url: str = None
+    request_timeout: float = 30.0
+    connect_timeout: float = 5.0
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    max_retries: int = 2
+
+@dataclass
+class StorageConfig:
+    patient_store: str
+    patient_records_json: str
+    patient_records_db: str
+    session_store: str
+    sessions_db: str
+    session_ttl_seconds: float
+
+@dataclass
+class LLMCacheConfig:
+    enabled: bool
+    max_entries: int
+    ttl_seconds: float
+    disk_path: str
+    disk_max_rows: int
+    disabled_prompt_types: list
+    disk_disabled_prompt_types: list
+
+@dataclass
+class MetricsConfig:
+    port: int
+    otel_enabled: bool
+    quantile_window: int
+
+@dataclass
+class EmailOutboxConfig:
+    db_path: str
+    batch_size: int
+    poll_interval: float
+    max_attempts: int
+    base_backoff: float
+
+@dataclass
+class ExtractionConfig:
+    multi_field: bool
+    address_min_confidence: float
+    address_handoff_wait: float
+
+@dataclass
+class SchedulingConfig:
+    service_address: str
+    timeout: float
+
+@dataclass
+class AudioConfig:
+    buffer_ms: int
+    overflow_policy: str
+
+@dataclass
+class TranscriptConfig:
+    directory: str
+    flush_interval: float
+    max_bytes: int
+    max_age_seconds: float
+    compress: bool
+
+@dataclass
+class LoggingConfig:
+    level: str
+    module_levels: str
+    debug_sample_rate: float
+    redact: bool
+    queue_size: int
+    output: str
+
+@dataclass
+class ModelRoutingConfig:
+    enabled: bool
+    routes: str
+
+@dataclass
+class ResilienceConfig:
+    turn_deadline: float
+    hedge_percentile: float
+    hedge_min_samples: int
+    breaker_failures: int
+    breaker_reset_seconds: float
 
 @dataclass
 class AppConfig:
@@ -32,10 +128,16 @@ class AppConfig:
     audiodir: str = os.getenv("AUDIO_DIR")
     sendgrid: SendGridConfig = field(default_factory=lambda: SendGridConfig(
     api_key=os.getenv("SENDGRID_API_KEY"),
+    host=os.getenv("SENDGRID_HOST", "https://api.sendgrid.com"),
+    timeout=float(os.getenv("SENDGRID_TIMEOUT", "10")),
     ))
     smartystreets: SmartyStreetsConfig = field(default_factory=lambda: SmartyStreetsConfig(
         api_key=os.getenv("SMARTY_STREETS_API_KEY"),
-        auth_id=os.getenv("SMART_STREETS_AUTH_ID")
+        auth_id=os.getenv("SMART_STREETS_AUTH_ID"),
+        base_url=os.getenv("SMARTY_STREETS_BASE_URL", "https://us-street.api.smartystreets.com"),
+        timeout=float(os.getenv("SMARTY_STREETS_TIMEOUT", "5")),
+        positive_ttl=float(os.getenv("SMARTY_STREETS_POSITIVE_TTL", "86400")),
+        negative_ttl=float(os.getenv("SMARTY_STREETS_NEGATIVE_TTL", "600"))
     ))
     twilio: TwilioConfig = field(default_factory=lambda: TwilioConfig(
         sid=os.getenv("TWILIO_ACCOUNT_SID"),
@@ -43,10 +145,102 @@ class AppConfig:
         phone_number=os.getenv("TWILIO_PHONE_NUMBER")
     ))
     openai: OpenAIConfig = field(default_factory=lambda: OpenAIConfig(
-        api_key=os.getenv("OPENAI_API_KEY")
+        api_key=os.getenv("OPENAI_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL"),
+        request_timeout=float(os.getenv("OPENAI_REQUEST_TIMEOUT", "30")),
+        connect_timeout=float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5")),
+        max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30")),
+        max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "2"))
     ))
     assemblyai: AssemblyAIConfig = field(default_factory=lambda: AssemblyAIConfig(
-        api_key=os.getenv("ASSEMBLYAI_API_KEY")
+        api_key=os.getenv("ASSEMBLYAI_API_KEY"),
+        sample_rate=int(os.getenv("ASSEMBLYAI_SAMPLE_RATE", "16000")),
+        frame_ms=int(os.getenv("ASSEMBLYAI_FRAME_MS", "100")),
+        max_queued_frames=int(os.getenv("ASSEMBLYAI_MAX_QUEUED_FRAMES", "20")),
+        binary_frames=os.getenv("ASSEMBLYAI_BINARY_FRAMES", "true").lower() == "true"
+    ))
+    audio: AudioConfig = field(default_factory=lambda: AudioConfig(
+        buffer_ms=int(os.getenv("AUDIO_BUFFER_MS", "2000")),
+        # "drop_oldest" keeps the call live when STT falls behind, "block" never loses audio
+        overflow_policy=os.getenv("AUDIO_OVERFLOW_POLICY", "drop_oldest")
+    ))
+    transcripts: TranscriptConfig = field(default_factory=lambda: TranscriptConfig(
+        directory=os.getenv("TRANSCRIPT_DIR", "transcript"),
+        flush_interval=float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "1")),
+        max_bytes=int(os.getenv("TRANSCRIPT_MAX_BYTES", str(1024 * 1024))),
+        max_age_seconds=float(os.getenv("TRANSCRIPT_MAX_AGE_SECONDS", "3600")),
+        compress=os.getenv("TRANSCRIPT_COMPRESS", "true").lower() == "true"
+    ))
+    model_routing: ModelRoutingConfig = field(default_factory=lambda: ModelRoutingConfig(
+        enabled=os.getenv("LLM_ROUTING", "true").lower() == "true",
+        # Overrides of model_router.DEFAULT_ROUTES, e.g. "phone=gpt-4o-mini:32:3:gpt-4o"
+        routes=os.getenv("LLM_ROUTES", "")
+    ))
+    resilience: ResilienceConfig = field(default_factory=lambda: ResilienceConfig(
+        # Every outbound call in a caller turn has to fit in this many seconds; 0 disables
+        turn_deadline=float(os.getenv("TURN_DEADLINE_SECONDS", "10")),
+        # An LLM request slower than this percentile of its recent latencies is sent again; 0 disables
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+        hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        breaker_failures=int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5")),
+        breaker_reset_seconds=float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+    ))
+    logging: LoggingConfig = field(default_factory=lambda: LoggingConfig(
+        level=os.getenv("LOG_LEVEL", "INFO"),
+        # Per-module overrides, e.g. "file_storage=DEBUG,httpx=WARNING"
+        module_levels=os.getenv("LOG_LEVELS", "httpx=WARNING,httpcore=WARNING"),
+        debug_sample_rate=float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1")),
+        redact=os.getenv("LOG_REDACT_PHI", "true").lower() == "true",
+        queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+        # "stdout" or a file path
+        output=os.getenv("LOG_OUTPUT", "stdout")
+    ))
+    llm_cache: LLMCacheConfig = field(default_factory=lambda: LLMCacheConfig(
+        enabled=os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true",
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048")),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600")),
+        disk_path=os.getenv("LLM_CACHE_DISK_PATH"),
+        disk_max_rows=int(os.getenv("LLM_CACHE_DISK_MAX_ROWS", "100000")),
+        # Scheduling requests resolve relative dates ("tomorrow"), so their answers go stale
+        disabled_prompt_types=[t for t in os.getenv("LLM_CACHE_DISABLED", "scheduling").split(",") if t],
+        # Answers that are patient data stay in process memory and are never written to disk
+        disk_disabled_prompt_types=[t for t in os.getenv(
+            "LLM_CACHE_DISK_DISABLED", "name,phone,email,insurance_id,insurance_payer,address,topic_of_call,multi_field"
+        ).split(",") if t],
+    ))
+    metrics: MetricsConfig = field(default_factory=lambda: MetricsConfig(
+        port=int(os.getenv("METRICS_PORT", "0")),
+        otel_enabled=os.getenv("OTEL_ENABLED", "false").lower() == "true",
+        quantile_window=int(os.getenv("METRICS_QUANTILE_WINDOW", "1024"))
+    ))
+    email_outbox: EmailOutboxConfig = field(default_factory=lambda: EmailOutboxConfig(
+        db_path=os.getenv("EMAIL_OUTBOX_DB", os.path.join("data", "email_outbox.db")),
+        batch_size=int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "20")),
+        poll_interval=float(os.getenv("EMAIL_OUTBOX_POLL_INTERVAL", "1")),
+        max_attempts=int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8")),
+        base_backoff=float(os.getenv("EMAIL_OUTBOX_BASE_BACKOFF", "2"))
+    ))
+    extraction: ExtractionConfig = field(default_factory=lambda: ExtractionConfig(
+        multi_field=os.getenv("MULTI_FIELD_EXTRACTION", "true").lower() == "true",
+        # Spoken addresses parsed locally at or above this confidence skip the LLM cleanup
+        address_min_confidence=float(os.getenv("ADDRESS_MIN_CONFIDENCE", "0.9")),
+        # How long the address step waits for the buffer tool's address before extracting its own
+        address_handoff_wait=float(os.getenv("ADDRESS_HANDOFF_WAIT", "3"))
+    ))
+    scheduling: SchedulingConfig = field(default_factory=lambda: SchedulingConfig(
+        # e.g. "unix:/tmp/schedule.sock" or "tcp:10.0.0.5:7400,tcp:10.0.0.6:7400"; unset reads the files directly
+        service_address=os.getenv("SCHEDULE_SERVICE"),
+        timeout=float(os.getenv("SCHEDULE_SERVICE_TIMEOUT", "5"))
+    ))
+    storage: StorageConfig = field(default_factory=lambda: StorageConfig(
+        patient_store=os.getenv("PATIENT_STORE", "sqlite"),
+        patient_records_json=os.getenv("PATIENT_RECORDS_JSON", os.path.join("data", "patient_records.json")),
+        patient_records_db=os.getenv("PATIENT_RECORDS_DB", os.path.join("data", "patient_records.db")),
+        session_store=os.getenv("SESSION_STORE", "sqlite"),
+        sessions_db=os.getenv("SESSIONS_DB", os.path.join("data", "sessions.db")),
+        session_ttl_seconds=float(os.getenv("SESSION_TTL_SECONDS", "86400"))
     ))
 
 config = AppConfig()
\ No newline at end of file
@@ -0,0 +1,106 @@
+import marshal
+from dataclasses import dataclass, field, fields
+
+# Conversation flow: each step and the step that follows it once its answer is accepted
+TRANSITIONS = {
+    "name": "insurance_payer",
+    "insurance_payer": "insurance_id",
+    "insurance_id": "topic_of_call",
+    "topic_of_call": "address",
+    "address": "phone",
+    "phone": "email",
+    "email": "schedule_appointment",
+    "schedule_appointment": "done",
+}
+INITIAL_STATE = "name"
+
+# How many invalid answers each step tolerates before the call is ended. Steps that go
+# through external verification or negotiation get a bit more room.
+DEFAULT_RETRY_BUDGET = 3
+RETRY_BUDGETS = {
+    "address": 5,
+    "schedule_appointment": 5,
+}
+
+# Bump when the snapshot layout changes; restore() refuses other versions
+SNAPSHOT_VERSION = 1
+
+
+@dataclass(slots=True)
+class SessionState:
+    """
+    Everything the call flow knows about one caller. Slotted so an idle session costs a few
+    hundred bytes, and item access (session_state["phone"]) is kept so the validators,
+    storage and email code can keep treating it like the dict it used to be.
+    """
+    state: str = INITIAL_STATE
+    last_response_valid: bool = True
+    name: dict = None
+    insurance_payer: dict = None
+    insurance_id: str = None
+    topic_of_call: str = None
+    address: dict = None
+    phone: str = None
+    email: str = None
+    appointments: dict = None
+    address_buffer: str = ""
+    retries: dict = field(default_factory=dict)
+    stats: dict = field(default_factory=lambda: {"turns": 0, "llm_calls": 0})
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def setdefault(self, key, default=None):
+        value = self[key]
+        if value is None:
+            self[key] = value = default
+        return value
+
+    def update(self, values: dict):
+        for key, value in values.items():
+            self[key] = value
+
+    def next_state(self) -> str:
+        return TRANSITIONS.get(self.state)
+
+    def retry_budget(self, state: str = None) -> int:
+        return RETRY_BUDGETS.get(state or self.state, DEFAULT_RETRY_BUDGET)
+
+    def record_retry(self, state: str = None) -> bool:
+        """Count an invalid answer for the step; returns False once its retry budget is spent."""
+        state = state or self.state
+        self.retries[state] = self.retries.get(state, 0) + 1
+        return self.retries[state] <= self.retry_budget(state)
+
+    def reset_retries(self, state: str = None):
+        self.retries.pop(state or self.state, None)
+
+    def summary(self) -> str:
+        """One line for the logs, without the caller's personal details."""
+        filled = [f.name for f in fields(self) if f.name in TRANSITIONS and self[f.name]]
+        return f"state={self.state} filled={filled} retries={self.retries} stats={self.stats}"
+
+    def snapshot(self) -> bytes:
+        """Compact binary checkpoint of the session (marshal of the field values in order)."""
+        return bytes([SNAPSHOT_VERSION]) + marshal.dumps(tuple(getattr(self, f.name) for f in fields(self)))
+
+    @classmethod
+    def restore(cls, snapshot: bytes) -> "SessionState":
+        if not snapshot or snapshot[0] != SNAPSHOT_VERSION:
+            raise ValueError("Unsupported session snapshot version")
+        return cls(*marshal.loads(snapshot[1:]))
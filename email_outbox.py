@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+
+import httpx
+from prometheus_client import Gauge, Histogram
+
+from config import config
+from email_service import build_confirmation_email
+from log import get_logger
+from resilience import CircuitOpenError, get_breaker
+
+logger = get_logger(__name__)
+
+EMAIL_OUTBOX_DEPTH = Gauge(
+    "email_outbox_depth", "Confirmation emails waiting to be sent", multiprocess_mode="livemax"
+)
+EMAIL_SEND_SECONDS = Histogram(
+    "email_send_seconds", "SendGrid send latency per message", ["outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16),
+)
+# A message claimed by a sender that died is picked up again after this long
+CLAIM_LEASE_SECONDS = 60
+# Client errors that are worth retrying; any other 4xx means SendGrid won't take this message
+RETRYABLE_STATUSES = {408, 429}
+
+
+class EmailOutbox:
+    """
+    Persisted outbox of confirmation emails, shared by the worker processes through SQLite.
+
+    The in-call path only calls enqueue(); a background task per process claims due
+    messages in batches, sends them concurrently over one pooled SendGrid connection and
+    retries failures with exponential backoff. Messages are deduplicated by appointment id.
+    While the "sendgrid" circuit breaker is open nothing is claimed, and messages it turns
+    away keep their attempt count. A message SendGrid rejects (a 4xx) fails at once without
+    touching the breaker. A sent message's row keeps only its id, for the dedupe: the
+    rendered email holds PHI and is blanked.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outbox (
+            appointment_id TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            created_at REAL NOT NULL,
+            last_error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+    """
+
+    def __init__(self, db_path: str, api_key: str, host: str, batch_size: int = 20, poll_interval: float = 1.0,
+                 max_attempts: int = 8, base_backoff: float = 2.0, max_backoff: float = 300.0, timeout: float = 10.0):
+        self.api_key = api_key
+        self.host = host.rstrip("/")
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(self.SCHEMA)
+        # Rows sent before payloads were blanked on delivery
+        self._conn.execute("UPDATE outbox SET payload = '' WHERE status = 'sent' AND payload != ''")
+        self._wakeup = None
+        self._task = None
+        self._http_client = None
+
+    def enqueue(self, appointment_id: str, payload: dict) -> bool:
+        """Queue a SendGrid mail/send body. Returns False if this appointment was already queued."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (appointment_id, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?)",
+                (appointment_id, json.dumps(payload), now, now),
+            )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        self._update_depth()
+        return cursor.rowcount == 1
+
+    def depth(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')").fetchone()[0]
+
+    def _update_depth(self):
+        EMAIL_OUTBOX_DEPTH.set(self.depth())
+
+    def _claim_batch(self) -> list:
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                """
+                UPDATE outbox SET status = 'sending', next_attempt_at = ?
+                WHERE appointment_id IN (
+                    SELECT appointment_id FROM outbox
+                    WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+                    ORDER BY next_attempt_at LIMIT ?
+                )
+                RETURNING appointment_id, payload, attempts
+                """,
+                (now + CLAIM_LEASE_SECONDS, now, self.batch_size),
+            ).fetchall()
+
+    def _mark_sent(self, appointment_id: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'sent', payload = '', last_error = NULL WHERE appointment_id = ?",
+                (appointment_id,),
+            )
+
+    def _mark_failed(self, appointment_id: str, attempts: int, error: str, permanent: bool = False):
+        if permanent or attempts >= self.max_attempts:
+            status, next_attempt_at = "failed", time.time()
+            logger.error("confirmation email failed permanently", extra={"appointment_id": appointment_id, "error": error})
+        else:
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            status, next_attempt_at = "pending", time.time() + backoff * random.uniform(0.8, 1.2)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE appointment_id = ?",
+                (status, attempts, next_attempt_at, error, appointment_id),
+            )
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(timeout=httpx.Timeout(self.timeout))
+        return self._http_client
+
+    async def _send(self, appointment_id: str, payload: str, attempts: int):
+        start = time.perf_counter()
+        try:
+            with get_breaker("sendgrid").guard((httpx.HTTPError,)):
+                response = await self._client().post(
+                    f"{self.host}/v3/mail/send",
+                    content=payload,
+                    headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+                )
+                if response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+                    raise httpx.HTTPStatusError(f"SendGrid returned {response.status_code}", request=response.request, response=response)
+        except CircuitOpenError as e:
+            await asyncio.to_thread(self._mark_failed, appointment_id, attempts, str(e))
+            return False
+        except httpx.HTTPError as e:
+            EMAIL_SEND_SECONDS.labels("error").observe(time.perf_counter() - start)
+            await asyncio.to_thread(self._mark_failed, appointment_id, attempts + 1, str(e))
+            return False
+        if response.status_code >= 300:
+            # The same body would be rejected again, and SendGrid itself is healthy
+            EMAIL_SEND_SECONDS.labels("rejected").observe(time.perf_counter() - start)
+            error = f"SendGrid rejected the message with {response.status_code}: {response.text[:200]}"
+            await asyncio.to_thread(self._mark_failed, appointment_id, attempts + 1, error, True)
+            return False
+        EMAIL_SEND_SECONDS.labels("sent").observe(time.perf_counter() - start)
+        await asyncio.to_thread(self._mark_sent, appointment_id)
+        return True
+
+    async def send_due(self) -> int:
+        """Send one batch of due messages; returns how many were claimed."""
+        if get_breaker("sendgrid").is_open:
+            return 0
+        batch = await asyncio.to_thread(self._claim_batch)
+        if batch:
+            await asyncio.gather(*(self._send(*row) for row in batch))
+        await asyncio.to_thread(self._update_depth)
+        return len(batch)
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                if await self.send_due() == self.batch_size:
+                    continue
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.aclose()
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+
+    def ensure_started(self):
+        """Start the background sender on the running loop, once per process."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        with self._lock:
+            self._conn.close()
+
+
+_email_outbox = None
+
+
+def get_email_outbox() -> EmailOutbox:
+    global _email_outbox
+    if _email_outbox is None:
+        outbox_config = config.email_outbox
+        _email_outbox = EmailOutbox(
+            outbox_config.db_path,
+            config.sendgrid.api_key,
+            config.sendgrid.host,
+            batch_size=outbox_config.batch_size,
+            poll_interval=outbox_config.poll_interval,
+            max_attempts=outbox_config.max_attempts,
+            base_backoff=outbox_config.base_backoff,
+            timeout=config.sendgrid.timeout,
+        )
+    return _email_outbox
+
+
+def enqueue_confirmation_email(session_state: dict) -> bool:
+    """In-call path: render and persist the confirmation email; sending happens in the background."""
+    payload = build_confirmation_email(session_state).get()
+    appointment_id = session_state["appointments"].get("id") or hashlib.sha256(
+        json.dumps(payload, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return get_email_outbox().enqueue(appointment_id, payload)
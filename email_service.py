@@ -1,11 +1,14 @@
 from datetime import datetime
-import os
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
+from config import config
+from log import get_logger
+from resilience import get_breaker
 
+logger = get_logger(__name__)
 
-def send_confirmation_email_html(session_state:dict):
-    print(session_state['appointments'])
+
+def build_confirmation_email(session_state:dict) -> Mail:
     start_dt = datetime.fromisoformat(session_state['appointments']['start'])
     end_dt = datetime.fromisoformat(session_state['appointments']['end'])
     formatted_start_time = start_dt.strftime("%B %d, %Y at %I:%M %p")
@@ -68,17 +71,23 @@ def send_confirmation_email_html(session_state:dict):
                         </html>
                         """
 
-    message = Mail(
+    return Mail(
         from_email='racheltaskale@gmail.com',
         to_emails=session_state["email"],
         subject=f"Your Appointment with Dr. {latest_appointment_scheduled['doctor_name'].capitalize()} is Confirmed!",
         html_content=html_content
     )
 
+
+def send_confirmation_email_html(session_state:dict):
+    message = build_confirmation_email(session_state)
     try:
-        sg = SendGridAPIClient(os.environ['SENDGRID_API_KEY'])
-        response = sg.send(message)
-        print(f"Email sent: {response.status_code}")
-    except Exception as e:
-        print(f"Email failed: {e}")
+        sg = SendGridAPIClient(config.sendgrid.api_key, host=config.sendgrid.host)
+        # SendGridAPIClient has no timeout option, its http client does
+        sg.client.timeout = config.sendgrid.timeout
+        with get_breaker("sendgrid").guard():
+            response = sg.send(message)
+        logger.info("email sent", extra={"status_code": response.status_code})
+    except Exception:
+        logger.exception("email failed")
 
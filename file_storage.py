@@ -1,11 +1,32 @@
+import asyncio
+import fcntl
 import json
 import os
-from datetime import datetime
+import tempfile
+import threading
+import weakref
+from contextlib import contextmanager
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from operator import itemgetter
 import uuid
 
+from record_store import get_record_store
+from schedule_client import get_schedule_client
+from transcript_writer import get_transcript_writer
+from log import get_logger
+
+logger = get_logger(__name__)
+
 
-PATIENT_RECORDS_FILE = os.path.join("data", "patient_records.json")
 DOCTORS_APPOINTMENTS_FILE = os.path.join("data", "doctors_appointments.json")
+SCHEDULE_DIR = os.path.join("data", "schedule")
+
+# Clinic working hours (EST). Schedule files store naive local times, so every
+# datetime handled by the slot engine below is naive clinic-local time as well.
+WORKING_HOURS_START = time(9, 0)
+WORKING_HOURS_END = time(17, 0)
+BOOKING_WINDOW_DAYS = 14
 # Patient Record Data
 # "firstname#lastname" : {
 #   "insurance_payer": string,
@@ -36,7 +57,6 @@ DOCTORS_APPOINTMENTS_FILE = os.path.join("data", "doctors_appointments.json")
 #   }
 
 def write_patient_record(data: dict):
-    print("write_patient_record")
     key = f"{data['name']['last_name']}#{data['name']['first_name']}"
     new_appointment = data['appointments']
 
@@ -51,45 +71,113 @@ def write_patient_record(data: dict):
         'appointments': [new_appointment]
     }
 
-    # Load existing records or initialize
-    if os.path.exists(PATIENT_RECORDS_FILE):
-        with open(PATIENT_RECORDS_FILE, 'r') as f:
-            try:
-                records = json.load(f)
-            except json.JSONDecodeError:
-                print('Warning: Corrupt JSON file, reinitializing.')
-                records = {}
-    else:
-        records = {}
+    return get_record_store().upsert_patient(key, new_value, new_appointment)
+
+
+
+
+class ScheduleCache:
+    """
+    In-process cache of parsed doctor schedules keyed by file path.
+
+    Each entry remembers the (mtime_ns, size) of the file it was parsed from; a lookup
+    only costs an os.stat and the file is re-read only when that signature changes.
+    The derived booked intervals are cached alongside so the slot engine and the
+    conflict check don't rebuild them either. Cached schedules are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._dir_listing = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _signature(self, file_name: str):
+        st = os.stat(file_name)
+        return st.st_mtime_ns, st.st_size
+
+    def _entry(self, file_name: str) -> dict:
+        signature = self._signature(file_name)
+        with self._lock:
+            entry = self._entries.get(file_name)
+            if entry is not None and entry["signature"] == signature:
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        schedule = load_schedule(file_name)
+        entry = {"signature": signature, "schedule": schedule, "booked": get_booked_intervals(schedule)}
+        with self._lock:
+            self._entries[file_name] = entry
+        return entry
+
+    def get_schedule(self, file_name: str) -> dict:
+        return self._entry(file_name)["schedule"]
+
+    def get_booked(self, file_name: str) -> dict:
+        return self._entry(file_name)["booked"]
+
+    def get_booked_version(self, file_name: str) -> tuple:
+        """(signature, booked intervals); the signature changes whenever the file does."""
+        entry = self._entry(file_name)
+        return entry["signature"], entry["booked"]
+
+    def list_files(self, directory_path: str) -> list:
+        """Doctor files in directory_path, re-listed only when the directory itself changes."""
+        dir_mtime = os.stat(directory_path).st_mtime_ns
+        listing = self._dir_listing
+        if listing is not None and listing[0] == (directory_path, dir_mtime):
+            return listing[1]
 
-    if key in records:
-        patient = records[key]
-        for field in ['insurance_payer', 'insurance_id', 'topic_of_call', 'phone', 'email']:
-            patient[field] = new_value[field]
+        file_list = []
+        for root, dirs, files in os.walk(directory_path):
+            for file in files:
+                # Skip lock files and in-flight temp files from add_doctors_appointment
+                if file.endswith(".json") and not file.startswith("."):
+                    file_list.append(os.path.join(root, file))
+        file_list.sort()
+        self._dir_listing = ((directory_path, dir_mtime), file_list)
 
-        # Avoid duplicate appointments
-        if new_appointment not in patient.get('appointments', []):
-            patient['appointments'].append(new_appointment)
-        print(f'Updated patient record for {key}')
-    else:
-        records[key] = new_value
-        print(f"Created new patient record for {key}")
+        # Forget files that were removed from the directory
+        with self._lock:
+            for file_name in list(self._entries):
+                if file_name not in file_list:
+                    del self._entries[file_name]
+        return file_list
 
-    with open(PATIENT_RECORDS_FILE, "w") as f:
-        json.dump(records, f, indent=2)
+    def invalidate(self, file_name: str = None):
+        with self._lock:
+            if file_name is None:
+                self._entries.clear()
+                self._dir_listing = None
+            else:
+                self._entries.pop(file_name, None)
 
-    return True
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
 
 
+schedule_cache = ScheduleCache()
+
+
+def get_schedule_cache_stats() -> dict:
+    return schedule_cache.stats()
+
+
+def get_doctor_schedule_file(doctor_name: str) -> str:
+    return os.path.join(SCHEDULE_DIR, f"{doctor_name}.json")
 
 
 def get_all_doctor_files():
-    directory_path = "./data/schedule"
-    file_list = []
-    for root, dirs, files in os.walk(directory_path):
-        for file in files:
-            file_list.append(os.path.join(root, file))
-    return file_list
+    return schedule_cache.list_files(SCHEDULE_DIR)
 
 
 def get_doctors_appointments():
@@ -97,62 +185,237 @@ def get_doctors_appointments():
     all_doctors_appointments = {}
     for file_name in files:
         try:
-            with open(file_name, "r") as f:
-                data = json.load(f)  
-                all_doctors_appointments[file_name] = data
+            all_doctors_appointments[file_name] = schedule_cache.get_schedule(file_name)
         except Exception as e:
-            print(f"Failed to load {file_name}: {e}")
+            logger.warning("failed to load schedule", extra={"file": file_name, "error": str(e)})
 
-    print(f"all_doctors_appointments: {all_doctors_appointments}")
+    logger.debug("loaded doctor schedules", extra={"doctors": len(all_doctors_appointments)})
     return all_doctors_appointments
 
 def get_doctors_appointments_by_day_and_doctor(input:dict):
-    print("get_doctors_appointments_by_day_and_doctor")
-    filename = f"./data/schedule/{input['doctor_name']}.json"
-    with open(filename, "r") as f:
-        return json.load(f) 
+    return schedule_cache.get_schedule(get_doctor_schedule_file(input['doctor_name']))
 
-async def add_doctors_appointment(data: dict, patient_name: str, reason: str):
-    print(f"add_doctors_appointment: {data}")
 
-    doctor_name = data["doctor_name"]
-    start_ts = data["start"] 
-    end_ts = data["end"]     
+def get_booked_intervals_by_doctor(doctor_name: str) -> dict:
+    """Blocking (a socket request in service mode): async callers run it in asyncio.to_thread."""
+    client = get_schedule_client()
+    if client is not None:
+        return client.booked(doctor_name)
+    return schedule_cache.get_booked(get_doctor_schedule_file(doctor_name))
 
-    start_dt = datetime.fromisoformat(start_ts)
-    end_dt = datetime.fromisoformat(end_ts)
 
-    date_str = start_dt.date().isoformat()          
-    start_time = start_dt.strftime("%H:%M")         
-    end_time = end_dt.strftime("%H:%M")             
+def load_schedule(file_name: str) -> dict:
+    """Load one doctor's schedule file, treating an empty file as an empty schedule."""
+    with open(file_name, "r") as f:
+        content = f.read()
+    if not content.strip():
+        return {}
+    return json.loads(content)
 
-    new_uuid = str(uuid.uuid4())
 
-    url_path = f"data/schedule/{doctor_name}.json"
-    if not os.path.exists(url_path):
-        raise FileNotFoundError(f"No schedule found for {doctor_name}")
+def doctor_name_from_file(file_name: str) -> str:
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+
+def get_booked_intervals(schedule: dict) -> dict:
+    """
+    Turn a doctor's schedule into {date_str: [(start_dt, end_dt), ...]}.
+    Each day's list is sorted by start and overlapping/touching bookings are merged,
+    so the starts and ends are both strictly increasing (needed by has_conflict).
+    """
+    booked = {}
+    for date_str, slots in schedule.items():
+        day = date.fromisoformat(date_str)
+        intervals = []
+        for slot in slots.values():
+            if slot.get("available"):
+                continue
+            start_dt = datetime.combine(day, time.fromisoformat(slot["start"]))
+            end_dt = datetime.combine(day, time.fromisoformat(slot["end"]))
+            intervals.append((start_dt, end_dt))
+        intervals.sort()
+
+        merged = []
+        for start_dt, end_dt in intervals:
+            if merged and start_dt <= merged[-1][1]:
+                if end_dt > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end_dt)
+            else:
+                merged.append((start_dt, end_dt))
+        if merged:
+            booked[date_str] = merged
+    return booked
+
+
+def has_conflict(booked: list, start_dt: datetime, end_dt: datetime) -> bool:
+    """
+    O(log n) overlap check of [start_dt, end_dt) against a merged, sorted interval list
+    from get_booked_intervals. Only the last booking starting before end_dt can overlap.
+    """
+    idx = bisect_left(booked, end_dt, key=itemgetter(0))
+    return idx > 0 and booked[idx - 1][1] > start_dt
+
+
+def is_within_working_hours(start_dt: datetime, end_dt: datetime) -> bool:
+    return (
+        start_dt.date() == end_dt.date()
+        and WORKING_HOURS_START <= start_dt.time()
+        and end_dt.time() <= WORKING_HOURS_END
+        and start_dt < end_dt
+    )
 
-    with open(url_path, "r") as f:
-        schedule = json.load(f)
 
-    slots = schedule.get(date_str, {})
-    slots[new_uuid] = {
+def compute_free_intervals(booked: dict, start: datetime, days: int = BOOKING_WINDOW_DAYS) -> list:
+    """
+    Free [start, end) intervals inside working hours for `days` days from `start`,
+    given one doctor's booked intervals (output of get_booked_intervals). Sorted.
+    """
+    free = []
+    for offset in range(days):
+        day = start.date() + timedelta(days=offset)
+        cursor = max(datetime.combine(day, WORKING_HOURS_START), start)
+        day_end = datetime.combine(day, WORKING_HOURS_END)
+        for booked_start, booked_end in booked.get(day.isoformat(), []):
+            if booked_end <= cursor:
+                continue
+            if booked_start >= day_end:
+                break
+            if booked_start > cursor:
+                free.append((cursor, booked_start))
+            cursor = max(cursor, booked_end)
+        if cursor < day_end:
+            free.append((cursor, day_end))
+    return free
+
+
+def get_free_slots(start: datetime = None, days: int = BOOKING_WINDOW_DAYS) -> dict:
+    """
+    Free intervals per doctor for the booking window, computed from data/schedule/*.json
+    (or by the scheduling service when SCHEDULE_SERVICE is set).
+    Returns {doctor_name: [(start_dt, end_dt), ...]} with each list sorted. Blocking: async
+    callers run it in asyncio.to_thread.
+    """
+    if start is None:
+        start = datetime.now().replace(second=0, microsecond=0)
+
+    client = get_schedule_client()
+    if client is not None:
+        return client.free_slots(start, days)
+
+    free_slots = {}
+    for file_name in get_all_doctor_files():
+        try:
+            booked = schedule_cache.get_booked(file_name)
+        except Exception as e:
+            logger.warning("failed to load schedule", extra={"file": file_name, "error": str(e)})
+            continue
+        free_slots[doctor_name_from_file(file_name)] = compute_free_intervals(booked, start, days)
+    return dict(sorted(free_slots.items()))
+
+
+def format_free_slots(free_slots: dict) -> str:
+    """Compact, one line per doctor-day listing of free intervals, for the LLM to read out."""
+    lines = []
+    for doctor_name, intervals in free_slots.items():
+        by_day = {}
+        for start_dt, end_dt in intervals:
+            by_day.setdefault(start_dt.date(), []).append(
+                f"{start_dt.strftime('%H:%M')}-{end_dt.strftime('%H:%M')}"
+            )
+        for day, ranges in by_day.items():
+            lines.append(f"Dr. {doctor_name}, {day.strftime('%A %Y-%m-%d')}: {', '.join(ranges)}")
+    return "\n".join(lines)
+
+# Booking locks: one asyncio.Lock per doctor per event loop serializes bookings inside a
+# worker, and an flock on a per-doctor lock file serializes them across processes.
+_doctor_locks = weakref.WeakKeyDictionary()
+
+
+def _get_doctor_lock(doctor_name: str) -> asyncio.Lock:
+    locks = _doctor_locks.setdefault(asyncio.get_running_loop(), {})
+    if doctor_name not in locks:
+        locks[doctor_name] = asyncio.Lock()
+    return locks[doctor_name]
+
+
+@contextmanager
+def _doctor_file_lock(url_path: str):
+    directory, file_name = os.path.split(url_path)
+    with open(os.path.join(directory, f".{file_name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _atomic_write_json(path: str, data: dict):
+    _atomic_write_text(path, json.dumps(data, indent=2))
+
+
+def _atomic_write_text(path: str, text: str):
+    directory, file_name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{file_name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _book_appointment(url_path: str, start_dt: datetime, end_dt: datetime, slot: dict):
+    """Conflict check plus write, run while holding the doctor's file lock."""
+    with _doctor_file_lock(url_path):
+        # Read straight from disk: the cached copy is shared and may be stale inside the lock
+        schedule = load_schedule(url_path)
+        date_str = start_dt.date().isoformat()
+        if has_conflict(get_booked_intervals(schedule).get(date_str, []), start_dt, end_dt):
+            return False, None
+
+        new_uuid = str(uuid.uuid4())
+        schedule.setdefault(date_str, {})[new_uuid] = slot
+        _atomic_write_json(url_path, schedule)
+    schedule_cache.invalidate(url_path)
+    return True, new_uuid
+
+
+async def add_doctors_appointment(data: dict, patient_name: str, reason: str):
+    """
+    Book the slot for the doctor. Returns (True, appointment_id), or (False, None) if the
+    slot was taken by a concurrent booking since it was validated.
+    """
+    logger.debug("booking appointment", extra={"doctor": data.get("doctor_name"), "start": data.get("start")})
+
+    doctor_name = data["doctor_name"]
+    start_dt = datetime.fromisoformat(data["start"])
+    end_dt = datetime.fromisoformat(data["end"])
+    slot = {
         "available": False,
-        "start": start_time,
-        "end": end_time,
+        "start": start_dt.strftime("%H:%M"),
+        "end": end_dt.strftime("%H:%M"),
         "patient": patient_name,
         "reason": reason
     }
-    schedule[date_str] = slots
 
-    with open(url_path, "w") as f:
-        json.dump(schedule, f, indent=2)
+    client = get_schedule_client()
+    if client is not None:
+        # The service is the single writer and serializes bookings per doctor itself
+        return await asyncio.to_thread(client.book, doctor_name, start_dt, end_dt, slot)
 
-    return True, new_uuid
+    url_path = get_doctor_schedule_file(doctor_name)
+    if not os.path.exists(url_path):
+        raise FileNotFoundError(f"No schedule found for {doctor_name}")
+
+    async with _get_doctor_lock(doctor_name):
+        return await asyncio.to_thread(_book_appointment, url_path, start_dt, end_dt, slot)
 
 def on_write_transcript(text, session):
     sid = session.get("sid")
     if sid:
-        with open(f"./{sid}_transcript.txt", "a") as f:
-            f.write(text + "\n")
+        # Buffered in memory, the transcript writer's background task does the file I/O
+        get_transcript_writer().append(sid, text)
     return text
\ No newline at end of file
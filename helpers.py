@@ -1,30 +1,36 @@
+import asyncio
 from asyncio import subprocess
+from datetime import datetime, timedelta
 import json
 import os
 import uuid
 from flask import Response
-from openai import OpenAI
-import openai
 from config import config
 
-from openai_client import OpenAIClient
+import model_router
+from openai_client import UPSTREAM_ERRORS
+from resilience import CircuitOpenError, DeadlineExceeded
+from spoken_forms import FAST_PATH_PARSERS, record_fast_path
+from metrics import span
+from conversation import TRANSITIONS
+from log import get_logger
 
-from file_storage import get_doctors_appointments
+from file_storage import format_free_slots, get_free_slots
+from occupancy import get_occupancy
 from validators import validate_appointment_time, validate_regex
 
+logger = get_logger(__name__)
 
-openai_client = OpenAIClient(config.openai.api_key, config.audiodir, config.openai.api_key)
 
 AUDIO_OUTPUT_DIR = "./audio_output"
 
 
-def get_next_agent_response(state):
+async def get_next_agent_response(state):
     appointments_natural_language = ""
     if state == "schedule_appointment":
-        # Need to get all potential appointment times
-        doctors_appointments = get_doctors_appointments()
-        # Now need to prompt OpenAI to turn into natural language
-        appointments_natural_language = convert_appointments_to_natural_language(doctors_appointments)
+        # Open slots are computed locally, OpenAI only turns them into natural language
+        free_slots = format_free_slots(await asyncio.to_thread(get_free_slots))
+        appointments_natural_language = await convert_appointments_to_natural_language(free_slots)
 
     prompts = {
         "name": "Welcome, please state your name so we can identify your patient account",
@@ -91,52 +97,206 @@ def openAIPrompts(type):
     return None
 
 
-def convert_appointments_to_natural_language(raw_input: str) -> dict:
-    prompt = f"""
-    Communicate all open time slots to schedule appointments to your patient based on the 
-    slots currently filled. If a date doesn't exist in the list then the doctor is free all working hours. 
-    
-    Working hours are 9:00am - 5:00pm EST
-    Only communicate open time ranges for the next two weeks
+def availability_prompt(free_slots: str) -> str:
+    return f"""
+    Read the following open appointment time ranges to your patient in natural, spoken language.
+    Each line is a doctor, a day and the open ranges that day (24 hour clock, EST).
+    These ranges are already final: do not add, remove, merge or shift any of them.
 
-    "{raw_input}"
+    "{free_slots}"
     """
 
-    return openai_client.chat_response(prompt)
+
+def read_out_free_slots(free_slots: str) -> list:
+    """The slot list as plain sentences, what the caller hears when the LLM can't be reached."""
+    return [f"{line}." for line in free_slots.splitlines() if line.strip()]
+
+
+async def convert_appointments_to_natural_language(free_slots: str) -> str:
+    try:
+        return await model_router.chat("availability", availability_prompt(free_slots))
+    except (CircuitOpenError, DeadlineExceeded, *UPSTREAM_ERRORS) as e:
+        logger.warning("availability read out without the LLM", extra={"error": str(e)})
+        return " ".join(read_out_free_slots(free_slots))
+
+
+async def stream_appointments_in_natural_language(free_slots: str):
+    """Same as convert_appointments_to_natural_language, yielded sentence by sentence for TTS."""
+    spoken = False
+    try:
+        async for sentence in model_router.stream_chat("availability", availability_prompt(free_slots)):
+            spoken = True
+            yield sentence
+    except (CircuitOpenError, DeadlineExceeded, *UPSTREAM_ERRORS) as e:
+        if spoken:
+            raise
+        logger.warning("availability read out without the LLM", extra={"error": str(e)})
+        for sentence in read_out_free_slots(free_slots):
+            yield sentence
 
 
 
 # Main openai prompt 
 async def data_extraction (text: str, v_type: str):
+    # Deterministic fields are parsed locally first, the LLM is only the fallback
+    parser = FAST_PATH_PARSERS.get(v_type)
+    if parser:
+        with span("regex_validation", v_type):
+            parsed = parser(text)
+            data, valid, error = await validate_regex(parsed, v_type) if parsed else (None, False, "")
+        record_fast_path(v_type, valid)
+        if valid:
+            return data, valid, error
+
     base_prompt = openAIPrompts(v_type)
     final_prompt = f"{base_prompt}\n\nTranscript: {text}"
-    response = openai_client.chat_response(final_prompt)
-    print(f"open ai response: {response}")
-    return await validate_regex(response, v_type)
 
+    async def validate(response):
+        logger.debug("extraction response", extra={"prompt_type": v_type, "chars": len(response or "")})
+        with span("regex_validation", v_type):
+            return await validate_regex(response, v_type)
+
+    # A cheap model first, a stronger one if its answer doesn't validate
+    with span("extraction_llm", v_type):
+        return await model_router.chat_validated(v_type, final_prompt, validate)
+
+
+
+# Fields that can be volunteered out of order; each is checked with validate_regex
+MULTI_FIELD_STATES = ("name", "insurance_payer", "insurance_id", "topic_of_call", "phone", "email")
+
+MULTI_FIELD_DESCRIPTIONS = {
+    "name": 'the caller\'s own name, as {"first_name": "string", "last_name": "string"}',
+    "insurance_payer": 'the member name on the insurance card, as {"first_name": "string", "last_name": "string"}. '
+                       "Only fill this if the caller talks about the insurance card or member, never copy the caller's name",
+    "insurance_id": "the insurance member ID: spelled-out digits become digits, letter names become uppercase letters, no spaces",
+    "topic_of_call": "a short summary of why the caller wants an appointment",
+    "phone": "the phone number in E.164 format, e.g. +19177012642",
+    "email": "the email address in standard format; 'at' becomes '@' and 'dot' becomes '.'",
+}
+
+
+def multi_field_prompt(fields: list) -> str:
+    lines = "\n".join(f'- "{field}": {MULTI_FIELD_DESCRIPTIONS[field]}' for field in fields)
+    return (
+        f'The caller was just asked for "{fields[0]}" and may answer it without naming it. '
+        "Callers often answer several intake questions at once. Extract every one of these fields "
+        "the caller explicitly states in the transcript:\n"
+        f"{lines}\n\n"
+        "Return a JSON object with only the fields that are clearly present. "
+        "Do not guess or invent values, leave out anything that was not said."
+    )
+
+
+def remaining_fields(current_state: str, session_state: dict) -> list:
+    """The current field followed by every later multi-field state that hasn't been filled yet."""
+    fields = [current_state]
+    state = next_prompt_type(current_state)
+    # The address step sits between the simple fields and is collected on its own
+    while state in MULTI_FIELD_STATES or state == "address":
+        if state in MULTI_FIELD_STATES and not session_state.get(state):
+            fields.append(state)
+        state = next_prompt_type(state)
+    return fields
+
+
+def next_open_state(current_state: str, session_state: dict) -> str:
+    """next_prompt_type, skipping the steps the caller already answered in an earlier utterance."""
+    state = next_prompt_type(current_state)
+    while state in MULTI_FIELD_STATES and session_state.get(state):
+        state = next_prompt_type(state)
+    return state
+
+
+async def extract_fields(text: str, fields: list) -> dict:
+    """One structured-output call for several fields; returns only the ones that pass validate_regex."""
+    final_prompt = f"{multi_field_prompt(fields)}\n\nTranscript: {text}"
+
+    async def validate(response):
+        filled, rejected = await _validated_fields(response, fields)
+        # Escalate when an answer the model did find fails validate_regex; a caller who
+        # didn't answer is not the model's fault
+        return filled, not rejected, ""
+
+    with span("extraction_llm", fields[0]):
+        filled, _, _ = await model_router.chat_validated(
+            "multi_field", final_prompt, validate, response_format={"type": "json_object"}
+        )
+    return filled
+
+
+async def _validated_fields(response: str, fields: list):
+    """(fields that pass validate_regex, fields the model answered that don't)"""
+    logger.debug("extraction response", extra={"prompt_type": "multi_field", "chars": len(response or "")})
+    try:
+        extracted = json.loads(response)
+    except json.JSONDecodeError:
+        return {}, fields[:1]
+    if not isinstance(extracted, dict):
+        return {}, fields[:1]
+
+    filled = {}
+    rejected = []
+    with span("regex_validation", fields[0]):
+        for field in fields:
+            value = extracted.get(field)
+            if not value:
+                continue
+            if isinstance(value, dict):
+                if not value.get("first_name"):
+                    continue
+                value = json.dumps(value)
+            data, valid, _ = await validate_regex(str(value), field)
+            if valid and data:
+                filled[field] = data
+            else:
+                rejected.append(field)
+    return filled, rejected
+
+
+async def extract_volunteered_fields(text: str, current_state: str, session_state: dict):
+    """
+    data_extraction for the current field, plus any later fields the caller volunteered in
+    the same utterance. Returns (data, valid, error, other_fields).
+
+    When the local fast path answers the current field no LLM is called. Otherwise a single
+    structured-output call covers every remaining field instead of one call per field.
+    """
+    if not config.extraction.multi_field or current_state not in MULTI_FIELD_STATES:
+        data, valid, error = await data_extraction(text, current_state)
+        return data, valid, error, {}
+
+    parser = FAST_PATH_PARSERS.get(current_state)
+    if parser:
+        with span("regex_validation", current_state):
+            parsed = parser(text)
+            data, valid, error = await validate_regex(parsed, current_state) if parsed else (None, False, "")
+        record_fast_path(current_state, valid)
+        if valid:
+            return data, valid, error, {}
+
+    filled = await extract_fields(text, remaining_fields(current_state, session_state))
+    data = filled.pop(current_state, None)
+    if data is None:
+        return None, False, f"Could not extract {current_state}", filled
+    return data, True, "", filled
 
 
 # sequence of events
 def next_prompt_type(current_state):
-    match current_state:
-        case "name":
-            return "insurance_payer"
-        case "insurance_payer":
-            return "insurance_id"
-        case "insurance_id":
-            return "topic_of_call"
-        case "topic_of_call":
-            return "address"
-        case "address":
-            return "phone"
-        case "phone":
-            return "email"
-        case "email":
-            return "schedule_appointment"
-        case "schedule_appointment":
-            return "done"
+    return TRANSITIONS.get(current_state)
+
 
 
+def no_doctor_free_message(occupancy, start_dt: datetime, end_dt: datetime, suggestions: int = 3) -> str:
+    """Retry message for an "any doctor" request nobody is free for, with the nearest open slots after it."""
+    horizon = datetime.combine(occupancy.start_day + timedelta(days=occupancy.days), datetime.min.time())
+    slots = occupancy.find_slots(end_dt - start_dt, window=(start_dt, horizon), limit=suggestions)
+    if not slots:
+        return "No doctor is free at that time, please choose a different time"
+    options = ", ".join(f"Dr. {doctor} on {start.strftime('%A %Y-%m-%d at %H:%M')}" for doctor, start, _ in slots)
+    return f"No doctor is free at that time. The nearest open times are: {options}"
+
 
 async def handle_appointment_scheduling(text):
     prompt = f"""
@@ -147,7 +307,7 @@ async def handle_appointment_scheduling(text):
 
     Return a valid JSON object with the following fields:
     {{
-      "doctor_name": "string, e.g. 'john'",
+      "doctor_name": "string, e.g. 'john', or 'any' if the patient doesn't mind which doctor",
       "start": "start time in ISO 8601 format, e.g. '2025-07-22T15:00:00'",
       "end": "end time in ISO 8601 format",
       "missing_fields": ["list of any missing fields, e.g. 'doctor_name', 'start', 'end'"]
@@ -158,12 +318,11 @@ async def handle_appointment_scheduling(text):
     """
 
     try:
-        response = openai_client.chat_response(prompt)
-        print(response)
+        with span("extraction_llm", "schedule_appointment"):
+            response = await model_router.chat("scheduling", prompt)
         json_response = json.loads(response)
-        print(f"After response: {response}")
         missing_fields = json_response.get("missing_fields", None)
-        print(f"missing fields: {missing_fields}")
+        logger.debug("scheduling response", extra={"missing_fields": missing_fields})
 
         if missing_fields == None:
             return None, False, (
@@ -171,39 +330,26 @@ async def handle_appointment_scheduling(text):
                 f"these missing fields: {json_response['missing_fields']}"
             )
 
+        if (json_response.get("doctor_name") or "any").lower() == "any":
+            # "Whoever's free": the doctor with the requested time open and the lightest day
+            start_dt = datetime.fromisoformat(json_response["start"])
+            end_dt = datetime.fromisoformat(json_response["end"])
+            occupancy = await asyncio.to_thread(get_occupancy)
+            doctors = occupancy.free_doctors(start_dt, end_dt)
+            if not doctors:
+                return None, False, no_doctor_free_message(occupancy, start_dt, end_dt)
+            json_response["doctor_name"] = occupancy.least_booked(doctors, start_dt.date())
+
         is_valid_time, error_message = await validate_appointment_time(json_response)
-        print(f"++++After: {error_message}")
         if not is_valid_time:
             return None, False, error_message
 
         return json_response, True, None
 
+    except (CircuitOpenError, DeadlineExceeded, *UPSTREAM_ERRORS):
+        # on_transcript answers these with a quick retry
+        raise
     except json.JSONDecodeError as e:
         return None, False, f"Failed to parse response: {e}"
     except Exception as e:
         return None, False, f"OpenAI error: {e}"
-
-
-
-
-
-async def infer_address_with_llm(raw_address: str) -> str:
-    """
-    Uses OpenAI to infer the correct structured address from raw user input.
-    """
-    prompt = f"""
-    You are an AI address normalizer. Your job is to take in a potentially incomplete or misspoken address and return the most likely full and correctly spelled address as a single line (like "123 Main Street, San Francisco, CA 94105").
-
-    Based on your knowledge of common U.S. addresses and city/street formats, correct any typos and reorder parts as needed.
-
-    Raw input: "{raw_address}"
-
-    Respond ONLY with the inferred fixed address.
-    """
-
-    response = await openai.ChatCompletion.acreate(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt.strip()}],
-    )
-    
-    return response.choices[0].message.content.strip()
\ No newline at end of file
@@ -0,0 +1,176 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from config import config
+
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+
+def normalize_input(text: str) -> str:
+    """Case and whitespace don't change what the LLM extracts, so they don't change the key either."""
+    return WHITESPACE_REGEX.sub(" ", text).strip().lower()
+
+
+def make_key(prompt_type: str, model: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_input(text).encode("utf-8")).hexdigest()
+    return f"{prompt_type}:{model}:{digest}"
+
+
+# Expired and excess rows are purged on open and after every this many writes
+DISK_PURGE_EVERY = 256
+
+
+class DiskCache:
+    """SQLite-backed tier shared by the worker processes on a node, capped at max_rows."""
+
+    def __init__(self, path: str, max_rows: int = 100000):
+        self.max_rows = max_rows
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=1000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires_at ON llm_cache (expires_at)")
+        self.purge_expired(time.time())
+
+    def get(self, key: str, now: float):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return row
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, expires_at)
+            )
+            self._writes += 1
+            purge = self._writes % DISK_PURGE_EVERY == 0
+        if purge:
+            self.purge_expired(time.time())
+
+    def purge_expired(self, now: float):
+        """Drop expired rows, then the soonest to expire until at most max_rows are left."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.max_rows,)
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LLMCache:
+    """
+    Bounded LRU + TTL memoization of LLM results keyed by (prompt type, model, normalized input),
+    with an optional on-disk tier. Caching can be turned off per prompt type, and the disk
+    tier separately (for answers that are patient data).
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, disk_path: str = None,
+                 disabled_prompt_types=(), enabled: bool = True, disk_max_rows: int = 100000,
+                 disk_disabled_prompt_types=()):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.disabled_prompt_types = set(disabled_prompt_types)
+        self.disk_disabled_prompt_types = set(disk_disabled_prompt_types)
+        self.disk = DiskCache(disk_path, disk_max_rows) if disk_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def enabled_for(self, prompt_type: str) -> bool:
+        return self.enabled and prompt_type is not None and prompt_type not in self.disabled_prompt_types
+
+    def _on_disk(self, prompt_type: str) -> bool:
+        return self.disk is not None and prompt_type not in self.disk_disabled_prompt_types
+
+    def get(self, prompt_type: str, model: str, text: str):
+        if not self.enabled_for(prompt_type):
+            return None
+        key = make_key(prompt_type, model, text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats[(prompt_type, "memory_hits")] += 1
+                    return value
+                del self._entries[key]
+
+        if self._on_disk(prompt_type):
+            # The disk tier is shared across processes, so it uses wall clock time
+            row = self.disk.get(key, time.time())
+            if row is not None:
+                value, expires_at = row
+                self._store(key, value, now + (expires_at - time.time()))
+                self._stats[(prompt_type, "disk_hits")] += 1
+                return value
+
+        self._stats[(prompt_type, "misses")] += 1
+        return None
+
+    def set(self, prompt_type: str, model: str, text: str, value: str):
+        if not self.enabled_for(prompt_type):
+            return
+        key = make_key(prompt_type, model, text)
+        self._store(key, value, time.monotonic() + self.ttl_seconds)
+        if self._on_disk(prompt_type):
+            self.disk.set(key, value, time.time() + self.ttl_seconds)
+
+    def _store(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        per_type = {}
+        for key, count in self._stats.items():
+            if not isinstance(key, tuple):
+                continue
+            prompt_type, counter = key
+            per_type.setdefault(prompt_type, {"memory_hits": 0, "disk_hits": 0, "misses": 0})[counter] = count
+        for counters in per_type.values():
+            total = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+            counters["hit_rate"] = (counters["memory_hits"] + counters["disk_hits"]) / total if total else 0.0
+        return {"entries": len(self._entries), "evictions": self._stats["evictions"], "prompt_types": per_type}
+
+
+_llm_cache = None
+
+
+def get_llm_cache() -> LLMCache:
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = LLMCache(
+            max_entries=config.llm_cache.max_entries,
+            ttl_seconds=config.llm_cache.ttl_seconds,
+            disk_path=config.llm_cache.disk_path,
+            disabled_prompt_types=config.llm_cache.disabled_prompt_types,
+            enabled=config.llm_cache.enabled,
+            disk_max_rows=config.llm_cache.disk_max_rows,
+            disk_disabled_prompt_types=config.llm_cache.disk_disabled_prompt_types,
+        )
+    return _llm_cache
@@ -0,0 +1,188 @@
+"""
+Structured logging. Records are JSON lines, one object per record:
+
+    {"ts": "2026-01-05T14:03:11.201Z", "level": "INFO", "logger": "app", "msg": "turn handled", "state": "address"}
+
+Calling code only pays for a level check, a copy of its extras and a queue put: formatting,
+PHI redaction and the write happen on a listener thread. Levels are set per module
+(LOG_LEVELS="file_storage=DEBUG,httpx=WARNING"), and DEBUG records are sampled
+(LOG_DEBUG_SAMPLE_RATE, or extra={"sample": r} for a single noisy event).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+from config import config
+
+# Keyword arguments of LogRecord itself; everything else on a record came from extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+# extra={...} keys whose values are patient data and never logged
+PHI_FIELDS = {
+    "name", "address", "phone", "email", "insurance_id", "insurance_payer", "dob", "date_of_birth",
+    "text", "user_input", "transcript", "payload",
+}
+REDACTED = "[REDACTED]"
+# Free-text patterns: emails, SSNs, phone numbers and other long digit runs (member ids, DOBs)
+PHI_PATTERNS = (
+    re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"),
+    re.compile(r"\b\d{3}-\d{2}-\d{4}\b"),
+    re.compile(r"(?<!\w)\+?1?[\s.-]?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b"),
+    re.compile(r"\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b"),
+    re.compile(r"\b[A-Za-z]{0,4}\d{6,}\b"),
+)
+
+
+def redact_text(text: str) -> str:
+    for pattern in PHI_PATTERNS:
+        text = pattern.sub(REDACTED, text)
+    return text
+
+
+def redact_value(key: str, value):
+    if key in PHI_FIELDS:
+        return REDACTED
+    if isinstance(value, str):
+        return redact_text(value)
+    if isinstance(value, dict):
+        return {k: redact_value(k, v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact_value(key, v) for v in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, redact: bool = True):
+        super().__init__()
+        self.redact = redact
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if self.redact:
+            entry = {key: value if key in ("ts", "level", "logger") else redact_value(key, value) for key, value in entry.items()}
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a `rate` fraction of DEBUG records; a record's own extra={"sample": r} wins."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample", None)
+        if rate is None:
+            if record.levelno >= logging.INFO:
+                return True
+            rate = self.rate
+        return rate >= 1 or random.random() < rate
+
+
+def snapshot(value):
+    """A plain copy of an extra={...} value, taken on the logging thread: containers are copied, other objects rendered."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): snapshot(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [snapshot(v) for v in value]
+    try:
+        return str(value)
+    except Exception:
+        # e.g. a weakref proxy whose object is gone
+        return f"<unprintable {type(value).__name__}>"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread. A full queue drops the record instead of blocking
+    the event loop. The message and the extra={...} values are copied here, so later changes
+    to them can't leak into the log; formatting and redaction are left for the listener.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        for key, value in list(vars(record).items()):
+            if key not in _RECORD_ATTRS:
+                setattr(record, key, snapshot(value))
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec: str) -> dict:
+    """"file_storage=DEBUG,httpx=WARNING" -> {"file_storage": "DEBUG", "httpx": "WARNING"}"""
+    levels = {}
+    for part in spec.split(","):
+        name, _, level = part.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(stream=None):
+    """
+    Route the root logger through the queue. Called once by each entrypoint (the agent
+    worker, schedule_service), not on import; later calls are no-ops.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return _listener
+        log_config = config.logging
+        if log_config.output in ("", "stdout"):
+            target = logging.StreamHandler(stream or sys.stdout)
+        else:
+            target = logging.FileHandler(log_config.output)
+        target.setFormatter(JsonFormatter(redact=log_config.redact))
+
+        handler = DroppingQueueHandler(queue.Queue(maxsize=log_config.queue_size))
+        handler.addFilter(SamplingFilter(log_config.debug_sample_rate))
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(log_config.level.upper())
+        for name, level in parse_levels(log_config.module_levels).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(handler.queue, target, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(name)
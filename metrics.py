@@ -0,0 +1,164 @@
+import os
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CollectorRegistry, Gauge, Histogram, start_http_server
+
+from config import config
+from log import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Stages of one caller turn. "turn" starts when the transcript is received and covers
+# everything up to the reply being handed to the session.
+STAGES = (
+    "turn",
+    "extraction_llm",
+    "regex_validation",
+    "address_verify",
+    "storage_write",
+    "email",
+    "reply_generation",
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+TURN_STAGE_SECONDS = Histogram(
+    "turn_stage_seconds",
+    "Time spent in each stage of a caller turn",
+    ["stage", "state"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+TURN_STAGE_QUANTILE_SECONDS = Gauge(
+    "turn_stage_quantile_seconds",
+    "p50/p95/p99 over the most recent samples of each stage, per worker process",
+    ["stage", "state", "quantile"],
+    multiprocess_mode="liveall",
+)
+
+BOOKING_TURNS = Histogram(
+    "booking_turns",
+    "Caller turns (transcripts handled) per completed booking",
+    buckets=(4, 6, 8, 10, 12, 16, 20, 30),
+)
+BOOKING_LLM_CALLS = Histogram(
+    "booking_llm_calls",
+    "Upstream LLM requests per completed booking (cache hits not counted)",
+    buckets=(2, 4, 6, 8, 10, 12, 16, 20, 30),
+)
+
+_recent = {}
+# Per-call counters ({"turns": n, "llm_calls": n}) of the call whose turn is being handled
+_call_stats = ContextVar("call_stats", default=None)
+_booking_totals = Counter()
+
+
+def _update_quantiles(stage: str, state: str, seconds: float):
+    samples = _recent.setdefault((stage, state), deque(maxlen=config.metrics.quantile_window))
+    samples.append(seconds)
+    ordered = sorted(samples)
+    for q in QUANTILES:
+        value = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        TURN_STAGE_QUANTILE_SECONDS.labels(stage, state, str(q)).set(value)
+
+
+def observe(stage: str, state: str, seconds: float):
+    TURN_STAGE_SECONDS.labels(stage, state).observe(seconds)
+    _update_quantiles(stage, state, seconds)
+
+
+def get_quantiles(stage: str, state: str) -> dict:
+    ordered = sorted(_recent.get((stage, state), ()))
+    if not ordered:
+        return {}
+    return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+def track_call_stats(stats: dict):
+    """Attribute the LLM requests made by the current task (and tasks it spawns) to this call."""
+    _call_stats.set(stats)
+
+
+def count_llm_call():
+    stats = _call_stats.get()
+    if stats is not None:
+        stats["llm_calls"] = stats.get("llm_calls", 0) + 1
+
+
+def record_booking(stats: dict):
+    BOOKING_TURNS.observe(stats.get("turns", 0))
+    BOOKING_LLM_CALLS.observe(stats.get("llm_calls", 0))
+    _booking_totals["bookings"] += 1
+    _booking_totals["turns"] += stats.get("turns", 0)
+    _booking_totals["llm_calls"] += stats.get("llm_calls", 0)
+
+
+def get_booking_averages() -> dict:
+    """Average turns and LLM calls per completed booking in this process."""
+    bookings = _booking_totals["bookings"]
+    if not bookings:
+        return {"bookings": 0, "turns": 0.0, "llm_calls": 0.0}
+    return {
+        "bookings": bookings,
+        "turns": _booking_totals["turns"] / bookings,
+        "llm_calls": _booking_totals["llm_calls"] / bookings,
+    }
+
+
+@contextmanager
+def span(stage: str, state: str):
+    """Time a stage of the current turn; also emits an OpenTelemetry span when enabled."""
+    start = time.perf_counter()
+    if trace is not None and config.metrics.otel_enabled:
+        with trace.get_tracer("ai-health-secretary").start_as_current_span(
+            stage, attributes={"conversation.state": state or ""}
+        ):
+            try:
+                yield
+            finally:
+                observe(stage, state, time.perf_counter() - start)
+    else:
+        try:
+            yield
+        finally:
+            observe(stage, state, time.perf_counter() - start)
+
+
+def start_metrics_server(port: int):
+    """
+    Serve /metrics. LiveKit runs jobs in child processes, so when PROMETHEUS_MULTIPROC_DIR
+    is set the samples written by every process are aggregated here.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+    logger.info("metrics server started", extra={"port": port})
+
+
+def configure_tracing():
+    """Export spans over OTLP (OTEL_EXPORTER_OTLP_* env vars) when enabled and the SDK is installed."""
+    if trace is None or not config.metrics.otel_enabled:
+        return
+    try:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logger.warning("OpenTelemetry SDK/OTLP exporter not installed, spans are not exported")
+        return
+
+    provider = TracerProvider(resource=Resource.create({"service.name": "ai-health-secretary"}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
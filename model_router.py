@@ -0,0 +1,223 @@
+"""
+Per-prompt-type model routing. Each prompt type gets a model, a max_tokens cap and a latency
+budget; simple extractions go to a small model and escalate to a stronger one when the answer
+fails validation (or the small model blows its budget).
+
+Routes can be overridden with LLM_ROUTES="phone=gpt-4o-mini:32:3:gpt-4o,scheduling=gpt-4o"
+(model[:max_tokens[:latency_budget_seconds[:escalate_to]]]).
+
+Non-streaming requests are hedged: one that is slower than LLM_HEDGE_PERCENTILE of the
+recent latencies for its prompt type and model is sent a second time and the first answer wins.
+"""
+import time
+from collections import Counter
+from dataclasses import dataclass, replace
+
+import openai
+from prometheus_client import Counter as PrometheusCounter, Histogram
+
+from config import config
+from log import get_logger
+from openai_client import DEFAULT_MODEL, STRUCTURED_OUTPUT_MODEL, get_openai_client
+from resilience import LatencyTracker, hedged
+
+logger = get_logger(__name__)
+
+LLM_ROUTE_SECONDS = Histogram(
+    "llm_route_seconds",
+    "Latency of LLM requests per prompt type and model",
+    ["prompt_type", "model"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32),
+)
+LLM_ROUTE_REQUESTS = PrometheusCounter(
+    "llm_route_requests",
+    "Validated LLM requests per prompt type, by whether the first model's answer was kept or escalated",
+    ["prompt_type", "outcome"],
+)
+LLM_ROUTE_OVER_BUDGET = PrometheusCounter(
+    "llm_route_over_budget", "LLM requests that took longer than their route's latency budget", ["prompt_type", "model"]
+)
+LLM_HEDGED_REQUESTS = PrometheusCounter(
+    "llm_hedged_requests", "LLM requests sent a second time, by which copy answered first", ["prompt_type", "winner"]
+)
+
+
+@dataclass(frozen=True)
+class Route:
+    model: str
+    max_tokens: int = None
+    # Seconds. Timeout of the first attempt when the route can escalate, otherwise only reported
+    latency_budget: float = None
+    escalate_to: str = None
+
+
+CHEAP_MODEL = "gpt-4o-mini"
+STRONG_MODEL = "gpt-4o"
+
+DEFAULT_ROUTES = {
+    "name": Route(CHEAP_MODEL, 64, 3.0, STRONG_MODEL),
+    "insurance_payer": Route(CHEAP_MODEL, 64, 3.0, STRONG_MODEL),
+    "insurance_id": Route(CHEAP_MODEL, 32, 3.0, STRONG_MODEL),
+    "topic_of_call": Route(CHEAP_MODEL, 64, 3.0),
+    "phone": Route(CHEAP_MODEL, 32, 3.0, STRONG_MODEL),
+    "email": Route(CHEAP_MODEL, 48, 3.0, STRONG_MODEL),
+    "multi_field": Route(CHEAP_MODEL, 256, 4.0, STRONG_MODEL),
+    # json_schema structured output
+    "address": Route(STRUCTURED_OUTPUT_MODEL, 200, 5.0),
+    "scheduling": Route(STRONG_MODEL, 200, 6.0),
+    "availability": Route(CHEAP_MODEL, 800, 8.0),
+}
+# Unrouted prompt types, and every type when routing is off: the previous behavior
+FALLBACK_ROUTE = Route(DEFAULT_MODEL)
+# The same for requests with a response_format, which DEFAULT_MODEL rejects
+STRUCTURED_FALLBACK_ROUTE = Route(STRUCTURED_OUTPUT_MODEL)
+
+_routes = None
+_route_stats = Counter()
+_latencies = LatencyTracker(config.metrics.quantile_window)
+
+
+def parse_routes(spec: str) -> dict:
+    """"phone=gpt-4o-mini:32:3:gpt-4o,scheduling=gpt-4o" -> {prompt_type: Route}, unset parts keep the defaults."""
+    routes = {}
+    for part in spec.split(","):
+        prompt_type, _, value = part.partition("=")
+        if not prompt_type.strip() or not value.strip():
+            continue
+        model, max_tokens, budget, escalate_to = (value.strip().split(":") + [""] * 3)[:4]
+        route = replace(DEFAULT_ROUTES.get(prompt_type.strip(), FALLBACK_ROUTE), model=model)
+        if max_tokens:
+            route = replace(route, max_tokens=int(max_tokens))
+        if budget:
+            route = replace(route, latency_budget=float(budget))
+        if escalate_to:
+            route = replace(route, escalate_to=escalate_to)
+        routes[prompt_type.strip()] = route
+    return routes
+
+
+def get_route(prompt_type: str, structured: bool = False) -> Route:
+    """The prompt type's route; structured requests (response_format set) fall back to a model that supports them."""
+    global _routes
+    fallback = STRUCTURED_FALLBACK_ROUTE if structured else FALLBACK_ROUTE
+    if not config.model_routing.enabled:
+        return fallback
+    if _routes is None:
+        _routes = {**DEFAULT_ROUTES, **parse_routes(config.model_routing.routes)}
+    return _routes.get(prompt_type, fallback)
+
+
+def _observe(prompt_type: str, model: str, route: Route, seconds: float):
+    LLM_ROUTE_SECONDS.labels(prompt_type, model).observe(seconds)
+    _route_stats[(prompt_type, "requests")] += 1
+    _route_stats[(prompt_type, "seconds")] += seconds
+    if route.latency_budget and seconds > route.latency_budget:
+        LLM_ROUTE_OVER_BUDGET.labels(prompt_type, model).inc()
+        _route_stats[(prompt_type, "over_budget")] += 1
+
+
+def hedge_after(prompt_type: str, model: str):
+    """Seconds to wait before hedging, None while hedging is off or there are too few samples."""
+    percentile = config.resilience.hedge_percentile
+    if not percentile:
+        return None
+    return _latencies.percentile((prompt_type, model), percentile, config.resilience.hedge_min_samples)
+
+
+async def _send(prompt_type: str, model: str, route: Route, request):
+    start = time.perf_counter()
+    try:
+        result, winner = await hedged(request, hedge_after(prompt_type, model))
+    finally:
+        seconds = time.perf_counter() - start
+        _observe(prompt_type, model, route, seconds)
+    _latencies.observe((prompt_type, model), seconds)
+    if winner is not None:
+        LLM_HEDGED_REQUESTS.labels(prompt_type, winner).inc()
+        _route_stats[(prompt_type, "hedged")] += 1
+    return result
+
+
+async def complete(prompt_type: str, messages: list, model: str = None, response_format: dict = None,
+                   timeout: float = None, max_retries: int = None) -> str:
+    """OpenAIClient.complete with the route's model and max_tokens."""
+    route = get_route(prompt_type, structured=response_format is not None)
+    model = model or route.model
+    return await _send(prompt_type, model, route, lambda: get_openai_client().complete(
+        messages, model=model, timeout=timeout, prompt_type=prompt_type,
+        response_format=response_format, max_tokens=route.max_tokens, max_retries=max_retries,
+    ))
+
+
+async def chat(prompt_type: str, user_text: str, model: str = None, response_format: dict = None,
+               timeout: float = None, max_retries: int = None) -> str:
+    """OpenAIClient.chat_response with the route's model and max_tokens."""
+    route = get_route(prompt_type, structured=response_format is not None)
+    model = model or route.model
+    return await _send(prompt_type, model, route, lambda: get_openai_client().chat_response(
+        user_text, model=model, timeout=timeout, prompt_type=prompt_type,
+        response_format=response_format, max_tokens=route.max_tokens, max_retries=max_retries,
+    ))
+
+
+async def stream_chat(prompt_type: str, user_text: str):
+    """OpenAIClient.stream_chat_response with the route's model; latency is to the first sentence."""
+    route = get_route(prompt_type)
+    start = time.perf_counter()
+    first = True
+    async for sentence in get_openai_client().stream_chat_response(
+        user_text, model=route.model, prompt_type=prompt_type, max_tokens=route.max_tokens,
+    ):
+        if first:
+            _observe(prompt_type, route.model, route, time.perf_counter() - start)
+            first = False
+        yield sentence
+
+
+async def chat_validated(prompt_type: str, user_text: str, validate, response_format: dict = None):
+    """
+    chat() checked by `validate(response) -> (data, valid, error)`. An invalid answer, or a
+    first attempt that runs past the latency budget, is retried once on the route's
+    escalate_to model. Returns validate's result.
+    """
+    route = get_route(prompt_type, structured=response_format is not None)
+    can_escalate = bool(route.escalate_to) and route.escalate_to != route.model
+    try:
+        # A budgeted attempt is sent once: SDK retries of a timeout would spend the turn
+        # deadline before the escalation below could run
+        response = await chat(
+            prompt_type, user_text, response_format=response_format,
+            timeout=route.latency_budget if can_escalate else None,
+            max_retries=0 if can_escalate else None,
+        )
+        result = await validate(response)
+    except openai.APITimeoutError:
+        if not can_escalate:
+            raise
+        result = (None, False, "timed out")
+
+    escalated = can_escalate and not result[1]
+    LLM_ROUTE_REQUESTS.labels(prompt_type, "escalated" if escalated else "first_try").inc()
+    _route_stats[(prompt_type, "validated")] += 1
+    if escalated:
+        _route_stats[(prompt_type, "escalated")] += 1
+        logger.info("escalating LLM request", extra={"prompt_type": prompt_type, "model": route.escalate_to, "error": result[2]})
+        response = await chat(prompt_type, user_text, model=route.escalate_to, response_format=response_format)
+        result = await validate(response)
+    return result
+
+
+def get_route_stats() -> dict:
+    """Per prompt type in this process: requests, mean latency, over-budget, hedged and escalation rates."""
+    stats = {}
+    for prompt_type in sorted({prompt_type for prompt_type, _ in _route_stats}):
+        requests = _route_stats[(prompt_type, "requests")]
+        validated = _route_stats[(prompt_type, "validated")]
+        stats[prompt_type] = {
+            "requests": requests,
+            "mean_seconds": _route_stats[(prompt_type, "seconds")] / requests if requests else 0.0,
+            "over_budget": _route_stats[(prompt_type, "over_budget")],
+            "hedge_rate": _route_stats[(prompt_type, "hedged")] / requests if requests else 0.0,
+            "escalation_rate": _route_stats[(prompt_type, "escalated")] / validated if validated else 0.0,
+        }
+    return stats
@@ -0,0 +1,270 @@
+"""
+Occupancy bitmap of every doctor's working days, for "anything Tuesday afternoon with
+whoever's free" questions.
+
+busy[doctor, day, cell] is True when any part of the cell (RESOLUTION_MINUTES of working
+hours) is booked. find_slots() answers "the first N free slots across all doctors" with a
+sliding-window sum over the cells of every doctor at once, instead of walking each
+doctor's bookings.
+
+    index = get_occupancy()
+    index.find_slots(30, window=(tuesday_noon, tuesday_five), limit=3)
+    -> [("anna", datetime(..., 12, 0), datetime(..., 12, 30)), ("kim", ...), ...]
+"""
+import math
+import threading
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+
+import numpy as np
+
+import file_storage
+from file_storage import BOOKING_WINDOW_DAYS, WORKING_HOURS_END, WORKING_HOURS_START, doctor_name_from_file
+from schedule_client import get_schedule_client
+from log import get_logger
+
+logger = get_logger(__name__)
+
+RESOLUTION_MINUTES = 5
+# Candidate appointment starts are offered every this many minutes
+DEFAULT_STEP_MINUTES = 15
+SEARCH_CHUNK_DAYS = 7
+# With SCHEDULE_SERVICE set the index is rebuilt from the service at most this often;
+# a booking made since is still caught by validate_appointment_time
+SERVICE_REFRESH_SECONDS = 5.0
+
+
+def minute_of_day(value) -> int:
+    return value.hour * 60 + value.minute
+
+
+def _minutes(duration) -> int:
+    return int(duration.total_seconds() // 60) if isinstance(duration, timedelta) else int(duration)
+
+
+class OccupancyIndex:
+    """
+    busy[doctor, day, cell] for `days` days from start_day, working hours only. Rows are
+    replaced whole (set_booked) and the arrays are never modified in place, so a query
+    running in another thread always sees a consistent snapshot.
+    """
+
+    def __init__(self, doctors: list, start_day: date, days: int, resolution: int = RESOLUTION_MINUTES):
+        day_minutes = minute_of_day(WORKING_HOURS_END) - minute_of_day(WORKING_HOURS_START)
+        if day_minutes % resolution:
+            raise ValueError(f"working hours don't divide into {resolution} minute cells")
+        self.doctors = list(doctors)
+        self.start_day = start_day
+        self.days = days
+        self.resolution = resolution
+        self.cells_per_day = day_minutes // resolution
+        self.busy = np.zeros((len(self.doctors), days, self.cells_per_day), dtype=bool)
+        self.versions = {}
+        self._rows = {doctor: row for row, doctor in enumerate(self.doctors)}
+        self._cumulative = None
+
+    @classmethod
+    def from_booked(cls, booked_by_doctor: dict, start_day: date, days: int, resolution: int = RESOLUTION_MINUTES):
+        """{doctor: get_booked_intervals output} -> index; a cell is busy if a booking touches any of it."""
+        index = cls(list(booked_by_doctor), start_day, days, resolution)
+        rows, day_offsets, first, last = index._cell_ranges(booked_by_doctor.values())
+        index.busy = index._fill(rows, day_offsets, first, last)
+        return index
+
+    @classmethod
+    def from_free(cls, free_by_doctor: dict, start_day: date, days: int, resolution: int = RESOLUTION_MINUTES):
+        """{doctor: [(start_dt, end_dt), ...]} of free time (get_free_slots) -> index; only whole free cells count."""
+        index = cls(list(free_by_doctor), start_day, days, resolution)
+        by_day = []
+        for intervals in free_by_doctor.values():
+            days_of_doctor = {}
+            for start_dt, end_dt in intervals:
+                days_of_doctor.setdefault(start_dt.date().isoformat(), []).append((start_dt, end_dt))
+            by_day.append(days_of_doctor)
+        rows, day_offsets, first, last = index._cell_ranges(by_day, outward=False)
+        index.busy = ~index._fill(rows, day_offsets, first, last)
+        return index
+
+    def _cell_ranges(self, booked_by_doctor, outward: bool = True):
+        """Cell ranges [first, last) per interval as arrays; outward rounds partial cells in."""
+        rows, day_offsets, starts, ends = [], [], [], []
+        for row, booked in enumerate(booked_by_doctor):
+            for date_str, intervals in booked.items():
+                offset = (date.fromisoformat(date_str) - self.start_day).days
+                if not 0 <= offset < self.days:
+                    continue
+                for start_dt, end_dt in intervals:
+                    rows.append(row)
+                    day_offsets.append(offset)
+                    starts.append(minute_of_day(start_dt))
+                    # A booking ending at midnight ends after the working day
+                    ends.append(minute_of_day(end_dt) if end_dt.date() == start_dt.date() else 24 * 60)
+        day_start = minute_of_day(WORKING_HOURS_START)
+        starts = np.asarray(starts, dtype=np.int32) - day_start
+        ends = np.asarray(ends, dtype=np.int32) - day_start
+        if outward:
+            first, last = starts // self.resolution, -(-ends // self.resolution)
+        else:
+            first, last = -(-starts // self.resolution), ends // self.resolution
+        first = np.clip(first, 0, self.cells_per_day)
+        last = np.clip(last, 0, self.cells_per_day)
+        return np.asarray(rows, dtype=np.intp), np.asarray(day_offsets, dtype=np.intp), first, last
+
+    def _fill(self, rows, day_offsets, first, last, doctors: int = None) -> np.ndarray:
+        """Cells covered by any [first, last) range: +1/-1 at the edges, then a running sum."""
+        doctors = len(self.doctors) if doctors is None else doctors
+        keep = last > first
+        edges = np.zeros((doctors, self.days, self.cells_per_day + 1), dtype=np.int32)
+        np.add.at(edges, (rows[keep], day_offsets[keep], first[keep]), 1)
+        np.add.at(edges, (rows[keep], day_offsets[keep], last[keep]), -1)
+        return np.cumsum(edges[..., :-1], axis=2) > 0
+
+    def set_booked(self, doctor: str, booked: dict):
+        """Replace one doctor's row with their get_booked_intervals output."""
+        _, day_offsets, first, last = self._cell_ranges([booked])
+        row = self._fill(np.zeros(len(first), dtype=np.intp), day_offsets, first, last, doctors=1)
+        busy = self.busy.copy()
+        busy[self._rows[doctor]] = row[0]
+        self.busy = busy
+
+    def cumulative(self) -> np.ndarray:
+        """Busy cells before each cell boundary, per doctor-day; (doctors, days, cells + 1)."""
+        busy = self.busy
+        cached = self._cumulative
+        if cached is not None and cached[0] is busy:
+            return cached[1]
+        cumulative = np.zeros(busy.shape[:2] + (self.cells_per_day + 1,), dtype=np.int16)
+        np.cumsum(busy, axis=2, out=cumulative[..., 1:])
+        # Keyed on the busy array it was computed from, which set_booked replaces
+        self._cumulative = (busy, cumulative)
+        return cumulative
+
+    def _day_start(self, offset: int) -> datetime:
+        return datetime.combine(self.start_day + timedelta(days=offset), WORKING_HOURS_START)
+
+    def find_slots(self, duration, window: tuple = None, doctors: list = None, limit: int = 10,
+                   step: int = DEFAULT_STEP_MINUTES) -> list:
+        """
+        The first `limit` free [start, start + duration) slots, earliest first and in doctor
+        order at the same start. duration is minutes or a timedelta; window is an optional
+        (start_dt, end_dt) the slot has to fit in; doctors restricts the search (default:
+        anyone); starts are on the `step` minute grid from the start of the working day.
+        Returns [(doctor, start_dt, end_dt), ...].
+        """
+        minutes = _minutes(duration)
+        cells = math.ceil(minutes / self.resolution)
+        step_cells = max(1, _minutes(step) // self.resolution)
+        if minutes <= 0 or cells > self.cells_per_day or not self.doctors:
+            return []
+
+        first_day, last_day = 0, self.days
+        if window is not None:
+            first_day = max(first_day, (window[0].date() - self.start_day).days)
+            last_day = min(last_day, (window[1].date() - self.start_day).days + 1)
+        if first_day >= last_day:
+            return []
+
+        rows = slice(None) if doctors is None else [self._rows[d] for d in doctors if d in self._rows]
+        names = self.doctors if doctors is None else [self.doctors[row] for row in rows]
+        if not names:
+            return []
+        cumulative = self.cumulative()
+        starts = np.arange(0, self.cells_per_day - cells + 1, step_cells)
+        slots = []
+        # The first slots are usually in the first days; later days are only searched if needed
+        for chunk_start in range(first_day, last_day, SEARCH_CHUNK_DAYS):
+            chunk = cumulative[rows, chunk_start:min(last_day, chunk_start + SEARCH_CHUNK_DAYS)]
+            # free[doctor, day, start]: no busy cell in [start, start + cells)
+            free = chunk[..., starts + cells] - chunk[..., starts] == 0
+
+            if window is not None:
+                # Minutes from the chunk's first working-day start to each candidate start
+                start_minutes = np.arange(free.shape[1])[:, None] * 24 * 60 + starts[None, :] * self.resolution
+                origin = self._day_start(chunk_start)
+                after = (window[0] - origin).total_seconds() / 60
+                before = (window[1] - origin).total_seconds() / 60 - minutes
+                free &= ((start_minutes >= after) & (start_minutes <= before))[None]
+
+            # (day, start, doctor) order is chronological, doctors in index order at the same time
+            found = np.flatnonzero(free.transpose(1, 2, 0))[:limit - len(slots)]
+            day, start, doctor = np.unravel_index(found, (free.shape[1], free.shape[2], free.shape[0]))
+            for d, s, r in zip(day.tolist(), start.tolist(), doctor.tolist()):
+                start_dt = self._day_start(chunk_start + d) + timedelta(minutes=int(starts[s]) * self.resolution)
+                slots.append((names[r], start_dt, start_dt + timedelta(minutes=minutes)))
+            if len(slots) >= limit:
+                break
+        return slots
+
+    def free_doctors(self, start_dt: datetime, end_dt: datetime, doctors: list = None) -> list:
+        """Doctors with nothing booked in [start_dt, end_dt); empty outside working hours or the index."""
+        offset = (start_dt.date() - self.start_day).days
+        if not 0 <= offset < self.days or not file_storage.is_within_working_hours(start_dt, end_dt):
+            return []
+        day_start = minute_of_day(WORKING_HOURS_START)
+        first = (minute_of_day(start_dt) - day_start) // self.resolution
+        last = -(-(minute_of_day(end_dt) - day_start) // self.resolution)
+        cumulative = self.cumulative()[:, offset]
+        free = cumulative[:, last] - cumulative[:, first] == 0
+        names = [self.doctors[row] for row in np.flatnonzero(free).tolist()]
+        return names if doctors is None else [name for name in names if name in doctors]
+
+    def least_booked(self, doctors: list, day: date):
+        """Of `doctors`, the one with the fewest booked cells on `day` (index order on ties), or None."""
+        offset = (day - self.start_day).days
+        rows = sorted(self._rows[doctor] for doctor in doctors if doctor in self._rows)
+        if not rows:
+            return None
+        if not 0 <= offset < self.days:
+            return self.doctors[rows[0]]
+        load = self.busy[rows, offset].sum(axis=1)
+        return self.doctors[rows[int(np.argmin(load))]]
+
+
+_occupancy = None
+_occupancy_lock = threading.Lock()
+# (monotonic time built, index) of the service-mode index
+_service_occupancy = None
+
+
+def get_occupancy(start_day: date = None, days: int = BOOKING_WINDOW_DAYS) -> OccupancyIndex:
+    """
+    Index of data/schedule from start_day (default today). Only the rows of doctors whose
+    schedule file changed since the last call are rebuilt. With SCHEDULE_SERVICE set it is
+    built from the service's free slots, at most every SERVICE_REFRESH_SECONDS. Blocking:
+    async callers run it in asyncio.to_thread.
+    """
+    global _occupancy, _service_occupancy
+    start_day = start_day or date.today()
+    client = get_schedule_client()
+    if client is not None:
+        with _occupancy_lock:
+            cached = _service_occupancy
+            if cached is not None and cached[1].start_day == start_day and cached[1].days == days \
+                    and monotonic() - cached[0] < SERVICE_REFRESH_SECONDS:
+                return cached[1]
+            index = OccupancyIndex.from_free(client.free_slots(datetime.combine(start_day, time(0)), days), start_day, days)
+            _service_occupancy = (monotonic(), index)
+            return index
+
+    with _occupancy_lock:
+        booked_by_doctor = {}
+        versions = {}
+        for file_name in file_storage.get_all_doctor_files():
+            try:
+                versions[file_name], booked_by_doctor[file_name] = file_storage.schedule_cache.get_booked_version(file_name)
+            except Exception as e:
+                logger.warning("failed to load schedule", extra={"file": file_name, "error": str(e)})
+        doctors = [doctor_name_from_file(file_name) for file_name in booked_by_doctor]
+
+        index = _occupancy
+        if index is None or (index.start_day, index.days, index.doctors) != (start_day, days, doctors):
+            index = OccupancyIndex.from_booked(
+                {doctor: booked for doctor, booked in zip(doctors, booked_by_doctor.values())}, start_day, days
+            )
+        else:
+            for doctor, file_name in zip(doctors, booked_by_doctor):
+                if index.versions.get(file_name) != versions[file_name]:
+                    index.set_booked(doctor, booked_by_doctor[file_name])
+        index.versions = versions
+        _occupancy = index
+        return index
@@ -1,21 +1,194 @@
 # phone_agent/openai_client.py
-import os
-import uuid
-from openai import OpenAI
+import re
+import httpx
+import openai
+from openai import AsyncOpenAI
 from config import config
+from llm_cache import get_llm_cache
+from metrics import count_llm_call
+from resilience import bounded, get_breaker, timeout_for
+
+DEFAULT_MODEL = "gpt-4"
+# json_schema response formats need gpt-4o or later
+STRUCTURED_OUTPUT_MODEL = "gpt-4o"
+SYSTEM_PROMPT = "You are a helpful and accurate medical secretary with expertise in health insurance"
+
+# A sentence ends at . ! ? followed by whitespace, or at a newline
+SENTENCE_END_REGEX = re.compile(r"[.!?](?=\s)|\n")
+# Abbreviations that end in a period but don't end the sentence
+ABBREVIATIONS = ("dr.", "mr.", "mrs.", "ms.", "a.m.", "p.m.", "st.", "ave.")
+MIN_SENTENCE_CHARS = 20
+# Failures that say something about OpenAI's health and count against its circuit breaker;
+# APITimeoutError is an APIConnectionError
+UPSTREAM_ERRORS = (openai.APIConnectionError, openai.InternalServerError, openai.RateLimitError)
+
+
+class SentenceBuffer:
+    """Accumulates streamed text and releases it one complete sentence at a time."""
+
+    def __init__(self):
+        self.text = ""
+
+    def feed(self, delta: str) -> list:
+        self.text += delta
+        sentences = []
+        search_from = 0
+        while True:
+            match = SENTENCE_END_REGEX.search(self.text, search_from)
+            if match is None:
+                break
+            end = match.end()
+            candidate = self.text[:end]
+            last_word = candidate.rsplit(None, 1)[-1].lower() if candidate.strip() else ""
+            if len(candidate.strip()) < MIN_SENTENCE_CHARS or last_word in ABBREVIATIONS:
+                search_from = end
+                continue
+            sentences.append(candidate.strip())
+            self.text = self.text[end:]
+            search_from = 0
+        return sentences
+
+    def flush(self) -> list:
+        rest, self.text = self.text.strip(), ""
+        return [rest] if rest else []
+
 
 class OpenAIClient:
-    def __init__(self, api_key, audio_dir, host_url):
-        self.client = OpenAI(api_key=api_key)
+    """
+    Async OpenAI client on a pooled, keep-alive httpx connection pool.
+    One instance is shared per worker process (see get_openai_client) so every
+    session reuses the same warm connections instead of opening its own.
+    """
+
+    def __init__(self, api_key, audio_dir, host_url, openai_config=None):
+        openai_config = openai_config or config.openai
+        self.request_timeout = openai_config.request_timeout
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=openai_config.max_connections,
+                max_keepalive_connections=openai_config.max_keepalive_connections,
+                keepalive_expiry=openai_config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(openai_config.request_timeout, connect=openai_config.connect_timeout),
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=openai_config.base_url,
+            http_client=self.http_client,
+            max_retries=openai_config.max_retries,
+        )
         self.audio_dir = audio_dir
         self.host_url = host_url
 
-    def chat_response(self, user_text: str) -> str:
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a helpful and accurate medical secretary with expertise in health insurance"},
+    async def complete(self, messages: list, model: str = DEFAULT_MODEL, timeout: float = None,
+                       prompt_type: str = None, response_format: dict = None, max_tokens: int = None,
+                       max_retries: int = None) -> str:
+        """
+        prompt_type names the prompt template (e.g. "phone", "availability"). When it is
+        given, results are memoized in the LLM cache keyed on the final user message.
+        response_format is passed through, e.g. {"type": "json_object"} for structured output.
+        max_tokens caps the reply (see model_router for the per-prompt caps). max_retries
+        overrides the client's SDK retries, e.g. 0 when the caller has its own fallback.
+        Inside a turn the timeout is capped at the turn deadline; raises CircuitOpenError
+        while OpenAI's circuit breaker is open.
+        """
+        cache = get_llm_cache()
+        cache_input = messages[-1]["content"]
+        cached = cache.get(prompt_type, model, cache_input)
+        if cached is not None:
+            return cached
+
+        timeout = timeout_for(timeout or self.request_timeout, "openai")
+        count_llm_call()
+        client = self.client if max_retries is None else self.client.with_options(max_retries=max_retries)
+        with get_breaker("openai").guard(UPSTREAM_ERRORS):
+            response = await bounded(client.chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=timeout,
+                **({"response_format": response_format} if response_format else {}),
+                **({"max_tokens": max_tokens} if max_tokens else {}),
+            ), "openai")
+        content = response.choices[0].message.content.strip()
+        cache.set(prompt_type, model, cache_input, content)
+        return content
+
+    async def stream_complete(self, messages: list, model: str = DEFAULT_MODEL, timeout: float = None,
+                              prompt_type: str = None, max_tokens: int = None):
+        """
+        Like complete(), but yields the reply one sentence at a time as tokens arrive so
+        text-to-speech can start on the first sentence instead of the full completion.
+        """
+        cache = get_llm_cache()
+        cache_input = messages[-1]["content"]
+        cached = cache.get(prompt_type, model, cache_input)
+        buffer = SentenceBuffer()
+        if cached is not None:
+            for sentence in buffer.feed(cached) + buffer.flush():
+                yield sentence
+            return
+
+        timeout = timeout_for(timeout or self.request_timeout, "openai")
+        count_llm_call()
+        with get_breaker("openai").guard(UPSTREAM_ERRORS):
+            stream = await bounded(self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                timeout=timeout,
+                stream=True,
+                **({"max_tokens": max_tokens} if max_tokens else {}),
+            ), "openai")
+        parts = []
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            parts.append(delta)
+            for sentence in buffer.feed(delta):
+                yield sentence
+        for sentence in buffer.flush():
+            yield sentence
+        cache.set(prompt_type, model, cache_input, "".join(parts).strip())
+
+    async def stream_chat_response(self, user_text: str, model: str = DEFAULT_MODEL, timeout: float = None,
+                                   prompt_type: str = None, max_tokens: int = None):
+        async for sentence in self.stream_complete(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_text}
+            ],
+            model=model,
+            timeout=timeout,
+            prompt_type=prompt_type,
+            max_tokens=max_tokens,
+        ):
+            yield sentence
+
+    async def chat_response(self, user_text: str, model: str = DEFAULT_MODEL, timeout: float = None,
+                            prompt_type: str = None, response_format: dict = None, max_tokens: int = None,
+                            max_retries: int = None) -> str:
+        return await self.complete(
+            [
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": user_text}
-            ]
+            ],
+            model=model,
+            timeout=timeout,
+            prompt_type=prompt_type,
+            response_format=response_format,
+            max_tokens=max_tokens,
+            max_retries=max_retries,
         )
-        return response.choices[0].message.content.strip()
+
+    async def aclose(self):
+        await self.client.close()
+
+
+_openai_client = None
+
+
+def get_openai_client() -> OpenAIClient:
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAIClient(config.openai.api_key, config.audiodir, config.hosturl)
+    return _openai_client
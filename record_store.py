@@ -0,0 +1,308 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+from config import config
+from log import get_logger
+
+logger = get_logger(__name__)
+
+
+PATIENT_FIELDS = ['insurance_payer', 'insurance_id', 'topic_of_call', 'phone', 'email', 'last_name', 'first_name']
+UPDATABLE_FIELDS = ['insurance_payer', 'insurance_id', 'topic_of_call', 'phone', 'email']
+
+
+class CorruptRecordStoreError(Exception):
+    pass
+
+
+class RecordStore:
+    """
+    Storage backend for patient records.
+
+    A record is keyed by "last_name#first_name" and holds the PATIENT_FIELDS plus a list
+    of appointments. upsert_patient() creates the record or updates the UPDATABLE_FIELDS
+    and appends the appointment if the patient doesn't already have it.
+    """
+
+    def upsert_patient(self, key: str, record: dict, appointment: dict) -> bool:
+        raise NotImplementedError
+
+    def get_patient(self, key: str):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class JsonRecordStore(RecordStore):
+    """The original layout: every patient in one JSON file, rewritten on each upsert."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError as e:
+                # Never fall back to {} here, the next write would wipe every patient
+                raise CorruptRecordStoreError(f"Corrupt patient records file {self.path}: {e}")
+
+    def _dump(self, records: dict):
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".patient_records.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(records, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def upsert_patient(self, key: str, record: dict, appointment: dict) -> bool:
+        with self._lock:
+            records = self._load()
+            if key in records:
+                patient = records[key]
+                for field in UPDATABLE_FIELDS:
+                    patient[field] = record[field]
+
+                # Avoid duplicate appointments
+                if appointment not in patient.get('appointments', []):
+                    patient.setdefault('appointments', []).append(appointment)
+                logger.debug("updated patient record")
+            else:
+                records[key] = {**{field: record[field] for field in PATIENT_FIELDS}, 'appointments': [appointment]}
+                logger.debug("created patient record")
+            self._dump(records)
+        return True
+
+    def get_patient(self, key: str):
+        with self._lock:
+            return self._load().get(key)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+
+class SqliteRecordStore(RecordStore):
+    """
+    SQLite backend in WAL mode. An upsert touches one patient row and one appointment
+    row inside a single transaction, so its cost doesn't grow with the number of patients.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS patients (
+            key TEXT PRIMARY KEY,
+            first_name TEXT,
+            last_name TEXT,
+            insurance_payer TEXT,
+            insurance_id TEXT,
+            topic_of_call TEXT,
+            phone TEXT,
+            email TEXT
+        );
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_key TEXT NOT NULL REFERENCES patients(key),
+            appointment TEXT NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS appointments_patient_key
+            ON appointments (patient_key, appointment);
+        CREATE TABLE IF NOT EXISTS meta (
+            name TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate_field_encoding()
+
+    @staticmethod
+    def _encode_fields(record: dict) -> list:
+        # Values are stored as JSON: some fields (e.g. insurance_payer) are name dicts
+        return [json.dumps(record.get(field)) for field in PATIENT_FIELDS]
+
+    @staticmethod
+    def _decode_field(value):
+        """A stored field value; rows written before values were JSON hold the plain string."""
+        if value is None:
+            return None
+        try:
+            decoded = json.loads(value)
+        except (TypeError, ValueError):
+            return value
+        # json.dumps of a field is always a string, an object or null: "12345" is a plain value
+        return decoded if decoded is None or isinstance(decoded, (str, dict, list)) else value
+
+    def _migrate_field_encoding(self):
+        """Re-encode plain field values as JSON, once per database (recorded in meta)."""
+        marker = "field_encoding"
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+                return
+            # Workers opening a fresh database together: take the write lock, then check again
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+                    self._conn.execute("COMMIT")
+                    return
+                rows = self._conn.execute(f"SELECT key, {', '.join(PATIENT_FIELDS)} FROM patients").fetchall()
+                updates = [
+                    [json.dumps(self._decode_field(value)) for value in values] + [key]
+                    for key, *values in rows
+                ]
+                assignments = ", ".join(f"{field} = ?" for field in PATIENT_FIELDS)
+                self._conn.executemany(f"UPDATE patients SET {assignments} WHERE key = ?", updates)
+                self._conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES (?, 'json')", (marker,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if rows:
+            logger.info("re-encoded patient fields as JSON", extra={"records": len(rows)})
+
+    @staticmethod
+    def _encode_appointment(appointment: dict) -> str:
+        # Canonical form so the unique index catches the same appointment twice
+        return json.dumps(appointment, sort_keys=True)
+
+    def upsert_patient(self, key: str, record: dict, appointment: dict) -> bool:
+        columns = ", ".join(PATIENT_FIELDS)
+        placeholders = ", ".join("?" for _ in PATIENT_FIELDS)
+        updates = ", ".join(f"{field} = excluded.{field}" for field in UPDATABLE_FIELDS)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"INSERT INTO patients (key, {columns}) VALUES (?, {placeholders}) "
+                    f"ON CONFLICT(key) DO UPDATE SET {updates}",
+                    [key] + self._encode_fields(record),
+                )
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO appointments (patient_key, appointment) VALUES (?, ?)",
+                    (key, self._encode_appointment(appointment)),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def get_patient(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(PATIENT_FIELDS)} FROM patients WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            appointments = self._conn.execute(
+                "SELECT appointment FROM appointments WHERE patient_key = ? ORDER BY id", (key,)
+            ).fetchall()
+        patient = {field: self._decode_field(value) for field, value in zip(PATIENT_FIELDS, row)}
+        patient['appointments'] = [json.loads(a) for (a,) in appointments]
+        return patient
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+
+    def get_meta(self, name: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def import_records(self, records: dict) -> int:
+        """Bulk load records in the JSON layout ({key: {...fields, appointments: [...]}}) in one transaction."""
+        patient_rows = []
+        appointment_rows = []
+        for key, patient in records.items():
+            patient_rows.append([key] + self._encode_fields(patient))
+            for appointment in patient.get('appointments', []):
+                appointment_rows.append((key, self._encode_appointment(appointment)))
+
+        columns = ", ".join(PATIENT_FIELDS)
+        placeholders = ", ".join("?" for _ in PATIENT_FIELDS)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO patients (key, {columns}) VALUES (?, {placeholders})", patient_rows
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO appointments (patient_key, appointment) VALUES (?, ?)", appointment_rows
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(patient_rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_path: str, store: SqliteRecordStore) -> int:
+    """
+    One-time import of the JSON patient records file into the SQLite store.
+    Recorded in the meta table so it never runs twice; returns the number of patients imported.
+    """
+    marker = f"migrated_from:{os.path.abspath(json_path)}"
+    if store.get_meta(marker) or not os.path.exists(json_path):
+        return 0
+
+    records = JsonRecordStore(json_path)._load()
+    imported = store.import_records(records)
+    store.set_meta(marker, str(imported))
+    logger.info("migrated patient records", extra={"records": imported, "source": json_path})
+    return imported
+
+
+_record_store = None
+_record_store_lock = threading.Lock()
+
+
+def create_record_store(backend: str, json_path: str, sqlite_path: str) -> RecordStore:
+    match backend:
+        case "json":
+            return JsonRecordStore(json_path)
+        case "sqlite":
+            store = SqliteRecordStore(sqlite_path)
+            migrate_json_to_sqlite(json_path, store)
+            return store
+        case _:
+            raise ValueError(f"Unknown patient record store: {backend}")
+
+
+def get_record_store() -> RecordStore:
+    global _record_store
+    with _record_store_lock:
+        if _record_store is None:
+            _record_store = create_record_store(
+                config.storage.patient_store,
+                config.storage.patient_records_json,
+                config.storage.patient_records_db,
+            )
+        return _record_store
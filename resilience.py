@@ -0,0 +1,226 @@
+"""
+Deadlines, hedged requests and circuit breakers for the outbound calls.
+
+Every caller turn runs under turn_deadline(); upstream calls take their timeout from
+timeout_for() and are bounded by bounded(), so a slow upstream can only spend what is left
+of the turn. Each upstream has a CircuitBreaker (get_breaker): after failure_threshold
+consecutive failures it opens and calls fail fast with CircuitOpenError, so the caller gets
+a fallback answer right away, until reset_timeout has passed and one probe request is let
+through again.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge
+
+from config import config
+from log import get_logger
+
+logger = get_logger(__name__)
+
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state", "Circuit breaker state per upstream: 0 closed, 1 half open, 2 open", ["upstream"],
+    multiprocess_mode="max",
+)
+CIRCUIT_REJECTED = Counter(
+    "circuit_breaker_rejected", "Calls failed fast because the upstream's circuit was open", ["upstream"]
+)
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class DeadlineExceeded(Exception):
+    """The turn's deadline passed before the upstream answered."""
+
+
+class CircuitOpenError(Exception):
+    """The upstream's circuit is open; the call was not attempted."""
+
+
+_deadline = ContextVar("turn_deadline", default=None)
+
+
+@contextmanager
+def turn_deadline(seconds: float):
+    """Calls made inside (and in tasks started inside) must finish within `seconds`; 0 or None is no deadline."""
+    deadline = time.monotonic() + seconds if seconds else None
+    outer = _deadline.get()
+    if outer is not None and (deadline is None or outer < deadline):
+        deadline = outer
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left of the current turn, None outside of one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def timeout_for(default: float = None, upstream: str = "upstream") -> float:
+    """`default` capped at what is left of the turn; raises DeadlineExceeded once nothing is left."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded(f"no time left for {upstream}")
+    return min(default, left) if default else left
+
+
+async def bounded(awaitable, upstream: str = "upstream"):
+    """Await with a hard stop at the turn deadline, retries and slow reads included."""
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(left, 0))
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(f"{upstream} ran past the turn deadline") from e
+
+
+async def hedged(request, hedge_after: float = None):
+    """
+    Await request(); if it hasn't answered after hedge_after seconds, send a second copy and
+    return whichever answers first, cancelling the other. Returns (result, winner) where
+    winner is None when no hedge was sent, otherwise "primary" or "hedge". Only for
+    idempotent requests.
+    """
+    primary = asyncio.ensure_future(request())
+    if hedge_after is None:
+        return await primary, None
+    hedge = None
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result(), None
+        hedge = asyncio.ensure_future(request())
+        pending = {primary, hedge}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), "primary" if task is primary else "hedge"
+        # Both copies failed
+        raise primary.exception()
+    finally:
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+class LatencyTracker:
+    """Recent latencies per key; percentile() is None until min_samples have been seen."""
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._samples = {}
+
+    def observe(self, key, seconds: float):
+        self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key, q: float, min_samples: int = 20):
+        samples = self._samples.get(key, ())
+        if len(samples) < max(min_samples, 1):
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    closed -> open after failure_threshold consecutive failures; open -> half_open once
+    reset_timeout has passed, which lets a single probe through; the probe closes the
+    circuit again or reopens it. Safe to share between the event loop and worker threads.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(0)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("circuit breaker state change", extra={"upstream": self.name, "from": self.state, "to": state})
+            self.state = state
+            CIRCUIT_STATE.labels(self.name).set(CIRCUIT_STATES[state])
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls would be rejected without a probe."""
+        return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def before_call(self):
+        """Raises CircuitOpenError unless the call may go ahead."""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    CIRCUIT_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(f"{self.name} circuit is open")
+                self._set_state("half_open")
+            if self.state == "half_open":
+                if self._probing:
+                    CIRCUIT_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(f"{self.name} circuit is half open, a probe is in flight")
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state("open")
+
+    def release(self):
+        """The call ended without telling us anything about the upstream (cancelled, or a client-side error)."""
+        with self._lock:
+            self._probing = False
+
+    @contextmanager
+    def guard(self, failures: tuple = (Exception,)):
+        """Wrap one upstream call; exceptions of the `failures` types count against the upstream."""
+        self.before_call()
+        try:
+            yield
+        except failures:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                upstream,
+                failure_threshold=config.resilience.breaker_failures,
+                reset_timeout=config.resilience.breaker_reset_seconds,
+            )
+            _breakers[upstream] = breaker
+        return breaker
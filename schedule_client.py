@@ -0,0 +1,129 @@
+import json
+import socket
+import threading
+import uuid
+import zlib
+from datetime import datetime
+
+from config import config
+
+
+class ScheduleServiceError(Exception):
+    pass
+
+
+def shard_for(doctor_name: str, shard_count: int) -> int:
+    """Stable doctor -> shard mapping, shared by the service and its clients."""
+    return zlib.crc32(doctor_name.lower().encode("utf-8")) % shard_count
+
+
+def parse_address(address: str):
+    """"unix:/path/to.sock" or "tcp:host:port" (a bare "host:port" is TCP too)."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.removeprefix("tcp:").rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def _decode_intervals(intervals: list) -> list:
+    return [(datetime.fromisoformat(start), datetime.fromisoformat(end)) for start, end in intervals]
+
+
+class ScheduleClient:
+    """
+    Blocking client for schedule_service, one request per line of JSON; the agent calls it
+    from asyncio.to_thread, never on the event loop. Every thread keeps its own connection
+    to each shard so concurrent requests don't share a socket. Doctors are routed to shards with shard_for(); availability fans out to all.
+    """
+
+    def __init__(self, addresses: list, timeout: float = 5.0):
+        self.addresses = addresses
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self, shard: int):
+        connections = self._local.__dict__.setdefault("connections", {})
+        if shard not in connections:
+            family, address = parse_address(self.addresses[shard])
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(address)
+            connections[shard] = (sock, sock.makefile("rb"))
+        return connections[shard]
+
+    def _drop_connection(self, shard: int):
+        sock, reader = self._local.__dict__.get("connections", {}).pop(shard)
+        reader.close()
+        sock.close()
+
+    def _request(self, shard: int, request: dict):
+        payload = json.dumps(request).encode("utf-8") + b"\n"
+        for attempt in (1, 2):
+            reused = shard in self._local.__dict__.get("connections", {})
+            sock, reader = self._connection(shard)
+            try:
+                sock.sendall(payload)
+                line = reader.readline()
+                if not line:
+                    raise ConnectionResetError("schedule service closed the connection")
+                break
+            except OSError as e:
+                self._drop_connection(shard)
+                # Only a kept-alive connection the service closed (a restart) is retried. A
+                # timeout may come after the service acted on the request, so it is not; a
+                # retried booking is deduplicated by its request_id either way.
+                if attempt == 2 or not reused or isinstance(e, TimeoutError):
+                    raise
+        response = json.loads(line)
+        if response.get("ok"):
+            return response["result"]
+        if response.get("type") == "FileNotFoundError":
+            raise FileNotFoundError(response["error"])
+        raise ScheduleServiceError(response.get("error", "unknown error"))
+
+    def _shard(self, doctor_name: str) -> int:
+        return shard_for(doctor_name, len(self.addresses))
+
+    def free_slots(self, start: datetime, days: int) -> dict:
+        free_slots = {}
+        for shard in range(len(self.addresses)):
+            result = self._request(shard, {"op": "free_slots", "start": start.isoformat(), "days": days})
+            for doctor_name, intervals in result.items():
+                free_slots[doctor_name] = _decode_intervals(intervals)
+        return dict(sorted(free_slots.items()))
+
+    def booked(self, doctor_name: str) -> dict:
+        result = self._request(self._shard(doctor_name), {"op": "booked", "doctor": doctor_name})
+        return {date_str: _decode_intervals(intervals) for date_str, intervals in result.items()}
+
+    def book(self, doctor_name: str, start_dt: datetime, end_dt: datetime, slot: dict):
+        booked, appointment_id = self._request(self._shard(doctor_name), {
+            "op": "book",
+            # The service answers a repeated request_id with the first result instead of booking again
+            "request_id": str(uuid.uuid4()),
+            "doctor": doctor_name,
+            "start": start_dt.isoformat(),
+            "end": end_dt.isoformat(),
+            "slot": slot,
+        })
+        return booked, appointment_id
+
+    def close(self):
+        for shard in list(self._local.__dict__.get("connections", {})):
+            self._drop_connection(shard)
+
+
+_schedule_client = None
+_schedule_client_lock = threading.Lock()
+
+
+def get_schedule_client():
+    """The client for SCHEDULE_SERVICE, or None when schedules are read from local files."""
+    global _schedule_client
+    address = config.scheduling.service_address
+    if not address:
+        return None
+    with _schedule_client_lock:
+        if _schedule_client is None or _schedule_client.addresses != address.split(","):
+            _schedule_client = ScheduleClient(address.split(","), config.scheduling.timeout)
+        return _schedule_client
@@ -0,0 +1,244 @@
+"""
+Single-writer scheduling service. Owns the doctor schedules of one shard in memory, answers
+availability and booking requests from every worker process, and writes changed schedules
+back to data/schedule/*.json in the background.
+
+    python schedule_service.py --listen unix:/tmp/schedule.sock
+    python schedule_service.py --listen tcp:0.0.0.0:7400 --shard 0/2
+
+Workers point SCHEDULE_SERVICE at it (comma separated, in shard order, for several shards).
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import file_storage
+from file_storage import (
+    _atomic_write_text, compute_free_intervals, doctor_name_from_file, get_booked_intervals,
+    has_conflict, load_schedule,
+)
+from log import configure_logging, get_logger
+from schedule_client import parse_address, shard_for
+
+# Largest request/response line accepted, free slots for hundreds of doctors fit easily
+MAX_LINE_BYTES = 64 * 1024 * 1024
+# Booking results kept by request_id, so a client retrying a booking gets the first answer
+MAX_REMEMBERED_BOOKINGS = 10000
+# Availability answers kept between bookings; each minute of a quiet day adds a new start
+MAX_CACHED_FREE_SLOTS = 256
+
+logger = get_logger(__name__)
+
+
+class DoctorShard:
+    """One doctor's schedule plus its booked-interval index, kept in sync on every booking."""
+    __slots__ = ("name", "path", "schedule", "booked", "dirty")
+
+    def __init__(self, name: str, path: str):
+        self.name = name
+        self.path = path
+        self.schedule = load_schedule(path)
+        self.booked = get_booked_intervals(self.schedule)
+        self.dirty = False
+
+
+class ScheduleService:
+    """
+    All state is only touched from the service's event loop, so a conflict check and the
+    booking that follows it can't interleave with another booking: no locks needed.
+    Bookings are acknowledged once they are in memory and flushed to disk every
+    flush_interval seconds; a flush_interval of 0 writes through before replying.
+    """
+
+    def __init__(self, schedule_dir: str, shard_index: int = 0, shard_count: int = 1, flush_interval: float = 0.05):
+        self.schedule_dir = schedule_dir
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.flush_interval = flush_interval
+        self.doctors = {}
+        self.bookings = 0
+        self.flushes = 0
+        self._flush_wakeup = None
+        self._flush_lock = asyncio.Lock()
+        # Encoded availability per (start, days); callers round start to the minute, so the
+        # same answer is asked for many times until the next booking invalidates it
+        self._free_slots_cache = OrderedDict()
+        self._booking_results = OrderedDict()
+        self.reload()
+
+    def reload(self) -> int:
+        """Pick up doctor files of this shard that appeared since the last load."""
+        for file_name in file_storage.ScheduleCache().list_files(self.schedule_dir):
+            name = doctor_name_from_file(file_name)
+            if name not in self.doctors and shard_for(name, self.shard_count) == self.shard_index:
+                self.doctors[name] = DoctorShard(name, file_name)
+        self._free_slots_cache.clear()
+        return len(self.doctors)
+
+    def _doctor(self, doctor_name: str) -> DoctorShard:
+        doctor = self.doctors.get(doctor_name)
+        if doctor is None:
+            raise FileNotFoundError(f"No schedule found for {doctor_name}")
+        return doctor
+
+    def free_slots(self, start: datetime, days: int) -> dict:
+        return {
+            name: compute_free_intervals(doctor.booked, start, days)
+            for name, doctor in sorted(self.doctors.items())
+        }
+
+    def booked(self, doctor_name: str) -> dict:
+        return self._doctor(doctor_name).booked
+
+    def book(self, doctor_name: str, start_dt: datetime, end_dt: datetime, slot: dict):
+        doctor = self._doctor(doctor_name)
+        date_str = start_dt.date().isoformat()
+        if has_conflict(doctor.booked.get(date_str, []), start_dt, end_dt):
+            return False, None
+
+        appointment_id = str(uuid.uuid4())
+        day = doctor.schedule.setdefault(date_str, {})
+        day[appointment_id] = slot
+        # Only the booked day's index changes
+        doctor.booked.update(get_booked_intervals({date_str: day}))
+        doctor.dirty = True
+        self._free_slots_cache.clear()
+        self.bookings += 1
+        if self._flush_wakeup is not None:
+            self._flush_wakeup.set()
+        return True, appointment_id
+
+    async def flush(self):
+        # One flush at a time, so an older copy of a schedule can never land after a newer one
+        async with self._flush_lock:
+            for doctor in self.doctors.values():
+                if not doctor.dirty:
+                    continue
+                doctor.dirty = False
+                # Serialize on the loop so the thread writes a consistent copy
+                text = json.dumps(doctor.schedule, indent=2)
+                try:
+                    await asyncio.to_thread(_atomic_write_text, doctor.path, text)
+                except OSError as e:
+                    doctor.dirty = True
+                    logger.error("failed to write schedule", extra={"doctor": doctor.name, "error": str(e)})
+                self.flushes += 1
+
+    async def _flush_loop(self):
+        self._flush_wakeup = asyncio.Event()
+        while True:
+            await self._flush_wakeup.wait()
+            self._flush_wakeup.clear()
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def handle_request(self, request: dict):
+        match request.get("op"):
+            case "free_slots":
+                key = (request["start"], int(request["days"]))
+                if key in self._free_slots_cache:
+                    self._free_slots_cache.move_to_end(key)
+                    return self._free_slots_cache[key]
+                free_slots = self.free_slots(datetime.fromisoformat(key[0]), key[1])
+                encoded = self._free_slots_cache[key] = {
+                    name: [(start.isoformat(), end.isoformat()) for start, end in intervals]
+                    for name, intervals in free_slots.items()
+                }
+                if len(self._free_slots_cache) > MAX_CACHED_FREE_SLOTS:
+                    self._free_slots_cache.popitem(last=False)
+                return encoded
+            case "booked":
+                return {
+                    date_str: [(start.isoformat(), end.isoformat()) for start, end in intervals]
+                    for date_str, intervals in self.booked(request["doctor"]).items()
+                }
+            case "book":
+                request_id = request.get("request_id")
+                if request_id in self._booking_results:
+                    return self._booking_results[request_id]
+                result = self.book(
+                    request["doctor"],
+                    datetime.fromisoformat(request["start"]),
+                    datetime.fromisoformat(request["end"]),
+                    request["slot"],
+                )
+                if request_id is not None:
+                    self._booking_results[request_id] = result
+                    if len(self._booking_results) > MAX_REMEMBERED_BOOKINGS:
+                        self._booking_results.popitem(last=False)
+                if not self.flush_interval:
+                    await self.flush()
+                return result
+            case "reload":
+                return self.reload()
+            case "stats":
+                return {"doctors": len(self.doctors), "bookings": self.bookings, "flushes": self.flushes}
+            case op:
+                raise ValueError(f"Unknown operation: {op}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    response = {"ok": True, "result": await self.handle_request(json.loads(line))}
+                except Exception as e:
+                    response = {"ok": False, "error": str(e), "type": type(e).__name__}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, address: str, ready: asyncio.Event = None):
+        family, target = parse_address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(target):
+                os.unlink(target)
+            server = await asyncio.start_unix_server(self.handle_connection, target, limit=MAX_LINE_BYTES)
+        else:
+            server = await asyncio.start_server(self.handle_connection, *target, limit=MAX_LINE_BYTES)
+        flusher = asyncio.create_task(self._flush_loop()) if self.flush_interval else None
+        logger.info("schedule service listening", extra={
+            "shard": f"{self.shard_index}/{self.shard_count}", "doctors": len(self.doctors), "listen": address,
+        })
+        if ready is not None:
+            ready.set()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if flusher is not None:
+                flusher.cancel()
+            await self.flush()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--listen", default=os.getenv("SCHEDULE_SERVICE", "unix:/tmp/schedule.sock").split(",")[0])
+    parser.add_argument("--schedule-dir", default=file_storage.SCHEDULE_DIR)
+    parser.add_argument("--shard", default="0/1", help="index/count, e.g. 1/3")
+    parser.add_argument("--flush-interval", type=float, default=0.05)
+    args = parser.parse_args()
+    configure_logging()
+
+    shard_index, shard_count = (int(part) for part in args.shard.split("/"))
+    service = ScheduleService(args.schedule_dir, shard_index, shard_count, args.flush_interval)
+    task = asyncio.create_task(service.serve(args.listen))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, task.cancel)
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
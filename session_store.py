@@ -0,0 +1,127 @@
+import sqlite3
+import threading
+import time
+
+from config import config
+from conversation import SessionState
+
+# A long-running worker drops stale checkpoints at most this often, on save
+EXPIRE_INTERVAL_SECONDS = 600
+
+
+class SessionStore:
+    """
+    Checkpoints of in-progress calls, keyed by call id (the LiveKit room name).
+
+    The call flow saves a checkpoint after every accepted field, so a job that picks the
+    call up on another worker (after a drain or a crash) resumes from the last answered
+    step instead of step 1.
+    """
+
+    def save(self, call_id: str, session: SessionState):
+        raise NotImplementedError
+
+    def load(self, call_id: str):
+        """The last checkpoint of the call, or None."""
+        raise NotImplementedError
+
+    def delete(self, call_id: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store, for tests and single-worker setups. Keeps snapshots, not live objects."""
+
+    def __init__(self):
+        self._snapshots = {}
+
+    def save(self, call_id: str, session: SessionState):
+        self._snapshots[call_id] = session.snapshot()
+
+    def load(self, call_id: str):
+        snapshot = self._snapshots.get(call_id)
+        return SessionState.restore(snapshot) if snapshot is not None else None
+
+    def delete(self, call_id: str):
+        self._snapshots.pop(call_id, None)
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Snapshots in a local SQLite file (WAL), shared by the worker processes on one host.
+    Checkpoints older than ttl_seconds are dropped on open and then every
+    EXPIRE_INTERVAL_SECONDS, those calls are long over.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 86400):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._next_expire = time.monotonic() + EXPIRE_INTERVAL_SECONDS
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (call_id TEXT PRIMARY KEY, snapshot BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        if ttl_seconds:
+            self.expire(ttl_seconds)
+
+    def save(self, call_id: str, session: SessionState):
+        snapshot = session.snapshot()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (call_id, snapshot, updated_at) VALUES (?, ?, ?)",
+                (call_id, snapshot, time.time()),
+            )
+        if self.ttl_seconds and time.monotonic() >= self._next_expire:
+            self._next_expire = time.monotonic() + EXPIRE_INTERVAL_SECONDS
+            self.expire(self.ttl_seconds)
+
+    def load(self, call_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT snapshot FROM sessions WHERE call_id = ?", (call_id,)).fetchone()
+        return SessionState.restore(row[0]) if row else None
+
+    def delete(self, call_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE call_id = ?", (call_id,))
+
+    def expire(self, older_than_seconds: float) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - older_than_seconds,))
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_session_store(backend: str, sqlite_path: str, ttl_seconds: float = 86400) -> SessionStore:
+    match backend:
+        case "memory":
+            return MemorySessionStore()
+        case "sqlite":
+            return SqliteSessionStore(sqlite_path, ttl_seconds)
+        case _:
+            raise ValueError(f"Unknown session store: {backend}")
+
+
+_session_store = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    global _session_store
+    with _session_store_lock:
+        if _session_store is None:
+            _session_store = create_session_store(
+                config.storage.session_store,
+                config.storage.sessions_db,
+                config.storage.session_ttl_seconds,
+            )
+        return _session_store
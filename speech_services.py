@@ -1,34 +1,71 @@
+import asyncio
 import assemblyai as aai
 from config import config
-from helpers import data_extraction, handle_appointment_scheduling
+from helpers import extract_volunteered_fields, handle_appointment_scheduling, next_prompt_type
 from file_storage import add_doctors_appointment, write_patient_record
 from validators import validate_full_address
-from email_service import send_confirmation_email_html
+from email_outbox import enqueue_confirmation_email
+from metrics import record_booking, span, track_call_stats
+from openai_client import UPSTREAM_ERRORS
+from resilience import CircuitOpenError, DeadlineExceeded, turn_deadline
+from log import get_logger
 
-MAX_RETRIES = 3
+logger = get_logger(__name__)
 
-async def on_transcript(text, session_state):
-    print(f"ON_TRANSCRIPT: {text}")
+# A turn that fails on these gets a quick "please repeat" instead of silence or a dropped call
+DEGRADED_ERRORS = (DeadlineExceeded, CircuitOpenError, *UPSTREAM_ERRORS)
+
+
+async def on_transcript(text, session_state, address=None):
+    """
+    Handle one caller turn under the turn deadline. When an upstream is slow, failing or
+    behind an open circuit breaker the turn is answered with a retry marked "degraded",
+    which doesn't spend the caller's retry budget. In the address step, `address` is an
+    already extracted address for this utterance (see validators.AddressHandoff).
+    """
+    with turn_deadline(config.resilience.turn_deadline):
+        try:
+            return await _handle_turn(text, session_state, address)
+        except DEGRADED_ERRORS as e:
+            logger.warning("turn degraded", extra={"state": session_state["state"], "error": f"{type(e).__name__}: {e}"})
+            return {
+                "end_call": False,
+                "retry": True,
+                "degraded": True,
+            }, session_state
+
+
+async def _handle_turn(text, session_state, address=None):
     current_state = session_state["state"]
+    stats = session_state.setdefault("stats", {"turns": 0, "llm_calls": 0})
+    stats["turns"] += 1
+    track_call_stats(stats)
     # Validate based on current state
     match current_state:
         case "address":
-            data, valid, error = await validate_full_address(text)
+            with span("address_verify", current_state):
+                data, valid, error = await validate_full_address(text, address=address)
         case "schedule_appointment":
             data, valid, error = await handle_appointment_scheduling(text)
             if valid and data:
-                await add_doctors_appointment(data, session_state["name"], session_state["topic_of_call"])
+                with span("storage_write", current_state):
+                    booked, appointment_id = await add_doctors_appointment(data, session_state["name"], session_state["topic_of_call"])
+                if booked:
+                    data["id"] = appointment_id
+                else:
+                    valid, error = False, "Appointment time was just booked by someone else, choose a different time"
         case "done":
             return {
                 "end_call": True,
                 "retry": False,
             }, session_state
         case _:
-            print(f"Current state: {current_state}, text: {text}")
-            data, valid, error = await data_extraction(text, current_state)
+            data, valid, error, volunteered = await extract_volunteered_fields(text, current_state, session_state)
+            # Later answers given in the same breath are kept, the flow skips those steps
+            session_state.update(volunteered)
 
     if not valid or not data:
-        print(f"why am i here: valid: {valid}, data: {data}")
+        logger.debug("answer rejected", extra={"state": current_state, "error": error})
         return {
                 "end_call": False,
                 "retry": True,
@@ -38,27 +75,31 @@ async def on_transcript(text, session_state):
         session_state["appointments"] = data
     else:
         session_state[current_state] = data
-    print(f"current state: {current_state}")
-    print(f"new session state: {session_state["state"]}")
     
-    if session_state["state"] == "done":
-        write_patient_record(session_state)
-        send_confirmation_email_html(session_state)
+    # The caller is done once the last step (scheduling) is accepted
+    if next_prompt_type(current_state) == "done":
+        with span("storage_write", current_state):
+            await asyncio.to_thread(write_patient_record, session_state)
+        with span("email", current_state):
+            enqueue_confirmation_email(session_state)
+        record_booking(stats)
         return {
             "end_call": True,
             "retry": False,
         }, session_state
-    
-    print("made it hereeeeeeeeeee")
 
     return {
         "end_call": False,
         "retry": False
     }, session_state
 
-async def audio_generator(audio_queue):
+async def audio_generator(audio_buffer):
+    """
+    Yields the buffered call audio as zero-copy memoryviews of the ring buffer. A view is only
+    valid until the next one is requested, so the uploader must send or copy it first.
+    """
     while True:
-        chunk = await audio_queue.get()
+        chunk = await audio_buffer.read()
         if chunk is None:
             break
-        yield chunk
\ No newline at end of file
+        yield chunk
@@ -0,0 +1,249 @@
+import re
+from collections import Counter
+
+# Local parsers for the fields that are deterministic once the spoken form is
+# normalized ("nine one seven ...", "rachel at gmail dot com", "one two three d").
+# data_extraction tries these first and only falls back to the LLM when the
+# result doesn't pass validate_regex.
+
+DIGIT_WORDS = {
+    "zero": "0", "oh": "0", "o": "0",
+    "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9",
+}
+REPEAT_WORDS = {"double": 2, "triple": 3}
+
+LETTER_NAMES = {
+    "ay": "a", "bee": "b", "be": "b", "see": "c", "cee": "c", "sea": "c", "dee": "d",
+    "ee": "e", "eff": "f", "ef": "f", "gee": "g", "aitch": "h", "eye": "i",
+    "jay": "j", "kay": "k", "el": "l", "ell": "l", "em": "m", "en": "n",
+    "pee": "p", "cue": "q", "queue": "q", "ar": "r", "are": "r", "ess": "s",
+    "tee": "t", "tea": "t", "you": "u", "vee": "v", "ex": "x", "why": "y",
+    "zee": "z", "zed": "z",
+}
+
+TEEN_WORDS = {
+    "ten": "10", "eleven": "11", "twelve": "12", "thirteen": "13", "fourteen": "14",
+    "fifteen": "15", "sixteen": "16", "seventeen": "17", "eighteen": "18", "nineteen": "19",
+}
+TENS_WORDS = {
+    "twenty": "2", "thirty": "3", "forty": "4", "fifty": "5",
+    "sixty": "6", "seventy": "7", "eighty": "8", "ninety": "9",
+}
+# "four hundred" could be 400 or 4100-style digit strings; those are left to the LLM
+SCALE_WORDS = {"hundred", "thousand"}
+
+EMAIL_SYMBOLS = {
+    "at": "@", "dot": ".", "period": ".", "point": ".",
+    "dash": "-", "hyphen": "-", "underscore": "_",
+}
+# Words that end the local part when scanning backwards from "at"
+EMAIL_LEAD_IN = {
+    "is", "email", "e-mail", "address", "it's", "its", "my", "it", "me", "was", "the", "mail",
+    "by", "to", "use", "try", "under",
+}
+# Conversational filler: dropped in front of a value, anywhere inside one it makes the parse ambiguous
+FILLER_WORDS = {
+    "sure", "okay", "ok", "so", "um", "uh", "umm", "uhh", "er", "yeah", "yes", "yep", "well",
+    "like", "right", "alright", "hmm", "just", "actually", "and",
+}
+# More words than this in a local part is more likely chatter than a name
+MAX_LOCAL_PART_WORDS = 3
+
+# Words that may come before a member ID; any other word before it means the parse can't be trusted
+INSURANCE_ID_LEAD_IN = {
+    "my", "the", "member", "insurance", "id", "number", "is", "it's", "its", "it", "that's", "thats",
+    "policy", "subscriber", "card", "of", "on", "an", "a",
+} | FILLER_WORDS
+# "letter bee", "bee as in boy": a letter name that isn't next to a digit
+LETTER_CUE = "letter"
+
+TOKEN_REGEX = re.compile(r"[a-z0-9']+(?:-[a-z0-9']+)*|[@._+-]")
+
+fast_path_stats = Counter()
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_REGEX.findall(text.lower())
+
+
+def _char_for(token: str):
+    """Single character for a spelled-out digit or letter, otherwise None."""
+    if token in DIGIT_WORDS and token != "o":
+        return DIGIT_WORDS[token]
+    if len(token) == 1 and token.isalnum():
+        return token
+    return LETTER_NAMES.get(token)
+
+
+def parse_phone(text: str):
+    """Spoken or written US phone number -> E.164 ("+19177012642"), or None."""
+    digits = []
+    repeat = 1
+    for token in tokenize(text):
+        for part in token.split("-"):
+            if part.isdigit():
+                digits.append(part * repeat if len(part) == 1 else part)
+                repeat = 1
+            elif part in DIGIT_WORDS:
+                digits.append(DIGIT_WORDS[part] * repeat)
+                repeat = 1
+            elif part in REPEAT_WORDS:
+                repeat = REPEAT_WORDS[part]
+    number = "".join(digits)
+    if len(number) == 10:
+        return f"+1{number}"
+    if len(number) == 11 and number.startswith("1"):
+        return f"+{number}"
+    return None
+
+
+def _email_part(token: str) -> str:
+    if token in EMAIL_SYMBOLS:
+        return EMAIL_SYMBOLS[token]
+    if token in DIGIT_WORDS and token not in ("o", "oh"):
+        return DIGIT_WORDS[token]
+    return token
+
+
+def _email_local_part(tokens: list):
+    """
+    Local-part tokens -> string, number words read the way they are said ("eighty four"
+    -> "84", "nineteen" -> "19", "two" -> "2"). None when the numbers are ambiguous.
+    """
+    parts = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token in SCALE_WORDS:
+            return None
+        if token in TEEN_WORDS:
+            parts.append(TEEN_WORDS[token])
+        elif token in TENS_WORDS:
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if following in DIGIT_WORDS and following not in ("o", "oh", "zero"):
+                parts.append(TENS_WORDS[token] + DIGIT_WORDS[following])
+                i += 1
+            else:
+                parts.append(TENS_WORDS[token] + "0")
+        else:
+            parts.append(_email_part(token))
+        i += 1
+    return "".join(parts)
+
+
+def parse_email(text: str):
+    """
+    Spoken email ("rachel taskale at gmail dot com") -> "racheltaskale@gmail.com", or None.
+    Filler in front of the local part ("sure rachel at ...") is dropped; filler inside it, or
+    more than MAX_LOCAL_PART_WORDS words, leaves the email to the LLM.
+    """
+    tokens = tokenize(text)
+    at_positions = [i for i, token in enumerate(tokens) if token in ("@", "at")]
+    if not at_positions:
+        return None
+    at_index = at_positions[-1]
+
+    local = []
+    for token in reversed(tokens[:at_index]):
+        if token in EMAIL_LEAD_IN:
+            break
+        local.append(token)
+    local.reverse()
+    while local and local[0] in FILLER_WORDS:
+        local.pop(0)
+    words = [
+        token for token in local
+        if len(token) > 1 and token.isalpha() and token not in EMAIL_SYMBOLS and token not in DIGIT_WORDS
+        and token not in TEEN_WORDS and token not in TENS_WORDS
+    ]
+    if any(token in FILLER_WORDS for token in local) or len(words) > MAX_LOCAL_PART_WORDS:
+        return None
+
+    # Domain is label (dot label)+, anything said after the last label is dropped
+    domain = []
+    for token in tokens[at_index + 1:]:
+        part = _email_part(token)
+        if domain and domain[-1] != "." and part != ".":
+            break
+        domain.append(part)
+    local = _email_local_part(local)
+    if not local or "." not in domain or domain[-1] == ".":
+        return None
+    return f"{local}@{''.join(domain)}"
+
+
+def _is_digit_item(token: str) -> bool:
+    return (token in DIGIT_WORDS and token != "o") or (token.isalnum() and any(c.isdigit() for c in token))
+
+
+def parse_insurance_id(text: str):
+    """
+    Spelled-out member ID ("one two three d" or "the id is 123456723d") -> "123D", or None.
+
+    Only INSURANCE_ID_LEAD_IN words may come before the ID and nothing may come after it, so
+    "it should be one two three" is left to the LLM rather than read as "B123". A letter name
+    ("bee") counts only next to a digit, after "letter", or spelled "b as in boy". A leading
+    "a" is the article before a letter name ("it's a bee one two" -> "B12"), the letter in a
+    single-letter spelling ("a b c one") and ambiguous before a digit ("it's a one two three").
+    """
+    tokens = [token.replace("-", "") for token in tokenize(text) if token not in (".", "_", "+", "@", "-")]
+    i = 0
+    while i < len(tokens) and tokens[i] in INSURANCE_ID_LEAD_IN:
+        if tokens[i] == "a" and i + 1 < len(tokens):
+            following = tokens[i + 1]
+            if _is_digit_item(following):
+                return None
+            if len(following) == 1 and following.isalpha():
+                break
+        i += 1
+
+    chars = []
+    while i < len(tokens):
+        token = tokens[i]
+        if tokens[i + 1:i + 3] == ["as", "in"] and i + 3 < len(tokens) and (char := _char_for(token)):
+            # "b as in boy"
+            chars.append(char)
+            i += 4
+        elif token == LETTER_CUE and i + 1 < len(tokens) and _char_for(tokens[i + 1]):
+            chars.append(_char_for(tokens[i + 1]))
+            i += 2
+        elif _is_digit_item(token):
+            chars.append(DIGIT_WORDS.get(token, token))
+            i += 1
+        elif len(token) == 1 and token.isalpha():
+            chars.append(token)
+            i += 1
+        elif token in LETTER_NAMES:
+            neighbours = tokens[i - 1:i] + tokens[i + 1:i + 2]
+            if not any(_is_digit_item(neighbour) for neighbour in neighbours):
+                return None
+            chars.append(LETTER_NAMES[token])
+            i += 1
+        else:
+            return None
+    if not any(c.isdigit() for c in "".join(chars)):
+        return None
+    return "".join(chars).upper()
+
+
+FAST_PATH_PARSERS = {
+    "phone": parse_phone,
+    "email": parse_email,
+    "insurance_id": parse_insurance_id,
+}
+
+
+def record_fast_path(v_type: str, hit: bool):
+    fast_path_stats[(v_type, "hit" if hit else "miss")] += 1
+
+
+def get_fast_path_stats() -> dict:
+    stats = {}
+    # The address parser keeps state between fragments, it is not in FAST_PATH_PARSERS
+    for v_type in (*FAST_PATH_PARSERS, "address"):
+        hits = fast_path_stats[(v_type, "hit")]
+        misses = fast_path_stats[(v_type, "miss")]
+        total = hits + misses
+        stats[v_type] = {"hits": hits, "misses": misses, "hit_rate": hits / total if total else 0.0}
+    return stats
@@ -0,0 +1,119 @@
+"""
+LLM cleanup calls avoided by the incremental address parser in buffer_address_input, on a
+corpus of spoken addresses split into the fragments callers say them in.
+
+    python tests/bench_address_parser.py
+    python tests/bench_address_parser.py --min-confidence 0.8 --llm-latency-ms 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from address_parser import AddressParser
+
+# (fragments, expected single-line address or None when the caller never finishes it)
+CORPUS = [
+    (["123 Main Street", "San Francisco, California", "94105"], "123 Main Street, San Francisco, CA 94105"),
+    (["my address is one two three main street", "san francisco california", "nine four one oh five"],
+     "123 Main Street, San Francisco, CA 94105"),
+    (["123 5th Avenue, New York, New York 10003"], "123 5th Avenue, New York, NY 10003"),
+    (["it's four fifty", "court street apartment four b", "brooklyn new york one one two oh one"],
+     "450 Court Street Apt 4B, Brooklyn, NY 11201"),
+    (["one two three forty second street", "new york NY 10036"], "123 42nd Street, New York, NY 10036"),
+    (["um twelve thirty four elm drive", "springfield illinois", "six two seven oh one"],
+     "1234 Elm Drive, Springfield, IL 62701"),
+    (["500 Broadway", "Portland, OR 97205"], "500 Broadway, Portland, OR 97205"),
+    (["seventeen hundred pennsylvania avenue", "washington d c", "two oh five hundred"],
+     "1700 Pennsylvania Avenue, Washington, DC 20500"),
+    (["88 Oak Lane", "Austin Texas 78701"], "88 Oak Lane, Austin, TX 78701"),
+    (["I live at 2200 Sunset Boulevard", "Los Angeles", "California 90026"],
+     "2200 Sunset Boulevard, Los Angeles, CA 90026"),
+    (["forty five pine road", "boulder colorado eight oh three oh two"], "45 Pine Road, Boulder, CO 80302"),
+    (["9 Maple Court unit 12", "Madison WI 53703"], "9 Maple Court Unit 12, Madison, WI 53703"),
+    (["three one oh", "west elm street", "chicago illinois six oh six one oh"], "310 West Elm Street, Chicago, IL 60610"),
+    (["1600 Amphitheatre Parkway", "Mountain View CA 94043"], "1600 Amphitheatre Parkway, Mountain View, CA 94043"),
+    (["742 Evergreen Terrace", "Springfield", "Oregon", "97477"], "742 Evergreen Terrace, Springfield, OR 97477"),
+    (["um it's like 10 Downing", "Street", "uh Boston Massachusetts", "0 2 1 1 6"], "10 Downing Street, Boston, MA 02116"),
+    (["350 fifth avenue suite 300", "new york new york one oh one one eight"],
+     "350 5th Avenue Suite 300, New York, NY 10118"),
+    (["twenty one jump street", "vancouver washington nine eight six six oh"],
+     "21 Jump Street, Vancouver, WA 98660"),
+    (["55 Water St", "New York, NY 10041"], "55 Water Street, New York, NY 10041"),
+    (["eleven hundred", "congress avenue", "austin texas seven eight seven oh one"], "1100 Congress Avenue, Austin, TX 78701"),
+    (["the address is 77 Mass Ave", "Cambridge MA 02139"], "77 Mass Avenue, Cambridge, MA 02139"),
+    (["one two three main street in san francisco california nine four one oh five"],
+     "123 Main Street, San Francisco, CA 94105"),
+    (["two hundred west fifty seventh street", "new york new york one oh oh one nine"],
+     "200 West 57th Street, New York, NY 10019"),
+    (["221 Baker Street"], None),
+    (["I'm not sure of the zip", "it's 14 Willow Way", "Salem"], None),
+    (["1 Infinite Loop", "Cupertino California 95014"], "1 Infinite Loop, Cupertino, CA 95014"),
+]
+
+STREET_WORDS = ['street', 'st', 'avenue', 'ave', 'road', 'rd', 'lane', 'ln', 'drive', 'dr', 'way', 'court', 'ct']
+
+
+def old_heuristic(buffer: str) -> bool:
+    """buffer_address_input's completeness check before the parser: a rescan of the whole buffer."""
+    has_number = any(char.isdigit() for char in buffer)
+    has_street_words = any(word.lower() in buffer.lower() for word in STREET_WORDS)
+    return has_number and has_street_words and len(buffer.split()) >= 4
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-confidence", type=float, default=0.9)
+    parser.add_argument("--llm-latency-ms", type=float, default=1500.0, help="assumed GPT-4 cleanup latency")
+    args = parser.parse_args()
+
+    old_calls = new_calls = local = correct = 0
+    old_us = []
+    new_us = []
+    for fragments, expected in CORPUS:
+        # Before: every fragment rescans the buffer, the first "complete" buffer goes to the LLM
+        buffer = ""
+        for fragment in fragments:
+            buffer = f"{buffer} {fragment}".strip()
+            start = time.perf_counter()
+            done = old_heuristic(buffer)
+            old_us.append((time.perf_counter() - start) * 1e6)
+            if done:
+                old_calls += 1
+                break
+
+        # After: confident parses are returned as-is, the rest falls back to the LLM as before
+        address_parser = AddressParser()
+        outcome = "partial"
+        for fragment in fragments:
+            start = time.perf_counter()
+            address_parser.feed(fragment)
+            confident = address_parser.confidence >= args.min_confidence
+            looks_complete = address_parser.looks_complete
+            new_us.append((time.perf_counter() - start) * 1e6)
+            if confident:
+                outcome = "local"
+                local += 1
+                correct += address_parser.format() == expected
+                break
+            if looks_complete:
+                outcome = "llm"
+                new_calls += 1
+                break
+        print(f"{outcome:>7}  {' | '.join(fragments)}")
+
+    count = len(CORPUS)
+    print(f"\naddresses: {count}")
+    print(f"LLM cleanup calls per address: before {old_calls / count:.2f}, after {new_calls / count:.2f}")
+    print(f"LLM calls avoided per address: {(old_calls - new_calls) / count:.2f}")
+    print(f"parsed locally: {local}/{count}, matching the expected address: {correct}/{local}")
+    print(f"per fragment: before {statistics.mean(old_us):.1f} us (buffer rescan), after {statistics.mean(new_us):.1f} us (parse)")
+    print(f"expected latency saved per address: {(old_calls - new_calls) / count * args.llm_latency_ms:.0f} ms "
+          f"(LLM latency {args.llm_latency_ms:.0f} ms assumed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Latency of the address step against local OpenAI/SmartyStreets stubs: before, a GPT-4
+normalization call, a second GPT-4 extraction call returning free text and the verifier;
+after, one structured-output extraction and the verifier.
+
+    python tests/bench_address_step.py --openai-latency-ms 800 --smarty-latency-ms 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from address_verifier import get_address_verifier
+from config import config
+from openai_client import get_openai_client
+from stub_servers import OpenAIStub, SmartyStub
+from validators import validate_full_address
+
+UTTERANCES = [
+    "my address is twelve forty five hayes street san francisco california 94117",
+    "it's eighty seven hemlock rd manhasset new york one one zero three zero",
+]
+
+
+async def before_address_step(raw_input: str):
+    """The address step as it was: infer_address_with_llm, then extract_and_check_address_with_openai."""
+    client = get_openai_client()
+    cleaned = await client.complete([{"role": "user", "content": (
+        "You are an AI address normalizer. Your job is to take in a potentially incomplete or misspoken "
+        "address and return the most likely full and correctly spelled address as a single line.\n"
+        f'Raw input: "{raw_input}"\nRespond ONLY with the inferred fixed address.'
+    )}], prompt_type="address_inference")
+    text = await client.complete([{"role": "user", "content": (
+        "You are a medical office assistant extracting structured address information from patient speech.\n"
+        'Required fields: "street", "city", "state", "zip", "status", "missingFields". '
+        f'Only respond with a strict JSON object.\nTranscript: "{cleaned} {raw_input}"'
+    )}], prompt_type="address_extraction")
+    address = json.loads(text)
+    candidates = await get_address_verifier().verify(address["street"], address["city"], address["state"], address["zip"])
+    return bool(candidates)
+
+
+async def after_address_step(raw_input: str):
+    _, valid, _ = await validate_full_address(raw_input)
+    return valid
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def measure(step, iterations: int):
+    latencies = []
+    valid = 0
+    for i in range(iterations):
+        start = time.perf_counter()
+        valid += await step(UTTERANCES[i % len(UTTERANCES)])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, valid
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--openai-latency-ms", type=float, default=800)
+    parser.add_argument("--smarty-latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    jitter = args.jitter_ms / 1000
+    openai_stub = OpenAIStub(latency=args.openai_latency_ms / 1000, jitter=jitter, seed=1)
+    smarty_stub = SmartyStub(latency=args.smarty_latency_ms / 1000, jitter=jitter, seed=1)
+    config.openai.base_url = f"{openai_stub.start_in_thread()}/v1"
+    config.smartystreets.base_url = smarty_stub.start_in_thread()
+    # Every iteration pays upstream latency
+    config.llm_cache.enabled = False
+    config.smartystreets.positive_ttl = config.smartystreets.negative_ttl = 0
+
+    try:
+        print(f"{'':>7} {'p50 ms':>8} {'p95 ms':>8} {'LLM calls':>10} {'verified':>9}")
+        for label, step in (("before", before_address_step), ("after", after_address_step)):
+            requests_before = openai_stub.requests
+            latencies, valid = await measure(step, args.iterations)
+            llm_calls = (openai_stub.requests - requests_before) / args.iterations
+            print(f"{label:>7} {statistics.median(latencies):>8.0f} {percentile(latencies, 0.95):>8.0f} "
+                  f"{llm_calls:>10.1f} {valid:>6}/{args.iterations}")
+    finally:
+        await get_openai_client().aclose()
+        await get_address_verifier().aclose()
+        openai_stub.stop_thread()
+        smarty_stub.stop_thread()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
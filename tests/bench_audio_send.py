@@ -0,0 +1,88 @@
+"""
+Client-side cost of streaming audio to AssemblyAI: the old per-chunk base64 JSON path vs the
+framed binary path (and the framed JSON fallback). Frames go to an in-process sink, so this
+measures only our own work per second of 16 kHz audio fed in 20 ms chunks.
+
+    python tests/bench_audio_send.py --seconds 600
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from assemblyai_client import AssemblyAIClient
+
+CHUNK_MS = 20
+CHUNK = os.urandom(16000 * 2 * CHUNK_MS // 1000)
+
+
+class Sink:
+    def __init__(self):
+        self.messages = 0
+        self.wire_bytes = 0
+
+    async def send(self, message):
+        self.messages += 1
+        self.wire_bytes += len(message)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.Event().wait()
+
+    async def close(self):
+        pass
+
+
+async def legacy(sink: Sink, chunks: int):
+    # What send_audio used to do for every chunk
+    for _ in range(chunks):
+        await sink.send(json.dumps({"audio_data": base64.b64encode(CHUNK).decode("utf-8")}))
+
+
+async def framed(sink: Sink, chunks: int, binary: bool):
+    client = AssemblyAIClient("bench", binary_frames=binary)
+    client.attach(sink)
+    for _ in range(chunks):
+        await client.send_audio(CHUNK)
+    await client.terminate()
+
+
+def measure(name: str, run, seconds: int) -> tuple:
+    chunks = seconds * 1000 // CHUNK_MS
+    sink = Sink()
+    tracemalloc.start()
+    start = time.process_time()
+    asyncio.run(run(sink, chunks))
+    cpu = time.process_time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return name, sink.messages / seconds, sink.wire_bytes / seconds, cpu / seconds * 1e6, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=int, default=300, help="seconds of audio to stream")
+    args = parser.parse_args()
+
+    rows = [
+        measure("legacy base64 json, per chunk", legacy, args.seconds),
+        measure("framed base64 json", lambda sink, chunks: framed(sink, chunks, False), args.seconds),
+        measure("framed binary", lambda sink, chunks: framed(sink, chunks, True), args.seconds),
+    ]
+    print(f"per second of audio ({args.seconds}s streamed in {CHUNK_MS} ms chunks)")
+    print(f"{'path':>30} {'msgs/s':>7} {'wire B/s':>9} {'cpu us/s':>9} {'peak alloc':>11}")
+    for name, messages, wire, cpu, peak in rows:
+        print(f"{name:>30} {messages:>7.1f} {wire:>9.0f} {cpu:>9.1f} {peak:>9.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+How often the local spoken-form parsers in spoken_forms answer without GPT-4,
+on tests/test_on_transcript.py style utterances, and the latency saved per turn.
+
+    python tests/bench_fast_path.py                  # LLM latency assumed (--llm-latency-ms)
+    OPENAI_API_KEY=... python tests/bench_fast_path.py --live   # LLM latency measured
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spoken_forms import FAST_PATH_PARSERS
+from validators import validate_regex
+
+# (utterance, the value a person would write down); None means the LLM should answer
+CASES = {
+    "phone": [
+        ("my phone number is 19177012642", "+19177012642"),
+        ("nine one seven seven zero one two six four two", "+19177012642"),
+        ("it's one nine one seven seven oh one two six four two", "+19177012642"),
+        ("917-701-2642", "+19177012642"),
+        ("my number is nine one seven, seven zero one, two six four two", "+19177012642"),
+        ("you can reach me at nine one seven seven zero one double six four two", "+19177016642"),
+        ("area code nine one seven then seven zero one two six four two", "+19177012642"),
+        ("um it's nine one seven", None),
+    ],
+    "email": [
+        ("my email is racheltaskale@gmail.com", "racheltaskale@gmail.com"),
+        ("rachel at gmail dot com", "rachel@gmail.com"),
+        ("my email is rachel taskale at gmail dot com", "racheltaskale@gmail.com"),
+        ("it's r taskale at yahoo dot com", "rtaskale@yahoo.com"),
+        ("rachel dot taskale at health dot co dot uk", "rachel.taskale@health.co.uk"),
+        ("my e-mail address is jsmith eighty four at outlook dot com", "jsmith84@outlook.com"),
+        ("sure rachel at gmail dot com", "rachel@gmail.com"),
+        ("okay so rachel at gmail dot com", "rachel@gmail.com"),
+        ("same as my name at gmail", None),
+    ],
+    "insurance_id": [
+        ("the member id is 123456723d", "123456723D"),
+        ("one two three four five six seven two three d", "123456723D"),
+        ("it's a b c one two three four five", "ABC12345"),
+        ("it's a one two three four five", None),
+        ("my member id is x y z nine eight seven six five", "XYZ98765"),
+        ("one two three d", "123D"),
+        ("I think it starts with one two", None),
+        ("it should be one two three four five", None),
+        ("let me see one two three four five", None),
+        ("I will read it to you one two three four five six", None),
+    ],
+}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency-ms", type=float, default=1500.0, help="assumed GPT-4 extraction latency")
+    parser.add_argument("--live", action="store_true", help="measure the GPT-4 fallback latency instead")
+    args = parser.parse_args()
+
+    if args.live:
+        from helpers import openAIPrompts
+        from openai_client import get_openai_client
+
+    hits = wrong = total = 0
+    local_ms = []
+    llm_ms = []
+    for v_type, cases in CASES.items():
+        type_hits = type_wrong = 0
+        for text, expected in cases:
+            start = time.perf_counter()
+            parsed = FAST_PATH_PARSERS[v_type](text)
+            valid = bool(parsed) and (await validate_regex(parsed, v_type))[1]
+            local_ms.append((time.perf_counter() - start) * 1000)
+            # Only the right answer is a hit; a valid-looking wrong one would be stored unchecked
+            type_hits += valid and parsed == expected
+            type_wrong += valid and parsed != expected
+
+            if args.live:
+                start = time.perf_counter()
+                await get_openai_client().chat_response(f"{openAIPrompts(v_type)}\n\nTranscript: {text}")
+                llm_ms.append((time.perf_counter() - start) * 1000)
+        hits += type_hits
+        wrong += type_wrong
+        total += len(cases)
+        print(f"{v_type:>13}: {type_hits}/{len(cases)} correct fast path answers, {type_wrong} wrong")
+
+    llm_latency = statistics.mean(llm_ms) if llm_ms else args.llm_latency_ms
+    hit_rate = hits / total
+    print(f"\noverall fast path hit rate: {hit_rate:.0%} ({hits}/{total}), {wrong} wrong answers accepted")
+    print(f"local parse + validate: mean {statistics.mean(local_ms):.3f} ms")
+    print(f"LLM extraction latency: {llm_latency:.0f} ms ({'measured' if llm_ms else 'assumed'})")
+    print(f"expected latency saved per turn: {hit_rate * llm_latency:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
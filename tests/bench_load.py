@@ -0,0 +1,214 @@
+"""
+Offline load test: N concurrent scripted calls through speech_services.on_transcript and the
+HealthcareAssistant state flow, against local OpenAI/SmartyStreets/SendGrid stubs.
+
+    python tests/bench_load.py --concurrency 1 10 50 100 --openai-latency-ms 800
+
+Reports calls per second, per-turn p50/p99 latency, event-loop lag and peak RSS for each
+concurrency level, plus average turns and LLM calls per completed booking. Caches are disabled
+unless --cache is passed so every turn pays upstream latency. --volunteer scripts callers that
+answer several questions in their first utterance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "load-test")
+os.environ.setdefault("SENDGRID_API_KEY", "load-test")
+
+import file_storage
+from app import HealthcareAssistant
+from config import config
+from email_outbox import get_email_outbox
+from helpers import next_open_state
+from model_router import get_route_stats
+from speech_services import on_transcript
+from stub_servers import OpenAIStub, SendGridStub, SmartyStub, default_openai_responder
+
+DOCTORS = ("anna", "john", "kim")
+SLOTS_PER_DAY = 48  # 10 minute slots, 9:00-17:00
+SLOT_REGEX = re.compile(r"with (\w+) on (\d{4}-\d\d-\d\dT\d\d:\d\d)")
+
+
+def slot_for(call_number: int):
+    doctor = DOCTORS[call_number % len(DOCTORS)]
+    index = call_number // len(DOCTORS)
+    start = datetime(2030, 1, 1, 9, 0) + timedelta(days=index // SLOTS_PER_DAY, minutes=(index % SLOTS_PER_DAY) * 10)
+    return doctor, start
+
+
+def responder(prompt: str) -> str:
+    # Scheduling answers echo the slot from the scripted utterance so calls don't collide
+    match = SLOT_REGEX.search(prompt)
+    if match and "scheduling information" in prompt.lower():
+        start = datetime.fromisoformat(match.group(2))
+        return json.dumps({
+            "doctor_name": match.group(1),
+            "start": start.isoformat(),
+            "end": (start + timedelta(minutes=10)).isoformat(),
+            "missing_fields": [],
+        })
+    return default_openai_responder(prompt)
+
+
+def script_for(call_number: int, volunteer: bool = False) -> dict:
+    doctor, start = slot_for(call_number)
+    script = {
+        "name": f"Hi, my name is rachel taskale number {call_number}",
+        "insurance_payer": "john smith",
+        "insurance_id": "the member id is 123456723d",
+        "topic_of_call": f"I am calling for an annual check up, call {call_number}",
+        "address": "my address is twelve forty five hayes street san francisco california 94117",
+        "phone": "nine one seven seven zero one two six four two",
+        "email": "my email is rachel taskale at gmail dot com",
+        "schedule_appointment": f"I'd like to see doctor {doctor} with {doctor} on {start.isoformat(timespec='minutes')}",
+    }
+    if volunteer:
+        script["name"] = (
+            f"Hi, my name is rachel taskale number {call_number}, I'm calling for an annual check up, "
+            "my number is 917 701 2642 and my email is racheltaskale@gmail.com"
+        )
+    return script
+
+
+async def run_call(call_number: int, turn_latencies: list, volunteer: bool = False, max_turns: int = 20):
+    """Returns the call's turn/LLM call counts if the booking completed, otherwise None."""
+    assistant = HealthcareAssistant([])
+    session_state = assistant.session_state
+    script = script_for(call_number, volunteer)
+    for _ in range(max_turns):
+        current_state = session_state["state"]
+        start = time.perf_counter()
+        result, session_state = await on_transcript(script.get(current_state, "goodbye"), session_state)
+        turn_latencies.append(time.perf_counter() - start)
+        if result["end_call"]:
+            return session_state["stats"]
+        if not result["retry"]:
+            session_state["state"] = next_open_state(current_state, session_state)
+    return None
+
+
+async def monitor_loop_lag(lags: list, stop: asyncio.Event, interval: float = 0.01):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def run_level(concurrency: int, calls: int, first_call: int, volunteer: bool = False) -> dict:
+    turn_latencies, lags = [], []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(call_number):
+        async with semaphore:
+            return await run_call(call_number, turn_latencies, volunteer)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(limited(first_call + n) for n in range(calls)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    completed = [stats for stats in results if stats is not None]
+    return {
+        "completed": len(completed),
+        "turns_per_booking": sum(s["turns"] for s in completed) / max(1, len(completed)),
+        "llm_calls_per_booking": sum(s["llm_calls"] for s in completed) / max(1, len(completed)),
+        "calls_per_second": calls / elapsed,
+        "turn_p50_ms": percentile(turn_latencies, 0.5) * 1000,
+        "turn_p99_ms": percentile(turn_latencies, 0.99) * 1000,
+        "loop_lag_p99_ms": percentile(lags, 0.99) * 1000,
+        "loop_lag_max_ms": max(lags, default=0.0) * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--calls-per-level", type=int, default=0, help="default: 2 x concurrency")
+    parser.add_argument("--openai-latency-ms", type=float, default=300)
+    parser.add_argument("--smarty-latency-ms", type=float, default=100)
+    parser.add_argument("--sendgrid-latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="keep the LLM and address caches on")
+    parser.add_argument("--volunteer", action="store_true", help="callers give several answers in their first utterance")
+    args = parser.parse_args()
+
+    jitter = args.jitter_ms / 1000
+    openai_stub = OpenAIStub(responder=responder, latency=args.openai_latency_ms / 1000, jitter=jitter, error_rate=args.error_rate)
+    smarty_stub = SmartyStub(latency=args.smarty_latency_ms / 1000, jitter=jitter, error_rate=args.error_rate)
+    sendgrid_stub = SendGridStub(latency=args.sendgrid_latency_ms / 1000, jitter=jitter, error_rate=args.error_rate)
+
+    config.openai.base_url = f"{openai_stub.start_in_thread()}/v1"
+    config.smartystreets.base_url = smarty_stub.start_in_thread()
+    config.sendgrid.host = sendgrid_stub.start_in_thread()
+    if not args.cache:
+        config.llm_cache.enabled = False
+        config.smartystreets.positive_ttl = config.smartystreets.negative_ttl = 0
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        schedule_dir = os.path.join(data_dir, "schedule")
+        os.makedirs(schedule_dir)
+        for doctor in DOCTORS:
+            open(os.path.join(schedule_dir, f"{doctor}.json"), "w").close()
+        file_storage.SCHEDULE_DIR = schedule_dir
+        config.storage.patient_records_db = os.path.join(data_dir, "patient_records.db")
+        config.storage.patient_records_json = os.path.join(data_dir, "patient_records.json")
+        config.email_outbox.db_path = os.path.join(data_dir, "email_outbox.db")
+        outbox = get_email_outbox()
+        outbox.ensure_started()
+
+        # Keep the per-turn prints of the app code out of the report
+        real_stdout = sys.stdout
+        first_call = 0
+        rows = []
+        for concurrency in args.concurrency:
+            calls = args.calls_per_level or concurrency * 2
+            sys.stdout = open(os.devnull, "w")
+            try:
+                rows.append((concurrency, calls, await run_level(concurrency, calls, first_call, args.volunteer)))
+            finally:
+                sys.stdout.close()
+                sys.stdout = real_stdout
+            first_call += calls
+        outbox.close()
+
+    for stub in (openai_stub, smarty_stub, sendgrid_stub):
+        stub.stop_thread()
+
+    print(f"{'conc':>5} {'calls':>6} {'done':>5} {'calls/s':>8} {'turn p50':>9} {'turn p99':>9} {'lag p99':>8} {'lag max':>8} {'peak RSS':>9} {'turns/bk':>8} {'llm/bk':>7}")
+    for concurrency, calls, r in rows:
+        print(
+            f"{concurrency:>5} {calls:>6} {r['completed']:>5} {r['calls_per_second']:>8.2f} "
+            f"{r['turn_p50_ms']:>7.0f}ms {r['turn_p99_ms']:>7.0f}ms {r['loop_lag_p99_ms']:>6.1f}ms "
+            f"{r['loop_lag_max_ms']:>6.1f}ms {r['peak_rss_mb']:>7.0f}MB "
+            f"{r['turns_per_booking']:>8.1f} {r['llm_calls_per_booking']:>7.1f}"
+        )
+
+    print(f"\n{'route':>16} {'requests':>9} {'mean':>8} {'over budget':>12} {'hedged':>7} {'escalated':>10}")
+    for prompt_type, stats in get_route_stats().items():
+        print(
+            f"{prompt_type:>16} {stats['requests']:>9} {stats['mean_seconds'] * 1000:>6.0f}ms "
+            f"{stats['over_budget']:>12} {stats['hedge_rate']:>6.0%} {stats['escalation_rate']:>9.0%}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
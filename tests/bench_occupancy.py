@@ -0,0 +1,138 @@
+"""
+Multi-doctor availability search at clinic-network scale: the per-doctor interval engine
+(compute_free_intervals for every doctor, then filter) vs the occupancy bitmap.
+
+    python tests/bench_occupancy.py
+    python tests/bench_occupancy.py --doctors 500 --days 90 --bookings-per-day 10
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import file_storage
+import occupancy
+from file_storage import compute_free_intervals, get_booked_intervals, has_conflict
+from occupancy import OccupancyIndex, get_occupancy
+
+START_DAY = date(2030, 1, 7)  # a Monday
+
+
+def make_schedules(doctors: int, days: int, bookings_per_day: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    schedules = {}
+    for d in range(doctors):
+        schedule = {}
+        for offset in range(days):
+            slots = {}
+            for n in range(rng.randint(bookings_per_day // 2, bookings_per_day * 3 // 2)):
+                start = rng.randrange(9 * 60, 17 * 60 - 15, 15)
+                end = min(17 * 60, start + rng.choice([15, 30, 45, 60]))
+                slots[f"{offset}-{n}"] = {
+                    "available": False, "start": f"{start // 60:02d}:{start % 60:02d}",
+                    "end": f"{end // 60:02d}:{end % 60:02d}", "patient": "p", "reason": "checkup",
+                }
+            schedule[(START_DAY + timedelta(days=offset)).isoformat()] = slots
+        schedules[f"doctor{d:03d}"] = schedule
+    return schedules
+
+
+def interval_find_slots(booked_by_doctor: dict, minutes: int, window: tuple, limit: int, days: int, step: int = 15) -> list:
+    """What the interval engine needs for the same question: every doctor's free list, then filter."""
+    found = []
+    # Only the days the window covers
+    first = max(window[0], datetime.combine(START_DAY, datetime.min.time()))
+    days = min(days - (first.date() - START_DAY).days, (window[1].date() - first.date()).days + 1)
+    for doctor, booked in booked_by_doctor.items():
+        for free_start, free_end in compute_free_intervals(booked, first, days):
+            day_start = datetime.combine(free_start.date(), file_storage.WORKING_HOURS_START)
+            # First start on the step grid at or after the free interval
+            offset = -(-int((free_start - day_start).total_seconds() // 60) // step) * step
+            start = day_start + timedelta(minutes=offset)
+            while start + timedelta(minutes=minutes) <= free_end:
+                if window[0] <= start and start + timedelta(minutes=minutes) <= window[1]:
+                    found.append((start, doctor))
+                start += timedelta(minutes=step)
+    found.sort()
+    return [(doctor, start, start + timedelta(minutes=minutes)) for start, doctor in found[:limit]]
+
+
+def interval_free_doctors(booked_by_doctor: dict, start: datetime, end: datetime) -> list:
+    return [
+        doctor for doctor, booked in booked_by_doctor.items()
+        if not has_conflict(booked.get(start.date().isoformat(), []), start, end)
+    ]
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--bookings-per-day", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    schedules = make_schedules(args.doctors, args.days, args.bookings_per_day, args.seed)
+    booked = {doctor: get_booked_intervals(schedule) for doctor, schedule in schedules.items()}
+    index, build_ms = timed(lambda: OccupancyIndex.from_booked(booked, START_DAY, args.days), args.repeat)
+    index.cumulative()
+    print(f"{args.doctors} doctors x {args.days} days, {index.busy.mean():.0%} of cells booked")
+    print(f"bitmap {index.busy.shape} built in {build_ms:.0f} ms ({index.busy.nbytes / 1e6:.1f} MB)\n")
+
+    tuesday = START_DAY + timedelta(days=8)
+    horizon = datetime.combine(START_DAY + timedelta(days=args.days), datetime.min.time())
+    queries = [
+        ("30 min Tuesday afternoon", 30, (datetime.combine(tuesday, datetime.min.time()) + timedelta(hours=12),
+                                          datetime.combine(tuesday, datetime.min.time()) + timedelta(hours=17)), 10),
+        ("60 min, first 10 anywhere", 60, (datetime.combine(START_DAY, datetime.min.time()), horizon), 10),
+        ("90 min, first 50 anywhere", 90, (datetime.combine(START_DAY, datetime.min.time()), horizon), 50),
+    ]
+    print(f"{'query':>28} {'intervals ms':>13} {'bitmap ms':>10} {'speedup':>8} {'same':>5}")
+    for label, minutes, window, limit in queries:
+        expected, before_ms = timed(lambda: interval_find_slots(booked, minutes, window, limit, args.days), args.repeat)
+        found, after_ms = timed(lambda: index.find_slots(minutes, window=window, limit=limit), args.repeat)
+        print(f"{label:>28} {before_ms:>13.1f} {after_ms:>10.2f} {before_ms / after_ms:>7.0f}x {str(found == expected):>5}")
+
+    at = datetime.combine(tuesday, datetime.min.time()) + timedelta(hours=14)
+    expected, before_ms = timed(lambda: interval_free_doctors(booked, at, at + timedelta(minutes=30)), args.repeat)
+    found, after_ms = timed(lambda: index.free_doctors(at, at + timedelta(minutes=30)), args.repeat)
+    print(f"{'who is free Tue 14:00':>28} {before_ms:>13.2f} {after_ms:>10.2f} {before_ms / after_ms:>7.0f}x {str(found == expected):>5}")
+
+    with tempfile.TemporaryDirectory() as root:
+        for doctor, schedule in schedules.items():
+            with open(os.path.join(root, f"{doctor}.json"), "w") as f:
+                json.dump(schedule, f)
+        file_storage.SCHEDULE_DIR = root
+        occupancy._occupancy = None
+        _, cold_ms = timed(lambda: get_occupancy(START_DAY, args.days), 1)
+        _, warm_ms = timed(lambda: get_occupancy(START_DAY, args.days), args.repeat)
+        path = os.path.join(root, "doctor000.json")
+        schedules["doctor000"][START_DAY.isoformat()]["new"] = {
+            "available": False, "start": "16:45", "end": "17:00", "patient": "p", "reason": "checkup",
+        }
+        with open(path, "w") as f:
+            json.dump(schedules["doctor000"], f)
+        _, refresh_ms = timed(lambda: get_occupancy(START_DAY, args.days), 1)
+    print(f"\nget_occupancy from {args.doctors} files: cold {cold_ms:.0f} ms, unchanged {warm_ms:.1f} ms, "
+          f"after one booking {refresh_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Write latency of write_patient_record's backends at different database sizes.
+
+    python tests/bench_record_store.py
+    python tests/bench_record_store.py --sizes 1000 100000 1000000 --writes 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from record_store import JsonRecordStore, SqliteRecordStore
+
+
+def make_record(i):
+    return {
+        'insurance_payer': f'member {i}',
+        'insurance_id': f'ID{i:010d}',
+        'topic_of_call': 'annual check up',
+        'phone': f'+1917{i % 10_000_000:07d}',
+        'email': f'patient{i}@example.com',
+        'last_name': f'last{i}',
+        'first_name': f'first{i}',
+    }
+
+
+def make_appointment(i):
+    return {'doctor_name': 'john', 'start': f'2025-08-15T13:{i % 60:02d}:00', 'end': '2025-08-15T14:00:00'}
+
+
+def populate(size):
+    return {
+        f"last{i}#first{i}": {**make_record(i), 'appointments': [make_appointment(i)]}
+        for i in range(size)
+    }
+
+
+def time_writes(store, size, writes):
+    latencies = []
+    for n in range(writes):
+        i = size + n
+        start = time.perf_counter()
+        store.upsert_patient(f"last{i}#first{i}", make_record(i), make_appointment(i))
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name, size, latencies):
+    latencies_ms = sorted(l * 1000 for l in latencies)
+    p99 = latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * 0.99))]
+    print(f"{name:>6} {size:>9,} patients: median {statistics.median(latencies_ms):9.3f} ms  p99 {p99:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--writes", type=int, default=10)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        records = populate(size)
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, "patient_records.json")
+            with open(json_path, "w") as f:
+                json.dump(records, f, indent=2)
+            report("json", size, time_writes(JsonRecordStore(json_path), size, args.writes))
+
+            sqlite_store = SqliteRecordStore(os.path.join(tmp, "patient_records.db"))
+            sqlite_store.import_records(records)
+            report("sqlite", size, time_writes(sqlite_store, size, args.writes))
+            sqlite_store.close()
+
+
+if __name__ == "__main__":
+    main()
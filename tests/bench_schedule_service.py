@@ -0,0 +1,121 @@
+"""
+Booking and availability throughput from several worker processes: direct file access
+(flock + atomic rewrite per booking) vs the single-writer schedule_service.
+
+    python tests/bench_schedule_service.py
+    python tests/bench_schedule_service.py --workers 8 --bookings 200 --doctors 50
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import file_storage
+from config import config
+
+SLOTS_PER_DAY = 48
+
+
+def appointment(n: int, doctors: int) -> dict:
+    index = n // doctors
+    start = datetime(2030, 1, 1, 9, 0) + timedelta(days=index // SLOTS_PER_DAY, minutes=(index % SLOTS_PER_DAY) * 10)
+    return {"doctor_name": f"doctor{n % doctors:03d}", "start": start.isoformat(), "end": (start + timedelta(minutes=10)).isoformat()}
+
+
+def setup_worker(schedule_dir: str, address: str):
+    file_storage.SCHEDULE_DIR = schedule_dir
+    config.scheduling.service_address = address
+
+
+def book(args) -> int:
+    worker, bookings, doctors = args
+
+    async def run():
+        booked = 0
+        for i in range(bookings):
+            ok, _ = await file_storage.add_doctors_appointment(appointment(worker * bookings + i, doctors), "patient", "checkup")
+            booked += ok
+        return booked
+
+    return asyncio.run(run())
+
+
+def query(queries: int) -> int:
+    start = datetime(2030, 1, 1, 9, 0)
+    for _ in range(queries):
+        file_storage.get_free_slots(start)
+    return queries
+
+
+def run_mode(name: str, schedule_dir: str, address: str, args) -> dict:
+    with multiprocessing.get_context("fork").Pool(args.workers, setup_worker, (schedule_dir, address)) as pool:
+        start = time.perf_counter()
+        booked = sum(pool.map(book, [(w, args.bookings, args.doctors) for w in range(args.workers)]))
+        booking_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        queries = sum(pool.map(query, [args.queries] * args.workers))
+        query_seconds = time.perf_counter() - start
+    return {
+        "mode": name,
+        "booked": booked,
+        "bookings_per_second": booked / booking_seconds,
+        "queries_per_second": queries / query_seconds,
+    }
+
+
+def make_schedule_dir(root: str, doctors: int) -> str:
+    schedule_dir = os.path.join(root, "schedule")
+    os.makedirs(schedule_dir)
+    for d in range(doctors):
+        open(os.path.join(schedule_dir, f"doctor{d:03d}.json"), "w").close()
+    return schedule_dir
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--bookings", type=int, default=100, help="per worker")
+    parser.add_argument("--queries", type=int, default=50, help="availability queries per worker")
+    parser.add_argument("--doctors", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        rows.append(run_mode("direct", make_schedule_dir(os.path.join(tmp, "direct"), args.doctors), None, args))
+
+        schedule_dir = make_schedule_dir(os.path.join(tmp, "service"), args.doctors)
+        address = f"unix:{tmp}/schedule.sock"
+        service = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "schedule_service.py"), "--listen", address, "--schedule-dir", schedule_dir],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            while not os.path.exists(address[len("unix:"):]):
+                time.sleep(0.05)
+            rows.append(run_mode("service", schedule_dir, address, args))
+        finally:
+            service.terminate()
+            service.wait()
+        persisted = sum(
+            len(day) for d in range(args.doctors)
+            for day in file_storage.load_schedule(os.path.join(schedule_dir, f"doctor{d:03d}.json")).values()
+        )
+
+    print(f"{args.workers} workers, {args.doctors} doctors, {args.bookings} bookings and {args.queries} queries per worker")
+    print(f"{'mode':>8} {'booked':>7} {'bookings/s':>11} {'queries/s':>10}")
+    for r in rows:
+        print(f"{r['mode']:>8} {r['booked']:>7} {r['bookings_per_second']:>11.0f} {r['queries_per_second']:>10.0f}")
+    print(f"service bookings persisted after shutdown: {persisted}")
+
+
+if __name__ == "__main__":
+    main()
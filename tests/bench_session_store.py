@@ -0,0 +1,72 @@
+"""
+Checkpoint cost per accepted turn for the session store backends.
+
+    python tests/bench_session_store.py
+    python tests/bench_session_store.py --calls 5000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation import SessionState
+from session_store import MemorySessionStore, SqliteSessionStore
+
+ANSWERS = {
+    "name": {"first_name": "rachel", "last_name": "taskale"},
+    "insurance_payer": {"first_name": "john", "last_name": "smith"},
+    "insurance_id": "123456723D",
+    "topic_of_call": "annual check up",
+    "address": {"street": "1245 Hayes Street", "city": "San Francisco", "state": "CA", "zip": "94117"},
+    "phone": "+19177012642",
+    "email": "racheltaskale@gmail.com",
+    "schedule_appointment": None,
+}
+
+
+def run(store, calls: int) -> list:
+    """Walks each call through the flow, timing the checkpoint after every accepted field."""
+    timings = []
+    for call in range(calls):
+        session = SessionState()
+        while session.state != "schedule_appointment":
+            session[session.state] = ANSWERS[session.state]
+            session.state = session.next_state()
+            start = time.perf_counter()
+            store.save(f"room-{call}", session)
+            timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = {
+            "memory": MemorySessionStore(),
+            "sqlite": SqliteSessionStore(os.path.join(tmp, "sessions.db")),
+        }
+        print(f"{'backend':>8} {'saves':>6} {'p50':>9} {'p99':>9} {'mean':>9} {'resume':>9}")
+        for name, store in stores.items():
+            timings = sorted(run(store, args.calls))
+            start = time.perf_counter()
+            for call in range(args.calls):
+                store.load(f"room-{call}")
+            resume = (time.perf_counter() - start) / args.calls
+            p50 = timings[len(timings) // 2]
+            p99 = timings[int(len(timings) * 0.99)]
+            print(
+                f"{name:>8} {len(timings):>6} {p50 * 1e6:>7.1f}us {p99 * 1e6:>7.1f}us "
+                f"{statistics.mean(timings) * 1e6:>7.1f}us {resume * 1e6:>7.1f}us"
+            )
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Time to first audio for the availability answer: full completion vs streaming the first sentence
+into TTS. Uses the local OpenAI stub, so TTS synthesis time itself is not included.
+
+    python tests/bench_streaming.py --first-token-ms 400 --token-ms 25
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import OpenAIConfig
+from helpers import availability_prompt
+from openai_client import OpenAIClient
+from stub_servers import OpenAIStub
+
+FREE_SLOTS = "\n".join(
+    f"Dr. {doctor}, {day}: 09:00-17:00" for doctor in ("anna", "john", "kim") for day in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")
+)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--token-ms", type=float, default=25)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    stub = OpenAIStub(latency=args.first_token_ms / 1000, token_delay=args.token_ms / 1000)
+    base_url = await stub.start()
+    client = OpenAIClient("bench", None, None, OpenAIConfig(api_key="bench", base_url=f"{base_url}/v1"))
+    prompt = availability_prompt(FREE_SLOTS)
+
+    before, after = [], []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        await client.chat_response(prompt)
+        before.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        stream = client.stream_chat_response(prompt)
+        await anext(stream)
+        after.append(time.perf_counter() - start)
+        async for _ in stream:
+            pass
+
+    await client.aclose()
+    await stub.stop()
+    print(f"time to first audio, full completion:  {statistics.median(before) * 1000:7.0f} ms")
+    print(f"time to first audio, first sentence:   {statistics.median(after) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
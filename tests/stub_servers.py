@@ -0,0 +1,281 @@
+"""
+Local stand-ins for the external services, for tests and benchmarks that must run offline.
+Each stub can inject latency and failures.
+
+    stub = OpenAIStub(latency=0.3, token_delay=0.01)
+    base_url = await stub.start()
+    ...
+    await stub.stop()
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+
+from aiohttp import web
+
+
+class StubServer:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Latency of the next requests, in order, before latency/jitter apply again
+        self.delays = []
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._runner = None
+        self.base_url = None
+
+    def routes(self) -> list:
+        raise NotImplementedError
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.add_routes(self.routes())
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self) -> str:
+        """
+        Serve from a separate thread and event loop, so code under test that still makes
+        blocking calls can't deadlock against the stub it is calling.
+        """
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(self.start(), self._loop).result()
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def inject(self):
+        """Apply configured latency; returns an error response if this request should fail."""
+        self.requests += 1
+        if self.delays:
+            delay = self.delays.pop(0)
+        else:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return web.json_response({"error": {"message": "injected failure"}}, status=503)
+        return None
+
+
+MULTI_FIELD_PATTERNS = {
+    "name": re.compile(r"(?:my name is|i'm) (\w+) (\w+)"),
+    "insurance_payer": re.compile(r"(?:member|card) (?:name )?is (\w+) (\w+)"),
+    "insurance_id": re.compile(r"\bid is (\w+)"),
+    "topic_of_call": re.compile(r"calling (?:for|about) ([^,.]+)"),
+    "phone": re.compile(r"(?:number|phone) is \+?([\d -]{10,})"),
+    "email": re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"),
+}
+
+
+def multi_field_answer(prompt: str) -> str:
+    """Stand-in for the single-pass extraction call: pattern matches the requested fields."""
+    requested = re.findall(r'^- "(\w+)"', prompt, re.MULTILINE)
+    transcript = prompt.rsplit("Transcript:", 1)[-1].strip().lower()
+    answer = {}
+    for field in requested:
+        match = MULTI_FIELD_PATTERNS[field].search(transcript)
+        if not match and field == requested[0]:
+            # A bare answer to the question that was just asked
+            match = re.search(r"(\w+) (\w+)" if field in ("name", "insurance_payer") else r"(.+)", transcript)
+        if not match:
+            continue
+        if field in ("name", "insurance_payer"):
+            answer[field] = {"first_name": match.group(1), "last_name": match.group(2)}
+        elif field == "insurance_id":
+            answer[field] = match.group(1).upper()
+        elif field == "phone":
+            digits = re.sub(r"\D", "", match.group(1))
+            answer[field] = f"+1{digits[-10:]}"
+        elif field == "email":
+            answer[field] = match.group(0)
+        else:
+            answer[field] = match.group(1).strip()
+    return json.dumps(answer)
+
+
+STUB_ADDRESSES = {
+    "hayes": {"street": "1245 Hayes Street", "unit": "", "city": "San Francisco", "state": "CA", "zip": "94117"},
+    "hemlock": {"street": "87 Hemlock Rd", "unit": "", "city": "Manhasset", "state": "NY", "zip": "11030"},
+}
+
+
+def address_answer(prompt: str) -> str:
+    """Structured address for the transcript: a known street in full, otherwise nothing heard."""
+    transcript = prompt.rpartition("Transcript:")[2].lower()
+    for street, address in STUB_ADDRESSES.items():
+        if street in transcript:
+            return json.dumps({**address, "missing_fields": []})
+    empty = {"street": "", "unit": "", "city": "", "state": "", "zip": ""}
+    return json.dumps({**empty, "missing_fields": ["street", "city", "state", "zip"]})
+
+
+def default_openai_responder(prompt: str) -> str:
+    """Canned answers for the prompts in helpers/validators, good enough to drive the call flow."""
+    lowered = prompt.lower()
+    if "several intake questions" in lowered:
+        return multi_field_answer(prompt)
+    if "first and last name" in lowered:
+        return json.dumps({"first_name": "rachel", "last_name": "taskale"})
+    if "insurance id" in lowered:
+        return "123456723D"
+    if "phone number" in lowered:
+        return "+19177012642"
+    if "email address" in lowered:
+        return "racheltaskale@gmail.com"
+    if "scheduling information" in lowered:
+        return json.dumps({"doctor_name": "john", "start": "2025-08-15T13:30:00", "end": "2025-08-15T14:00:00", "missing_fields": []})
+    if "normalized address components" in lowered:
+        return address_answer(prompt)
+    if "structured address" in lowered:
+        return json.dumps({"street": "1245 Hayes Street", "city": "San Francisco", "state": "CA", "zip": "94117", "status": "VALID", "missingFields": []})
+    if "address normalizer" in lowered:
+        return "1245 Hayes Street, San Francisco, CA 94117"
+    if "open appointment time ranges" in lowered:
+        return " ".join(
+            f"Doctor {doctor} is free on {day} from nine in the morning until five in the afternoon."
+            for doctor in ("Anna", "John", "Kim")
+            for day in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday")
+        )
+    return "annual check up"
+
+
+# Models that reject response_format the way the API does (400 invalid_request_error)
+NO_JSON_MODE_MODELS = {"gpt-4", "gpt-4-0613", "gpt-3.5-turbo-0613"}
+
+
+class OpenAIStub(StubServer):
+    """
+    /v1/chat/completions, streaming and non-streaming. `latency` is the time to first token;
+    every whitespace-separated token after that takes `token_delay`.
+    """
+
+    def __init__(self, responder=default_openai_responder, token_delay: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.responder = responder
+        self.token_delay = token_delay
+        # Extra latency per model, e.g. {"gpt-4o-mini": 5.0} for a stalled small model
+        self.model_latency = {}
+        self.models = []
+        self.response_formats = []
+        self.max_tokens = []
+
+    def routes(self) -> list:
+        return [web.post("/v1/chat/completions", self.chat_completions)]
+
+    def _chunk(self, model: str, delta: dict, finish_reason=None) -> bytes:
+        payload = {
+            "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n".encode()
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        model = body.get("model", "gpt-4")
+        self.models.append(model)
+        self.response_formats.append(body.get("response_format"))
+        self.max_tokens.append(body.get("max_tokens"))
+        if model in self.model_latency:
+            await asyncio.sleep(self.model_latency[model])
+        error = await self.inject()
+        if error is not None:
+            return error
+        if body.get("response_format") and model in NO_JSON_MODE_MODELS:
+            return web.json_response({"error": {
+                "message": "'response_format' is not supported with this model.",
+                "type": "invalid_request_error", "param": "response_format", "code": None,
+            }}, status=400)
+
+        content = self.responder(body["messages"][-1]["content"])
+        tokens = content.split(" ")
+        if not body.get("stream"):
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay * len(tokens))
+            return web.json_response({
+                "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(self._chunk(model, {"role": "assistant", "content": ""}))
+        for i, token in enumerate(tokens):
+            if self.token_delay and i:
+                await asyncio.sleep(self.token_delay)
+            await response.write(self._chunk(model, {"content": token if i == 0 else f" {token}"}))
+        await response.write(self._chunk(model, {}, finish_reason="stop"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+class SmartyStub(StubServer):
+    """/street-address: returns one candidate for addresses in `known`, keyed by (street, city, state) lowercased."""
+
+    def __init__(self, known: dict = None, **kwargs):
+        super().__init__(**kwargs)
+        self.known = known if known is not None else {
+            ("1245 hayes street", "san francisco", "ca"): {
+                "primary_number": "1245", "street_name": "Hayes", "street_suffix": "St",
+                "city_name": "San Francisco", "state_abbreviation": "CA", "zipcode": "94117",
+            },
+            ("87 hemlock rd", "manhasset", "ny"): {
+                "primary_number": "87", "street_name": "Hemlock", "street_suffix": "Rd",
+                "city_name": "Manhasset", "state_abbreviation": "NY", "zipcode": "11030",
+            },
+        }
+
+    def routes(self) -> list:
+        return [web.get("/street-address", self.street_address)]
+
+    async def street_address(self, request):
+        error = await self.inject()
+        if error is not None:
+            return error
+        query = request.query
+        key = (query.get("street", "").lower(), query.get("city", "").lower(), query.get("state", "").lower())
+        components = self.known.get(key)
+        return web.json_response([{"components": components}] if components else [])
+
+
+class SendGridStub(StubServer):
+    """
+    /v3/mail/send: accepts every message with 202 and keeps the request bodies.
+    With reject_status set, every message is refused with that status instead.
+    """
+
+    def __init__(self, reject_status: int = None, **kwargs):
+        super().__init__(**kwargs)
+        self.reject_status = reject_status
+        self.messages = []
+
+    def routes(self) -> list:
+        return [web.post("/v3/mail/send", self.mail_send)]
+
+    async def mail_send(self, request):
+        error = await self.inject()
+        if error is not None:
+            return error
+        if self.reject_status is not None:
+            return web.json_response({"errors": [{"message": "rejected by stub"}]}, status=self.reject_status)
+        self.messages.append(await request.json())
+        return web.Response(status=202)
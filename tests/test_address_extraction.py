@@ -0,0 +1,98 @@
+import asyncio
+
+import address_verifier
+import openai_client
+import validators
+from address_verifier import AddressVerifier
+from config import OpenAIConfig
+from llm_cache import get_llm_cache
+from stub_servers import OpenAIStub, SmartyStub
+
+
+def run_with_stubs(monkeypatch, coro_fn, openai_latency=0.0):
+    async def run():
+        openai_stub = OpenAIStub(latency=openai_latency)
+        smarty_stub = SmartyStub()
+        openai_url = await openai_stub.start()
+        smarty_url = await smarty_stub.start()
+        client = openai_client.OpenAIClient("test-key", None, None, OpenAIConfig(api_key="test-key", base_url=f"{openai_url}/v1"))
+        verifier = AddressVerifier("id", "token", smarty_url)
+        monkeypatch.setattr(openai_client, "_openai_client", client)
+        monkeypatch.setattr(address_verifier, "_address_verifier", verifier)
+        get_llm_cache().clear()
+        try:
+            return await coro_fn(), openai_stub
+        finally:
+            await client.aclose()
+            await verifier.aclose()
+            await openai_stub.stop()
+            await smarty_stub.stop()
+
+    return asyncio.run(run())
+
+
+def test_one_structured_call_feeds_the_verifier(monkeypatch):
+    result, stub = run_with_stubs(
+        monkeypatch, lambda: validators.validate_full_address("twelve forty five hayes street san francisco")
+    )
+    assert result == ({"street": "1245 Hayes Street", "city": "San Francisco", "state": "CA", "zip": "94117"}, True, "")
+    assert stub.requests == 1
+    assert stub.models == [openai_client.STRUCTURED_OUTPUT_MODEL]
+    assert stub.response_formats[0]["type"] == "json_schema"
+    assert stub.response_formats[0]["json_schema"]["strict"] is True
+
+
+def test_missing_fields_are_reported(monkeypatch):
+    address, _ = run_with_stubs(monkeypatch, lambda: validators.extract_address("somewhere near the park"))
+    assert address["missing_fields"] == ["street", "city", "state", "zip"]
+    assert validators.format_address(address) == ""
+
+
+def test_concurrent_requests_for_the_same_utterance_share_one_call(monkeypatch):
+    async def both():
+        text = "eighty seven hemlock rd  manhasset ny"
+        return await asyncio.gather(validators.extract_address(text), validators.validate_full_address(text))
+
+    (address, (verified, valid, _)), stub = run_with_stubs(monkeypatch, both, openai_latency=0.05)
+    assert stub.requests == 1
+    assert validators.format_address(address) == "87 Hemlock Rd, Manhasset, NY 11030"
+    assert valid and verified["city"] == "Manhasset"
+
+
+def test_format_address():
+    address = {"street": "1245 Hayes Street", "unit": "Apt 4B", "city": "San Francisco", "state": "CA", "zip": ""}
+    assert validators.format_address(address) == "1245 Hayes Street Apt 4B, San Francisco, CA"
+
+
+def test_address_step_reuses_the_buffer_tool_address(monkeypatch):
+    handoff = validators.AddressHandoff()
+
+    async def turn():
+        wait = handoff.expect(1.0)
+
+        async def tool():
+            await asyncio.sleep(0.05)
+            handoff.offer(await validators.extract_address("my address is twelve forty five hayes street san francisco"))
+
+        tool_task = asyncio.ensure_future(tool())
+        # The turn is handled with different text than the tool got, e.g. the raw transcript
+        result = await validators.validate_full_address("twelve forty five hayes st", address=await wait)
+        await tool_task
+        return result
+
+    (verified, valid, _), stub = run_with_stubs(monkeypatch, turn)
+    assert valid and verified["street"] == "1245 Hayes Street"
+    assert stub.requests == 1
+
+
+def test_address_step_extracts_itself_when_the_tool_offers_nothing(monkeypatch):
+    handoff = validators.AddressHandoff()
+
+    async def turn():
+        address = await handoff.expect(0.01)
+        handoff.offer({"street": "too late"})
+        return await validators.validate_full_address("twelve forty five hayes street san francisco", address=address)
+
+    (verified, valid, _), stub = run_with_stubs(monkeypatch, turn)
+    assert valid and verified["street"] == "1245 Hayes Street"
+    assert stub.requests == 1
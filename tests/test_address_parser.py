@@ -0,0 +1,98 @@
+import pytest
+
+from address_parser import AddressParser, spoken_number
+
+
+@pytest.mark.parametrize("words, expected", [
+    ("one two three", "123"),
+    ("twenty three", "23"),
+    ("fourteen fifty", "1450"),
+    ("nine four one oh five", "94105"),
+    ("four hundred five", "405"),
+    ("one hundred twenty three", "123"),
+    ("twelve hundred", "1200"),
+    ("double five", "55"),
+    ("1 2 3", "123"),
+])
+def test_spoken_number(words, expected):
+    assert spoken_number(words.split()) == expected
+
+
+def parse(*fragments):
+    parser = AddressParser()
+    for fragment in fragments:
+        parser.feed(fragment)
+    return parser
+
+
+def test_fragments_parse_into_components():
+    parser = parse("my address is one two three main street", "san francisco california", "nine four one oh five")
+    assert parser.components() == {
+        "number": "123", "street": "Main", "suffix": "Street", "unit": "",
+        "city": "San Francisco", "state": "CA", "zip": "94105",
+    }
+    assert parser.complete
+    assert parser.confidence == 1.0
+    assert parser.format() == "123 Main Street, San Francisco, CA 94105"
+    assert parser.address() == {
+        "street": "123 Main Street", "unit": "", "city": "San Francisco", "state": "CA", "zip": "94105",
+        "missing_fields": [],
+    }
+
+
+def test_written_address_in_one_fragment():
+    assert parse("123 5th Avenue, New York, New York 10003").format() == "123 5th Avenue, New York, NY 10003"
+
+
+def test_units_ordinals_and_suffix_as_street_name():
+    assert parse("four fifty", "court street apartment four b", "brooklyn new york one one two oh one").format() == (
+        "450 Court Street Apt 4B, Brooklyn, NY 11201"
+    )
+    assert parse("one two three forty second street new york NY 10036").format() == "123 42nd Street, New York, NY 10036"
+
+
+def test_partial_address_is_not_confident():
+    parser = parse("um it's twelve thirty four", "elm drive")
+    assert not parser.looks_complete
+    assert not parser.complete
+    assert parser.confidence == 0.5
+    assert parser.address()["missing_fields"] == ["city", "state", "zip"]
+
+    parser.feed("springfield illinois six two seven oh one")
+    assert parser.complete
+    assert parser.format() == "1234 Elm Drive, Springfield, IL 62701"
+
+
+def test_finished_but_unclear_address_goes_to_the_llm():
+    parser = parse("500 Broadway", "Portland, OR 97205")
+    assert parser.looks_complete
+    assert parser.confidence < 0.9
+
+
+def test_ambiguous_state_codes_need_capitals():
+    assert parse("500 Main Street, Portland, OR 97205").components()["state"] == "OR"
+    assert parse("500 Main Street, Portland or").components()["state"] == ""
+
+
+def test_unplaced_words_lower_confidence():
+    parser = parse("123 Main Street Springfield IL 62701 or maybe the other one")
+    assert parser.complete
+    assert parser.confidence < 0.9
+
+
+def test_reset():
+    parser = parse("123 Main Street")
+    parser.reset()
+    assert parser.components() == AddressParser().components()
+    assert not parser.looks_complete
+
+
+def test_in_before_the_city_is_not_part_of_it():
+    parser = parse("one two three main street in san francisco california nine four one oh five")
+    assert parser.format() == "123 Main Street, San Francisco, CA 94105"
+    assert parser.confidence == 1.0
+
+
+def test_spoken_tens_ordinal_street():
+    assert parse("two hundred west fifty seventh street", "new york new york one oh oh one nine").format() == \
+        "200 West 57th Street, New York, NY 10019"
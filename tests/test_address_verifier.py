@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from address_verifier import AddressVerificationError, AddressVerifier, normalize_address_key
+from stub_servers import SmartyStub
+
+
+def test_normalize_address_key():
+    assert normalize_address_key("1245 Hayes Street", "San Francisco", "CA", "94117-1234") == \
+        normalize_address_key("1245 hayes st.", "san  francisco", "ca", "94117")
+
+
+def run_with_stub(stub, scenario):
+    async def run():
+        base_url = await stub.start()
+        verifier = AddressVerifier("id", "token", base_url, negative_ttl=60)
+        try:
+            return await scenario(verifier)
+        finally:
+            await verifier.aclose()
+            await stub.stop()
+
+    return asyncio.run(run())
+
+
+def test_verify_caches_found_and_not_found_addresses():
+    stub = SmartyStub()
+
+    async def scenario(verifier):
+        found = await verifier.verify("1245 Hayes Street", "San Francisco", "CA", "94117")
+        again = await verifier.verify("1245 hayes street", "san francisco", "ca", "94117")
+        missing = await verifier.verify("1 Nowhere Lane", "Springfield", "ZZ")
+        missing_again = await verifier.verify("1 nowhere ln", "springfield", "zz")
+        return found, again, missing, missing_again, verifier.stats()
+
+    found, again, missing, missing_again, stats = run_with_stub(stub, scenario)
+    assert found[0]["components"]["zipcode"] == "94117"
+    assert again == found
+    assert missing == missing_again == []
+    assert stub.requests == 2
+    assert stats["calls_saved"] == 2
+
+
+def test_upstream_errors_are_not_cached():
+    stub = SmartyStub(error_rate=1.0)
+
+    async def scenario(verifier):
+        for _ in range(2):
+            with pytest.raises(AddressVerificationError):
+                await verifier.verify("1245 Hayes Street", "San Francisco", "CA")
+        return verifier.stats()
+
+    stats = run_with_stub(stub, scenario)
+    assert stub.requests == 2
+    assert stats["calls_saved"] == 0
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import pytest
+import websockets
+
+from assemblyai_client import AssemblyAIClient, AssemblyAIConnectionError
+
+CHUNK = bytes(range(256)) * 2 + bytes(128)  # 640 bytes = 20 ms at 16 kHz
+
+
+def run_with_server(handler, client_coro):
+    async def run():
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            return await client_coro(await websockets.connect(f"ws://127.0.0.1:{port}"))
+    return asyncio.run(run())
+
+
+def test_chunks_are_coalesced_into_binary_frames():
+    received = []
+
+    async def handler(ws):
+        async for message in ws:
+            received.append(message)
+            if isinstance(message, str) and "terminate_session" in message:
+                await ws.send(json.dumps({"message_type": "FinalTranscript", "text": " hello "}))
+                return
+
+    async def client_session(ws):
+        transcripts = []
+
+        async def on_transcript(text):
+            transcripts.append(text)
+
+        client = AssemblyAIClient("key", frame_ms=100, max_queued_frames=4)
+        client.set_callback(on_transcript)
+        client.attach(ws)
+        for _ in range(52):
+            await client.send_audio(CHUNK)
+        await client.flush()
+        await client.terminate()
+        return client, transcripts
+
+    client, _ = run_with_server(handler, client_session)
+    frames = [m for m in received if isinstance(m, bytes)]
+    assert [len(f) for f in frames] == [3200] * 10 + [1280]
+    assert b"".join(frames) == CHUNK * 52
+    assert json.loads(received[-1]) == {"terminate_session": True}
+    assert client.stats()["frames_sent"] == 11
+
+
+def test_json_envelope_when_binary_frames_are_off():
+    received = []
+
+    async def handler(ws):
+        async for message in ws:
+            received.append(message)
+
+    async def client_session(ws):
+        client = AssemblyAIClient("key", frame_ms=20, binary_frames=False)
+        client.attach(ws)
+        await client.send_audio(CHUNK)
+        await client.terminate()
+
+    run_with_server(handler, client_session)
+    assert "audio_data" in json.loads(received[0])
+
+
+def test_connection_failure_is_surfaced():
+    async def handler(ws):
+        await ws.recv()
+        await ws.close(code=4001, reason="bad audio")
+
+    async def client_session(ws):
+        errors = []
+        client = AssemblyAIClient("key", frame_ms=20, max_queued_frames=2, on_error=errors.append)
+        client.attach(ws)
+        with pytest.raises(AssemblyAIConnectionError):
+            for _ in range(200):
+                await client.send_audio(CHUNK)
+                await asyncio.sleep(0.001)
+        return errors
+
+    errors = run_with_server(handler, client_session)
+    assert len(errors) == 1
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from audio_buffer import AudioRingBuffer
+from speech_services import audio_generator
+
+
+def test_reads_are_views_into_the_ring_and_wrap_around():
+    async def run():
+        ring = AudioRingBuffer(8)
+        await ring.write(b"abcdef")
+        first = await ring.read(4)
+        assert isinstance(first, memoryview) and first.obj is ring._buffer
+        assert bytes(first) == b"abcd"
+        assert bytes(await ring.read()) == b"ef"
+        await ring.write(b"ghijkl")  # reuses the space of "abcd", wrapping around the end
+        ring.close()
+        chunks = [bytes(chunk) async for chunk in audio_generator(ring)]
+        assert chunks == [b"gh", b"ijkl"]
+        assert ring.stats()["overruns"] == 0
+
+    asyncio.run(run())
+
+
+def test_drop_oldest_keeps_the_newest_audio():
+    async def run():
+        ring = AudioRingBuffer(8)
+        for chunk in (b"aabb", b"ccdd", b"eeff"):
+            ring.write_nowait(chunk)
+        assert ring.stats()["dropped_bytes"] == 4
+        view = await ring.read()
+        assert bytes(view) == b"ccdd"
+        # The lent view's bytes are protected: with the ring full, the incoming chunk is dropped
+        ring.write_nowait(b"gghhiijj")
+        ring.close()
+        rest = b"".join([bytes(chunk) async for chunk in audio_generator(ring)])
+        return ring, rest
+
+    ring, rest = asyncio.run(run())
+    assert rest == b"eeff"
+    assert ring.stats()["overruns"] == 2
+    assert ring.stats()["dropped_bytes"] == 12
+
+
+def test_block_policy_waits_for_the_reader():
+    async def run():
+        ring = AudioRingBuffer(64, policy="block")
+        audio = bytes(range(256)) * 4
+
+        async def produce():
+            for i in range(0, len(audio), 24):
+                await ring.write(audio[i:i + 24])
+            ring.close()
+
+        producer = asyncio.create_task(produce())
+        received = bytearray()
+        async for chunk in audio_generator(ring):
+            received += chunk
+            await asyncio.sleep(0)
+        await producer
+        return ring, audio, bytes(received)
+
+    ring, audio, received = asyncio.run(run())
+    assert received == audio
+    assert ring.stats()["dropped_bytes"] == 0
+    assert ring.stats()["blocked_writes"] > 0
+    assert ring.stats()["peak_fill"] <= 64
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        AudioRingBuffer(16, policy="grow")
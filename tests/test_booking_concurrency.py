@@ -0,0 +1,81 @@
+import asyncio
+import multiprocessing
+import time
+from datetime import datetime, timedelta
+
+import file_storage
+from file_storage import add_doctors_appointment, load_schedule
+
+
+SLOTS = 100
+ATTEMPTS_PER_SLOT = 3
+
+
+def slot(i):
+    start = datetime(2025, 8, 1, 9, 0) + timedelta(days=i // 40, minutes=(i % 40) * 10)
+    return {"doctor_name": "john", "start": start.isoformat(), "end": (start + timedelta(minutes=10)).isoformat()}
+
+
+def assert_schedule_consistent(schedule_file, expected_bookings):
+    schedule = load_schedule(str(schedule_file))
+    entries = [entry for day in schedule.values() for entry in day.values()]
+    assert len(entries) == expected_bookings
+
+    for day, slots in schedule.items():
+        intervals = sorted((entry["start"], entry["end"]) for entry in slots.values())
+        for previous, current in zip(intervals, intervals[1:]):
+            assert current[0] >= previous[1], f"double booked {previous} and {current} on {day}"
+
+
+def setup_schedule(tmp_path, monkeypatch):
+    schedule_file = tmp_path / "john.json"
+    schedule_file.write_text("")
+    monkeypatch.setattr(file_storage, "SCHEDULE_DIR", str(tmp_path))
+    return schedule_file
+
+
+def test_concurrent_bookings_in_one_worker(tmp_path, monkeypatch):
+    schedule_file = setup_schedule(tmp_path, monkeypatch)
+
+    async def run():
+        attempts = [slot(i) for i in range(SLOTS)] * ATTEMPTS_PER_SLOT
+        return await asyncio.gather(*(add_doctors_appointment(dict(a), f"patient{n}", "checkup") for n, a in enumerate(attempts)))
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    successes = [appointment_id for booked, appointment_id in results if booked]
+    assert len(successes) == SLOTS
+    assert len(set(successes)) == SLOTS
+    assert_schedule_consistent(schedule_file, SLOTS)
+    print(f"{len(results)} booking attempts in {elapsed:.2f}s ({len(results) / elapsed:.0f} bookings/s)")
+
+
+def _book_in_process(queue):
+    async def run():
+        attempts = [slot(i) for i in range(SLOTS)] * ATTEMPTS_PER_SLOT
+        return await asyncio.gather(*(add_doctors_appointment(dict(a), "patient", "checkup") for a in attempts))
+
+    queue.put(sum(1 for booked, _ in asyncio.run(run()) if booked))
+
+
+def test_concurrent_bookings_across_processes(tmp_path, monkeypatch):
+    schedule_file = setup_schedule(tmp_path, monkeypatch)
+
+    # Every process competes for every slot: each one tries the whole range
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    processes = [ctx.Process(target=_book_in_process, args=(queue,)) for _ in range(4)]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    successes = sum(queue.get(timeout=60) for _ in processes)
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    assert successes == SLOTS
+    assert_schedule_consistent(schedule_file, SLOTS)
+    attempts = len(processes) * SLOTS * ATTEMPTS_PER_SLOT
+    print(f"{attempts} booking attempts across {len(processes)} processes in {elapsed:.2f}s ({attempts / elapsed:.0f} bookings/s)")
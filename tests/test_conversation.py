@@ -0,0 +1,53 @@
+import pytest
+
+from conversation import SessionState, TRANSITIONS
+from helpers import next_open_state, next_prompt_type
+
+
+def test_transition_table_drives_the_flow():
+    state, visited = "name", []
+    while state != "done":
+        visited.append(state)
+        state = next_prompt_type(state)
+    assert visited == list(TRANSITIONS)
+    assert SessionState(state="email").next_state() == "schedule_appointment"
+
+
+def test_retry_budget_is_per_state():
+    session = SessionState()
+    assert [session.record_retry("phone") for _ in range(4)] == [True, True, True, False]
+    assert all(session.record_retry("address") for _ in range(5))
+    assert not session.record_retry("address")
+    session.reset_retries("phone")
+    assert session.record_retry("phone")
+
+
+def test_item_access_like_the_old_dict():
+    session = SessionState()
+    session["phone"] = "+19177012642"
+    session.update({"email": "racheltaskale@gmail.com"})
+    assert session.get("phone") == "+19177012642"
+    assert session["email"] == "racheltaskale@gmail.com"
+    assert session.setdefault("stats", {}) is session.stats
+    assert "appointments" in session and "patient_name" not in session
+    with pytest.raises(KeyError):
+        session["patient_name"] = "rachel"
+    assert next_open_state("email", session) == "schedule_appointment"
+
+
+def test_snapshot_round_trip():
+    session = SessionState(state="schedule_appointment", name={"first_name": "rachel", "last_name": "taskale"},
+                           phone="+19177012642", appointments={"doctor_name": "john", "start": "2030-01-01T09:00:00"})
+    session.record_retry("schedule_appointment")
+    snapshot = session.snapshot()
+    assert isinstance(snapshot, bytes)
+    assert SessionState.restore(snapshot) == session
+    with pytest.raises(ValueError):
+        SessionState.restore(b"\x00" + snapshot[1:])
+
+
+def test_summary_leaves_out_personal_details():
+    session = SessionState(name={"first_name": "rachel", "last_name": "taskale"}, email="racheltaskale@gmail.com")
+    summary = session.summary()
+    assert "rachel" not in summary
+    assert "'name'" in summary and "'email'" in summary
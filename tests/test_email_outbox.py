@@ -0,0 +1,107 @@
+import asyncio
+
+import resilience
+from config import config
+from email_outbox import EmailOutbox
+from resilience import get_breaker
+from stub_servers import SendGridStub
+
+
+def test_outbox_dedupes_retries_and_sends(tmp_path):
+    async def run():
+        stub = SendGridStub(error_rate=1.0)
+        host = await stub.start()
+        outbox = EmailOutbox(str(tmp_path / "outbox.db"), "key", host, base_backoff=0.01)
+        payload = {"personalizations": [{"to": [{"email": "racheltaskale@gmail.com"}]}], "subject": "Confirmed"}
+        try:
+            assert outbox.enqueue("appointment-1", payload)
+            assert not outbox.enqueue("appointment-1", payload)
+            assert outbox.enqueue("appointment-2", payload)
+            assert outbox.depth() == 2
+
+            # Both fail and get rescheduled with backoff
+            assert await outbox.send_due() == 2
+            assert outbox.depth() == 2
+            assert await outbox.send_due() == 0
+
+            stub.error_rate = 0.0
+            await asyncio.sleep(0.05)
+            assert await outbox.send_due() == 2
+            assert outbox.depth() == 0
+            assert await outbox.send_due() == 0
+        finally:
+            await outbox.aclose()
+            outbox.close()
+            await stub.stop()
+        return stub
+
+    stub = asyncio.run(run())
+    assert len(stub.messages) == 2
+    assert stub.requests == 4
+
+
+def test_failed_after_max_attempts(tmp_path):
+    async def run():
+        stub = SendGridStub(error_rate=1.0)
+        host = await stub.start()
+        outbox = EmailOutbox(str(tmp_path / "outbox.db"), "key", host, max_attempts=2, base_backoff=0.0, poll_interval=0.01)
+        task = outbox.ensure_started()
+        outbox.enqueue("appointment-1", {"subject": "Confirmed"})
+        await asyncio.sleep(0.3)
+        depth = outbox.depth()
+        outbox.close()
+        await asyncio.gather(task, return_exceptions=True)
+        await stub.stop()
+        return depth, stub.requests
+
+    depth, requests = asyncio.run(run())
+    assert depth == 0
+    assert requests == 2
+
+
+def test_sent_messages_keep_no_payload(tmp_path):
+    async def run():
+        stub = SendGridStub()
+        host = await stub.start()
+        outbox = EmailOutbox(str(tmp_path / "outbox.db"), "key", host)
+        try:
+            outbox.enqueue("appointment-1", {"subject": "Confirmed", "content": [{"value": "rachel taskale"}]})
+            assert await outbox.send_due() == 1
+            rows = outbox._conn.execute("SELECT status, payload FROM outbox").fetchall()
+            # Still deduplicated after the send
+            assert not outbox.enqueue("appointment-1", {"subject": "Confirmed"})
+        finally:
+            await outbox.aclose()
+            outbox.close()
+            await stub.stop()
+        return rows, stub
+
+    rows, stub = asyncio.run(run())
+    assert rows == [("sent", "")]
+    assert len(stub.messages) == 1
+
+
+def test_rejected_message_fails_at_once_without_tripping_the_breaker(tmp_path, monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(config.resilience, "breaker_failures", 2)
+
+    async def run():
+        stub = SendGridStub(reject_status=400)
+        host = await stub.start()
+        outbox = EmailOutbox(str(tmp_path / "outbox.db"), "key", host, base_backoff=0.0)
+        try:
+            for i in range(3):
+                outbox.enqueue(f"appointment-{i}", {"subject": "Confirmed"})
+            assert await outbox.send_due() == 3
+            assert await outbox.send_due() == 0
+            rows = outbox._conn.execute("SELECT status, attempts FROM outbox").fetchall()
+        finally:
+            await outbox.aclose()
+            outbox.close()
+            await stub.stop()
+        return rows, stub.requests
+
+    rows, requests = asyncio.run(run())
+    assert rows == [("failed", 1)] * 3
+    assert requests == 3
+    assert not get_breaker("sendgrid").is_open
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+
+import file_storage
+from file_storage import compute_free_intervals, get_booked_intervals, get_free_slots, has_conflict
+
+
+SCHEDULE = {
+    "2025-08-15": {
+        "a": {"available": False, "start": "13:30", "end": "14:00", "patient": "rachel", "reason": "checkup"},
+        "b": {"available": False, "start": "09:00", "end": "10:00", "patient": "john", "reason": "flu"},
+        "c": {"available": False, "start": "09:30", "end": "10:30", "patient": "kim", "reason": "flu"},
+        "d": {"available": True, "start": "15:00", "end": "16:00", "patient": "", "reason": ""},
+    }
+}
+
+
+def dt(value):
+    return datetime.fromisoformat(value)
+
+
+def test_booked_intervals_are_sorted_and_merged():
+    booked = get_booked_intervals(SCHEDULE)
+    assert booked["2025-08-15"] == [
+        (dt("2025-08-15T09:00"), dt("2025-08-15T10:30")),
+        (dt("2025-08-15T13:30"), dt("2025-08-15T14:00")),
+    ]
+
+
+def test_has_conflict():
+    booked = get_booked_intervals(SCHEDULE)["2025-08-15"]
+    assert has_conflict(booked, dt("2025-08-15T10:00"), dt("2025-08-15T10:15"))
+    assert has_conflict(booked, dt("2025-08-15T13:00"), dt("2025-08-15T13:45"))
+    assert has_conflict(booked, dt("2025-08-15T08:00"), dt("2025-08-15T17:00"))
+    assert not has_conflict(booked, dt("2025-08-15T10:30"), dt("2025-08-15T11:00"))
+    assert not has_conflict(booked, dt("2025-08-15T13:00"), dt("2025-08-15T13:30"))
+    assert not has_conflict([], dt("2025-08-15T13:00"), dt("2025-08-15T13:30"))
+
+
+def test_compute_free_intervals_clips_to_working_hours_and_window():
+    booked = get_booked_intervals(SCHEDULE)
+    free = compute_free_intervals(booked, dt("2025-08-15T08:00"), days=2)
+    assert free == [
+        (dt("2025-08-15T10:30"), dt("2025-08-15T13:30")),
+        (dt("2025-08-15T14:00"), dt("2025-08-15T17:00")),
+        (dt("2025-08-16T09:00"), dt("2025-08-16T17:00")),
+    ]
+
+    # Starting mid-day skips the time that has already passed
+    free = compute_free_intervals(booked, dt("2025-08-15T14:20"), days=1)
+    assert free == [(dt("2025-08-15T14:20"), dt("2025-08-15T17:00"))]
+
+
+def test_get_free_slots_reads_schedule_dir(tmp_path, monkeypatch):
+    (tmp_path / "anna.json").write_text(json.dumps(SCHEDULE))
+    (tmp_path / "john.json").write_text("")
+    monkeypatch.setattr(file_storage, "SCHEDULE_DIR", str(tmp_path))
+
+    free_slots = get_free_slots(dt("2025-08-15T09:00"), days=1)
+    assert list(free_slots) == ["anna", "john"]
+    assert free_slots["anna"][0] == (dt("2025-08-15T10:30"), dt("2025-08-15T13:30"))
+    assert free_slots["john"] == [(dt("2025-08-15T09:00"), dt("2025-08-15T17:00"))]
+
+
+def test_schedule_cache_reloads_only_changed_files(tmp_path):
+    anna = tmp_path / "anna.json"
+    john = tmp_path / "john.json"
+    anna.write_text(json.dumps(SCHEDULE))
+    john.write_text("{}")
+
+    cache = file_storage.ScheduleCache()
+    assert cache.list_files(str(tmp_path)) == [str(anna), str(john)]
+    assert cache.get_schedule(str(anna)) == SCHEDULE
+    assert cache.get_schedule(str(john)) == {}
+    assert cache.get_schedule(str(anna)) is cache.get_schedule(str(anna))
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 2
+
+    john.write_text(json.dumps({"2025-08-16": {}}))
+    assert cache.get_schedule(str(john)) == {"2025-08-16": {}}
+    assert cache.get_booked(str(anna)) == get_booked_intervals(SCHEDULE)
+    assert cache.stats()["misses"] == 3
+
+    john.unlink()
+    assert cache.list_files(str(tmp_path)) == [str(anna)]
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,84 @@
+import time
+
+import llm_cache
+from config import AppConfig
+from helpers import MULTI_FIELD_STATES
+from llm_cache import DiskCache, LLMCache
+
+
+def test_normalized_inputs_share_an_entry():
+    cache = LLMCache()
+    cache.set("phone", "gpt-4", "My number is  9177012642 ", "+19177012642")
+    assert cache.get("phone", "gpt-4", "my number is 9177012642") == "+19177012642"
+    assert cache.get("phone", "gpt-4o-mini", "my number is 9177012642") is None
+    assert cache.get("email", "gpt-4", "my number is 9177012642") is None
+    assert cache.stats()["prompt_types"]["phone"] == {"memory_hits": 1, "disk_hits": 0, "misses": 1, "hit_rate": 0.5}
+
+
+def test_lru_eviction():
+    cache = LLMCache(max_entries=2)
+    cache.set("name", "gpt-4", "a", "A")
+    cache.set("name", "gpt-4", "b", "B")
+    cache.get("name", "gpt-4", "a")
+    cache.set("name", "gpt-4", "c", "C")
+    assert cache.get("name", "gpt-4", "b") is None
+    assert cache.get("name", "gpt-4", "a") == "A"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "monotonic", lambda: now[0])
+    cache = LLMCache(ttl_seconds=60)
+    cache.set("address_inference", "gpt-4", "87 hemlock rd", "87 Hemlock Rd, Manhasset, NY 11030")
+    now[0] += 59
+    assert cache.get("address_inference", "gpt-4", "87 hemlock rd") is not None
+    now[0] += 2
+    assert cache.get("address_inference", "gpt-4", "87 hemlock rd") is None
+
+
+def test_disabled_prompt_type():
+    cache = LLMCache(disabled_prompt_types=["scheduling"])
+    cache.set("scheduling", "gpt-4", "tomorrow at 2pm", "{}")
+    assert cache.get("scheduling", "gpt-4", "tomorrow at 2pm") is None
+    assert "scheduling" not in cache.stats()["prompt_types"]
+
+
+def test_disk_tier_is_shared(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    LLMCache(disk_path=path).set("availability", "gpt-4", "Dr. anna ...", "Dr. Anna is free ...")
+
+    other_worker = LLMCache(disk_path=path)
+    assert other_worker.get("availability", "gpt-4", "Dr. anna ...") == "Dr. Anna is free ..."
+    assert other_worker.get("availability", "gpt-4", "Dr. anna ...") == "Dr. Anna is free ..."
+    counters = other_worker.stats()["prompt_types"]["availability"]
+    assert (counters["disk_hits"], counters["memory_hits"]) == (1, 1)
+
+
+def test_disk_tier_skips_phi_prompt_types(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    cache = LLMCache(disk_path=path, disk_disabled_prompt_types=["phone"])
+    cache.set("phone", "gpt-4", "nine one seven", "+19177012642")
+    assert cache.get("phone", "gpt-4", "nine one seven") == "+19177012642"
+    assert LLMCache(disk_path=path).get("phone", "gpt-4", "nine one seven") is None
+
+
+def test_disk_tier_is_purged_and_capped(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    disk = DiskCache(path, max_rows=3)
+    now = time.time()
+    disk.set("expired", "x", now - 1)
+    for i in range(5):
+        disk.set(f"key{i}", "x", now + 60 + i)
+    disk.close()
+
+    reopened = DiskCache(path, max_rows=3)
+    keys = [row[0] for row in reopened._conn.execute("SELECT key FROM llm_cache ORDER BY key")]
+    # Opening purges: the expired row and the ones closest to expiry are gone
+    assert keys == ["key2", "key3", "key4"]
+
+
+def test_patient_field_prompt_types_are_off_disk_by_default(monkeypatch):
+    monkeypatch.delenv("LLM_CACHE_DISK_DISABLED", raising=False)
+    disk_disabled = set(AppConfig().llm_cache.disk_disabled_prompt_types)
+    assert {*MULTI_FIELD_STATES, "address", "multi_field"} <= disk_disabled
@@ -0,0 +1,114 @@
+import io
+import json
+import logging
+import queue
+import weakref
+
+from log import (
+    REDACTED, DroppingQueueHandler, JsonFormatter, SamplingFilter, parse_levels, redact_text,
+)
+
+
+def make_logger(name, formatter=None, rate=1.0, maxsize=100):
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(formatter or JsonFormatter())
+    handler = DroppingQueueHandler(queue.Queue(maxsize=maxsize))
+    handler.addFilter(SamplingFilter(rate))
+    listener = logging.handlers.QueueListener(handler.queue, target)
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return logger, handler, listener, stream
+
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_json_lines_with_extra_fields():
+    logger, _, listener, stream = make_logger("test_log.json")
+    listener.start()
+    logger.info("turn handled in %s", "address", extra={"call_id": "room-1", "retry": False})
+    listener.stop()
+
+    [entry] = lines(stream)
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test_log.json"
+    assert entry["msg"] == "turn handled in address"
+    assert entry["call_id"] == "room-1"
+    assert entry["retry"] is False
+    assert entry["ts"].endswith("Z")
+
+
+def test_phi_is_redacted():
+    assert redact_text("reach me at jane.doe@example.com or (415) 555-0132") == f"reach me at {REDACTED} or {REDACTED}"
+    assert redact_text("member id ABC1234567, born 04/12/1980") == f"member id {REDACTED}, born {REDACTED}"
+    assert redact_text("state=address retries={'name': 1}") == "state=address retries={'name': 1}"
+
+    logger, _, listener, stream = make_logger("test_log.redact")
+    listener.start()
+    logger.info("caller said %s", "my email is a@b.io", extra={"user_input": "Jane Doe", "state": "email"})
+    listener.stop()
+
+    [entry] = lines(stream)
+    assert entry["msg"] == f"caller said my email is {REDACTED}"
+    assert entry["user_input"] == REDACTED
+    assert entry["state"] == "email"
+
+
+def test_message_is_rendered_when_logged():
+    logger, _, listener, stream = make_logger("test_log.snapshot")
+    state = {"state": "name"}
+    logger.info("state %s", state)
+    state["state"] = "email"
+    listener.start()
+    listener.stop()
+    assert lines(stream)[0]["msg"] == "state {'state': 'name'}"
+
+
+def test_extras_are_copied_when_logged():
+    logger, _, listener, stream = make_logger("test_log.extras")
+    retries = {"address_step": 1}
+    logger.info("retry", extra={"retries": retries, "states": ("name", "email")})
+    retries["address_step"] = 2
+
+    class Session:
+        pass
+
+    session = Session()
+    logger.info("gone", extra={"session": weakref.proxy(session)})
+    del session
+    listener.start()
+    listener.stop()
+
+    first, second = lines(stream)
+    assert first["retries"] == {"address_step": 1}
+    assert first["states"] == ["name", "email"]
+    assert "Session" in second["session"]
+
+
+def test_debug_records_are_sampled():
+    logger, _, listener, stream = make_logger("test_log.sampling", rate=0.0, maxsize=1000)
+    listener.start()
+    for _ in range(50):
+        logger.debug("noisy")
+    logger.debug("always kept", extra={"sample": 1.0})
+    logger.info("not sampled")
+    listener.stop()
+    assert [entry["msg"] for entry in lines(stream)] == ["always kept", "not sampled"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    logger, handler, listener, stream = make_logger("test_log.full", maxsize=2)
+    for i in range(5):
+        logger.info("line %d", i)
+    assert handler.dropped == 3
+    listener.start()
+    listener.stop()
+    assert [entry["msg"] for entry in lines(stream)] == ["line 0", "line 1"]
+
+
+def test_parse_levels():
+    assert parse_levels("file_storage=debug, httpx=WARNING,,bad") == {"file_storage": "DEBUG", "httpx": "WARNING"}
@@ -0,0 +1,22 @@
+from prometheus_client import REGISTRY
+
+import metrics
+
+
+def test_span_records_histogram_and_quantiles():
+    # A state no other test records, so the counts and the quantile window are this test's own
+    state = "test_metrics_phone"
+    for ms in range(1, 101):
+        metrics.observe("extraction_llm", state, ms / 1000)
+    with metrics.span("extraction_llm", state):
+        pass
+
+    count = REGISTRY.get_sample_value("turn_stage_seconds_count", {"stage": "extraction_llm", "state": state})
+    assert count == 101
+    quantiles = metrics.get_quantiles("extraction_llm", state)
+    assert quantiles[0.5] == 0.05
+    assert quantiles[0.99] == 0.099
+    p99 = REGISTRY.get_sample_value(
+        "turn_stage_quantile_seconds", {"stage": "extraction_llm", "state": state, "quantile": "0.99"}
+    )
+    assert p99 == 0.099
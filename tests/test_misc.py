@@ -1,5 +1,5 @@
 import json
-from validators import extract_and_check_address_with_openai, validate_address_with_smarty, validate_full_address
+from validators import extract_address, validate_address_with_smarty, validate_full_address
 
 # returns true
 def test_address_validation_1():
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import Counter
+
+import model_router
+import openai_client
+from config import OpenAIConfig, config
+from helpers import data_extraction
+from llm_cache import get_llm_cache
+from model_router import CHEAP_MODEL, STRONG_MODEL, Route, parse_routes
+from resilience import LatencyTracker, turn_deadline
+from stub_servers import OpenAIStub, default_openai_responder
+
+
+def run_with_stub(monkeypatch, coro_fn, responder=default_openai_responder, model_latency=None):
+    async def run():
+        stub = OpenAIStub(responder=responder)
+        stub.model_latency = model_latency or {}
+        base_url = await stub.start()
+        client = openai_client.OpenAIClient("test-key", None, None, OpenAIConfig(api_key="test-key", base_url=f"{base_url}/v1"))
+        monkeypatch.setattr(openai_client, "_openai_client", client)
+        monkeypatch.setattr(model_router, "_route_stats", Counter())
+        get_llm_cache().clear()
+        try:
+            return await coro_fn(), stub
+        finally:
+            await client.aclose()
+            await stub.stop()
+
+    return asyncio.run(run())
+
+
+def test_parse_routes_keeps_unset_defaults():
+    routes = parse_routes("phone=gpt-4.1-mini::2,scheduling=gpt-4o:400,,bad")
+    assert routes["phone"] == Route("gpt-4.1-mini", 32, 2.0, "gpt-4o")
+    assert routes["scheduling"] == Route("gpt-4o", 400, 6.0)
+    assert set(routes) == {"phone", "scheduling"}
+
+
+def test_cheap_model_answer_is_kept_when_it_validates(monkeypatch):
+    result, stub = run_with_stub(monkeypatch, lambda: data_extraction("it's the number on my file", "phone"))
+    assert result == ("+19177012642", True, "")
+    assert stub.models == ["gpt-4o-mini"]
+    assert stub.max_tokens == [32]
+    assert model_router.get_route_stats()["phone"]["escalation_rate"] == 0.0
+
+
+def test_invalid_answer_escalates_to_the_stronger_model(monkeypatch):
+    answers = iter(["call me maybe", "+19177012642"])
+    result, stub = run_with_stub(
+        monkeypatch, lambda: data_extraction("it's the number on my file", "phone"), responder=lambda prompt: next(answers)
+    )
+    assert result == ("+19177012642", True, "")
+    assert stub.models == ["gpt-4o-mini", "gpt-4o"]
+    stats = model_router.get_route_stats()["phone"]
+    assert stats["requests"] == 2
+    assert stats["escalation_rate"] == 1.0
+
+
+def test_routing_off_uses_the_default_model(monkeypatch):
+    monkeypatch.setattr(config.model_routing, "enabled", False)
+    _, stub = run_with_stub(monkeypatch, lambda: data_extraction("it's the number on my file", "phone"))
+    assert stub.models == [openai_client.DEFAULT_MODEL]
+    assert stub.max_tokens == [None]
+
+
+def test_routing_off_keeps_a_structured_output_model_for_response_formats(monkeypatch):
+    monkeypatch.setattr(config.model_routing, "enabled", False)
+    _, stub = run_with_stub(monkeypatch, lambda: model_router.chat(
+        "address", "123 Main Street, San Francisco", response_format={"type": "json_object"}
+    ), responder=lambda prompt: "{}")
+    assert stub.models == [openai_client.STRUCTURED_OUTPUT_MODEL]
+
+
+def test_stalled_cheap_model_escalates_inside_the_turn_deadline(monkeypatch):
+    # The client keeps its default SDK retries; the budgeted first attempt must not use them
+    monkeypatch.setattr(model_router, "_routes", {"phone": Route(CHEAP_MODEL, 32, 0.3, STRONG_MODEL)})
+    monkeypatch.setattr(model_router, "_latencies", LatencyTracker())
+
+    async def turn():
+        start = time.perf_counter()
+        with turn_deadline(1.5):
+            result = await data_extraction("it's the number on my file", "phone")
+        return result, time.perf_counter() - start
+
+    (result, seconds), stub = run_with_stub(monkeypatch, turn, model_latency={CHEAP_MODEL: 2.0})
+    assert result == ("+19177012642", True, "")
+    assert stub.models == [CHEAP_MODEL, STRONG_MODEL]
+    assert seconds < 1.5
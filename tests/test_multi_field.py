@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+import openai_client
+from config import OpenAIConfig, config
+from helpers import extract_volunteered_fields, next_open_state, remaining_fields
+from metrics import track_call_stats
+from stub_servers import OpenAIStub
+
+
+def test_remaining_fields_skips_filled_and_address():
+    session_state = {"name": {"first_name": "rachel", "last_name": "taskale"}, "phone": "+19177012642"}
+    assert remaining_fields("insurance_payer", session_state) == ["insurance_payer", "insurance_id", "topic_of_call", "email"]
+    assert remaining_fields("email", session_state) == ["email"]
+
+
+def test_next_open_state_skips_answered_steps():
+    session_state = {"insurance_payer": {"first_name": "john"}, "insurance_id": "123456723D", "phone": "+19177012642"}
+    assert next_open_state("name", session_state) == "topic_of_call"
+    assert next_open_state("address", session_state) == "email"
+    assert next_open_state("email", session_state) == "schedule_appointment"
+
+
+@pytest.mark.parametrize("routing", [True, False])
+def test_one_call_fills_every_volunteered_field(monkeypatch, routing):
+    # The stub rejects json_object on models without JSON mode, as the API does
+    monkeypatch.setattr(config.model_routing, "enabled", routing)
+
+    async def run():
+        stub = OpenAIStub()
+        base_url = await stub.start()
+        client = openai_client.OpenAIClient("test-key", None, None, OpenAIConfig(api_key="test-key", base_url=f"{base_url}/v1"))
+        monkeypatch.setattr(openai_client, "_openai_client", client)
+        stats = {"turns": 1, "llm_calls": 0}
+        track_call_stats(stats)
+        try:
+            result = await extract_volunteered_fields(
+                "hi, my name is grace hopper, I'm calling for a knee x-ray, my number is 917 701 2642 "
+                "and my email is grace@navy.mil",
+                "name",
+                {},
+            )
+        finally:
+            await client.aclose()
+            await stub.stop()
+        return result, stats, stub.requests
+
+    (data, valid, error, volunteered), stats, requests = asyncio.run(run())
+    assert valid
+    assert data == {"first_name": "grace", "last_name": "hopper"}
+    assert volunteered == {"topic_of_call": "a knee x-ray", "phone": "+19177012642", "email": "grace@navy.mil"}
+    assert requests == 1
+    assert stats["llm_calls"] == 1
+
+
+def test_fast_path_answer_skips_the_llm():
+    data, valid, error, volunteered = asyncio.run(
+        extract_volunteered_fields("nine one seven seven zero one two six four two", "phone", {})
+    )
+    assert (data, valid, volunteered) == ("+19177012642", True, {})
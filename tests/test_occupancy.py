@@ -0,0 +1,190 @@
+import asyncio
+import json
+import random
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+import file_storage
+import occupancy
+import openai_client
+from config import OpenAIConfig
+from helpers import handle_appointment_scheduling, no_doctor_free_message
+from llm_cache import get_llm_cache
+from file_storage import compute_free_intervals, get_booked_intervals, has_conflict
+from occupancy import OccupancyIndex, get_occupancy
+from stub_servers import OpenAIStub
+
+DAY = date(2025, 8, 15)
+
+
+def dt(value):
+    return datetime.fromisoformat(value)
+
+
+def booking(start, end):
+    return {"available": False, "start": start, "end": end, "patient": "p", "reason": "checkup"}
+
+
+SCHEDULES = {
+    "anna": {"2025-08-15": {"a": booking("09:00", "12:00"), "b": booking("13:02", "13:28")}},
+    "john": {"2025-08-15": {"c": booking("09:00", "09:30"), "d": booking("12:00", "17:00")}},
+    "kim": {"2025-08-15": {"e": booking("09:00", "17:00")}},
+}
+
+
+def index(days=2):
+    return OccupancyIndex.from_booked(
+        {doctor: get_booked_intervals(schedule) for doctor, schedule in SCHEDULES.items()}, DAY, days
+    )
+
+
+def test_partially_booked_cells_are_busy():
+    busy = index().busy[0, 0]
+    # anna 13:02-13:28 blocks the 13:00-13:30 cells, not 12:55 or 13:30
+    assert busy[(13 * 60 - 9 * 60) // 5: (13 * 60 + 30 - 9 * 60) // 5].all()
+    assert not busy[(12 * 60 + 55 - 9 * 60) // 5]
+    assert not busy[(13 * 60 + 30 - 9 * 60) // 5]
+
+
+def test_first_slots_across_all_doctors_are_in_time_order():
+    assert index().find_slots(30, limit=4) == [
+        ("john", dt("2025-08-15T09:30"), dt("2025-08-15T10:00")),
+        ("john", dt("2025-08-15T09:45"), dt("2025-08-15T10:15")),
+        ("john", dt("2025-08-15T10:00"), dt("2025-08-15T10:30")),
+        ("john", dt("2025-08-15T10:15"), dt("2025-08-15T10:45")),
+    ]
+
+
+def test_window_and_doctor_filter():
+    afternoon = (dt("2025-08-15T12:00"), dt("2025-08-15T17:00"))
+    assert index().find_slots(timedelta(minutes=45), window=afternoon, limit=2, step=30) == [
+        ("anna", dt("2025-08-15T12:00"), dt("2025-08-15T12:45")),
+        ("anna", dt("2025-08-15T13:30"), dt("2025-08-15T14:15")),
+    ]
+    # The slot has to end inside the window too
+    assert index().find_slots(60, window=(dt("2025-08-15T16:30"), dt("2025-08-15T17:00"))) == []
+    assert index().find_slots(30, doctors=["kim"], limit=1) == [("kim", dt("2025-08-16T09:00"), dt("2025-08-16T09:30"))]
+    assert index().find_slots(30, doctors=["nobody"]) == []
+
+
+def test_free_doctors():
+    assert index().free_doctors(dt("2025-08-15T10:00"), dt("2025-08-15T10:30")) == ["john"]
+    assert index().free_doctors(dt("2025-08-15T13:25"), dt("2025-08-15T14:00")) == []
+    assert index().free_doctors(dt("2025-08-16T09:00"), dt("2025-08-16T09:30")) == ["anna", "john", "kim"]
+    assert index().free_doctors(dt("2025-08-15T08:00"), dt("2025-08-15T09:30")) == []
+
+
+def test_found_slots_agree_with_the_interval_engine():
+    rng = random.Random(7)
+    booked = {}
+    for d in range(20):
+        schedule = {}
+        for day in range(5):
+            slots = {}
+            for n in range(rng.randint(0, 8)):
+                start = rng.randrange(9 * 60, 17 * 60 - 10, 5)
+                end = min(17 * 60, start + rng.choice([10, 15, 30, 45, 60]))
+                slots[str(n)] = booking(f"{start // 60:02d}:{start % 60:02d}", f"{end // 60:02d}:{end % 60:02d}")
+            schedule[(DAY + timedelta(days=day)).isoformat()] = slots
+        booked[f"doctor{d:02d}"] = get_booked_intervals(schedule)
+
+    index = OccupancyIndex.from_booked(booked, DAY, 5)
+    slots = index.find_slots(30, limit=10000, step=5)
+    for doctor, start, end in slots:
+        assert not has_conflict(booked[doctor].get(start.date().isoformat(), []), start, end)
+    # Every 5-minute start the interval engine allows is found, and nothing else
+    expected = sum(
+        max(0, int((free_end - free_start).total_seconds() // 60 - 30) // 5 + 1)
+        for intervals in booked.values()
+        for free_start, free_end in compute_free_intervals(intervals, datetime.combine(DAY, datetime.min.time()), 5)
+    )
+    assert len(slots) == expected
+
+    from_free = OccupancyIndex.from_free(
+        {doctor: compute_free_intervals(intervals, datetime.combine(DAY, datetime.min.time()), 5) for doctor, intervals in booked.items()},
+        DAY, 5,
+    )
+    assert np.array_equal(from_free.busy, index.busy)
+
+
+def test_get_occupancy_rebuilds_only_changed_doctors(tmp_path, monkeypatch):
+    for doctor, schedule in SCHEDULES.items():
+        (tmp_path / f"{doctor}.json").write_text(json.dumps(schedule))
+    monkeypatch.setattr(file_storage, "SCHEDULE_DIR", str(tmp_path))
+    monkeypatch.setattr(occupancy, "_occupancy", None)
+    file_storage.schedule_cache.invalidate()
+
+    first = get_occupancy(DAY, 2)
+    assert first.free_doctors(dt("2025-08-15T10:00"), dt("2025-08-15T10:30")) == ["john"]
+    busy_before = first.busy
+
+    schedule = dict(SCHEDULES["john"]["2025-08-15"], f=booking("10:00", "10:30"))
+    (tmp_path / "john.json").write_text(json.dumps({"2025-08-15": schedule}))
+    second = get_occupancy(DAY, 2)
+    assert second is first
+    assert second.busy is not busy_before
+    assert second.free_doctors(dt("2025-08-15T10:00"), dt("2025-08-15T10:30")) == []
+    assert np.array_equal(second.busy[0], busy_before[0])
+
+
+def test_any_doctor_is_resolved_to_one_who_is_free(tmp_path, monkeypatch):
+    day = date.today() + timedelta(days=1)
+    start = datetime.combine(day, datetime.min.time()) + timedelta(hours=10)
+    end = start + timedelta(minutes=30)
+    (tmp_path / "anna.json").write_text(json.dumps({day.isoformat(): {"a": booking("10:00", "11:00")}}))
+    (tmp_path / "john.json").write_text("")
+    monkeypatch.setattr(file_storage, "SCHEDULE_DIR", str(tmp_path))
+    monkeypatch.setattr(occupancy, "_occupancy", None)
+    file_storage.schedule_cache.invalidate()
+
+    answer = json.dumps({"doctor_name": "any", "start": start.isoformat(), "end": end.isoformat(), "missing_fields": []})
+
+    async def schedule():
+        stub = OpenAIStub(responder=lambda prompt: answer)
+        base_url = await stub.start()
+        client = openai_client.OpenAIClient("test-key", None, None, OpenAIConfig(api_key="test-key", base_url=f"{base_url}/v1"))
+        monkeypatch.setattr(openai_client, "_openai_client", client)
+        get_llm_cache().clear()
+        try:
+            return await handle_appointment_scheduling("tomorrow at ten, whoever's free")
+        finally:
+            await client.aclose()
+            await stub.stop()
+
+    data, valid, _ = asyncio.run(schedule())
+    assert valid and data["doctor_name"] == "john"
+
+
+def test_least_booked_doctor_on_the_day():
+    assert index().least_booked(["anna", "john", "kim"], DAY) == "anna"
+    assert index().least_booked(["john", "kim"], DAY) == "john"
+    # Nobody has bookings on the 16th: index order
+    assert index().least_booked(["kim", "john"], DAY + timedelta(days=1)) == "john"
+    assert index().least_booked(["nobody"], DAY) is None
+
+
+def test_no_doctor_free_message_suggests_the_nearest_slots():
+    message = no_doctor_free_message(index(), dt("2025-08-15T09:00"), dt("2025-08-15T09:30"))
+    assert message == (
+        "No doctor is free at that time. The nearest open times are: Dr. john on Friday 2025-08-15 at 09:30, "
+        "Dr. john on Friday 2025-08-15 at 09:45, Dr. john on Friday 2025-08-15 at 10:00"
+    )
+
+
+def test_service_mode_index_is_cached(monkeypatch):
+    class Client:
+        calls = 0
+
+        def free_slots(self, start, days):
+            Client.calls += 1
+            return {"anna": [(dt("2025-08-15T09:00"), dt("2025-08-15T17:00"))]}
+
+    monkeypatch.setattr(occupancy, "get_schedule_client", lambda: Client())
+    monkeypatch.setattr(occupancy, "_service_occupancy", None)
+    first = get_occupancy(DAY, 2)
+    assert get_occupancy(DAY, 2) is first
+    assert Client.calls == 1
+    monkeypatch.setattr(occupancy, "SERVICE_REFRESH_SECONDS", 0)
+    assert get_occupancy(DAY, 2) is not first
+    assert Client.calls == 2
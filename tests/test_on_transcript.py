@@ -1,4 +1,8 @@
 import asyncio
+import threading
+
+import speech_services
+from conversation import SessionState
 from speech_services import on_transcript
 
 cases = {
@@ -33,3 +37,34 @@ async def test_on_transcript():
 
 if __name__ == "__main__":
     asyncio.run(test_on_transcript())
+
+
+def test_accepted_appointment_writes_the_record_and_sends_the_email(monkeypatch):
+    appointment = {"doctor_name": "john", "start": "2025-08-15T13:30:00", "end": "2025-08-15T14:00:00"}
+    written, emailed = [], []
+
+    async def scheduled(text):
+        return dict(appointment), True, ""
+
+    async def booked(data, name, topic):
+        return True, "appointment-1"
+
+    monkeypatch.setattr(speech_services, "handle_appointment_scheduling", scheduled)
+    monkeypatch.setattr(speech_services, "add_doctors_appointment", booked)
+    writer_threads = []
+
+    def write_patient_record(state):
+        writer_threads.append(threading.current_thread())
+        written.append(state)
+
+    monkeypatch.setattr(speech_services, "write_patient_record", write_patient_record)
+    monkeypatch.setattr(speech_services, "enqueue_confirmation_email", emailed.append)
+
+    session_state = SessionState(state="schedule_appointment", name={"first_name": "rachel", "last_name": "taskale"})
+    result, session_state = asyncio.run(on_transcript(cases["schedule_appointment"], session_state))
+
+    assert result == {"end_call": True, "retry": False}
+    assert session_state["appointments"] == {**appointment, "id": "appointment-1"}
+    assert written == emailed == [session_state]
+    # The SQLite write stays off the event loop
+    assert writer_threads[0] is not threading.main_thread()
@@ -0,0 +1,36 @@
+import asyncio
+
+from config import OpenAIConfig
+from openai_client import OpenAIClient, SentenceBuffer
+from stub_servers import OpenAIStub
+
+
+def test_sentence_buffer_splits_on_sentence_boundaries():
+    buffer = SentenceBuffer()
+    sentences = []
+    for delta in ["Dr. Anna is free on Monday", " from 9 a.m. to noon. Dr", ". John is free", " on Tuesday!\nThat's all"]:
+        sentences += buffer.feed(delta)
+    sentences += buffer.flush()
+    assert sentences == [
+        "Dr. Anna is free on Monday from 9 a.m. to noon.",
+        "Dr. John is free on Tuesday!",
+        "That's all",
+    ]
+
+
+def test_stream_chat_response_yields_sentences_before_completion_ends():
+    async def run():
+        stub = OpenAIStub(token_delay=0.001)
+        base_url = await stub.start()
+        client = OpenAIClient("test-key", None, None, OpenAIConfig(api_key="test-key", base_url=f"{base_url}/v1"))
+        try:
+            full = await client.chat_response("Read the open appointment time ranges")
+            sentences = [s async for s in client.stream_chat_response("Read the open appointment time ranges")]
+        finally:
+            await client.aclose()
+            await stub.stop()
+        return full, sentences
+
+    full, sentences = asyncio.run(run())
+    assert len(sentences) == 15
+    assert " ".join(sentences) == full
@@ -0,0 +1,96 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from record_store import CorruptRecordStoreError, JsonRecordStore, SqliteRecordStore, migrate_json_to_sqlite
+
+
+RECORD = {
+    'insurance_payer': {'first_name': 'john', 'last_name': 'smith'},
+    'insurance_id': '123456723D',
+    'topic_of_call': 'annual check up',
+    'phone': '+19177012642',
+    'email': 'racheltaskale@gmail.com',
+    'last_name': 'taskale',
+    'first_name': 'rachel',
+}
+APPOINTMENT = {'doctor_name': 'john', 'start': '2025-08-15T13:30:00', 'end': '2025-08-15T14:00:00'}
+
+
+@pytest.mark.parametrize("store_type", ["json", "sqlite"])
+def test_upsert_patient(tmp_path, store_type):
+    if store_type == "json":
+        store = JsonRecordStore(str(tmp_path / "patient_records.json"))
+    else:
+        store = SqliteRecordStore(str(tmp_path / "patient_records.db"))
+
+    store.upsert_patient("taskale#rachel", RECORD, APPOINTMENT)
+    store.upsert_patient("taskale#rachel", {**RECORD, 'phone': '+12125550100'}, APPOINTMENT)
+    second_appointment = {**APPOINTMENT, 'start': '2025-08-16T13:30:00', 'end': '2025-08-16T14:00:00'}
+    store.upsert_patient("taskale#rachel", RECORD, second_appointment)
+
+    patient = store.get_patient("taskale#rachel")
+    assert patient['phone'] == '+19177012642'
+    assert patient['appointments'] == [APPOINTMENT, second_appointment]
+    assert store.count() == 1
+    assert store.get_patient("smith#john") is None
+    store.close()
+
+
+def test_json_store_refuses_to_overwrite_corrupt_file(tmp_path):
+    path = tmp_path / "patient_records.json"
+    path.write_text('{"taskale#rachel": ')
+    store = JsonRecordStore(str(path))
+    with pytest.raises(CorruptRecordStoreError):
+        store.upsert_patient("smith#john", RECORD, APPOINTMENT)
+    assert path.read_text() == '{"taskale#rachel": '
+
+
+def test_migrate_json_to_sqlite_runs_once(tmp_path):
+    json_path = tmp_path / "patient_records.json"
+    json_path.write_text(json.dumps({"taskale#rachel": {**RECORD, 'appointments': [APPOINTMENT]}}))
+    store = SqliteRecordStore(str(tmp_path / "patient_records.db"))
+
+    assert migrate_json_to_sqlite(str(json_path), store) == 1
+    assert migrate_json_to_sqlite(str(json_path), store) == 0
+    assert store.get_patient("taskale#rachel") == {**RECORD, 'appointments': [APPOINTMENT]}
+
+
+def test_plain_field_values_are_migrated_to_json(tmp_path):
+    path = str(tmp_path / "patient_records.db")
+    store = SqliteRecordStore(path)
+    # A database written before field values were JSON: plain strings and NULLs, no marker
+    store._conn.execute("DELETE FROM meta")
+    store._conn.execute(
+        "INSERT INTO patients (key, first_name, last_name, insurance_payer, insurance_id, topic_of_call, phone, email) "
+        "VALUES ('taskale#rachel', 'rachel', 'taskale', NULL, '12345', 'annual check up', '+19177012642', NULL)"
+    )
+    store.close()
+
+    reopened = SqliteRecordStore(path)
+    patient = reopened.get_patient("taskale#rachel")
+    assert (patient['first_name'], patient['insurance_id'], patient['phone']) == ('rachel', '12345', '+19177012642')
+    assert patient['insurance_payer'] is None
+    stored = reopened._conn.execute("SELECT insurance_id, email FROM patients").fetchone()
+    assert stored == ('"12345"', 'null')
+    reopened.close()
+
+    # Runs once: already-encoded values aren't encoded again
+    assert SqliteRecordStore(path).get_patient("taskale#rachel")['insurance_id'] == '12345'
+
+
+def open_and_count(path):
+    store = SqliteRecordStore(path)
+    count = store.count()
+    store.close()
+    return count
+
+
+def test_workers_opening_a_fresh_database_together(tmp_path):
+    path = str(tmp_path / "patient_records.db")
+    with ProcessPoolExecutor(8) as pool:
+        assert list(pool.map(open_and_count, [path] * 8)) == [0] * 8
+    store = SqliteRecordStore(path)
+    assert store.get_meta("field_encoding") == "json"
+    store.close()
@@ -0,0 +1,182 @@
+import asyncio
+import time
+from collections import Counter
+
+import pytest
+
+import address_verifier
+import model_router
+import openai_client
+import resilience
+from address_verifier import AddressVerificationError, AddressVerifier
+from config import OpenAIConfig, config
+from conversation import SessionState
+from helpers import stream_appointments_in_natural_language
+from llm_cache import get_llm_cache
+from resilience import CircuitOpenError, LatencyTracker, hedged, turn_deadline
+from speech_services import on_transcript
+from stub_servers import OpenAIStub, SmartyStub
+from validators import validate_full_address
+
+HAYES = {"street": "1245 Hayes Street", "city": "San Francisco", "state": "CA", "zip": "94117", "missing_fields": []}
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(config.resilience, "breaker_failures", 2)
+    monkeypatch.setattr(config.resilience, "breaker_reset_seconds", 0.2)
+    monkeypatch.setattr(model_router, "_route_stats", Counter())
+    monkeypatch.setattr(model_router, "_latencies", LatencyTracker())
+    get_llm_cache().clear()
+
+
+def run_with_stubs(monkeypatch, coro_fn, openai_stub=None, smarty_stub=None):
+    async def run():
+        openai = openai_stub or OpenAIStub()
+        smarty = smarty_stub or SmartyStub()
+        openai_url = await openai.start()
+        smarty_url = await smarty.start()
+        # No SDK retries: each test request is one upstream request
+        client = openai_client.OpenAIClient(
+            "test-key", None, None, OpenAIConfig(api_key="test-key", base_url=f"{openai_url}/v1", max_retries=0)
+        )
+        verifier = AddressVerifier("id", "token", smarty_url)
+        monkeypatch.setattr(openai_client, "_openai_client", client)
+        monkeypatch.setattr(address_verifier, "_address_verifier", verifier)
+        try:
+            return await coro_fn()
+        finally:
+            await client.aclose()
+            await verifier.aclose()
+            await openai.stop()
+            await smarty.stop()
+
+    return asyncio.run(run())
+
+
+def phone_state() -> SessionState:
+    return SessionState(state="phone")
+
+
+def test_turn_deadline_cuts_a_slow_llm_call_short(monkeypatch):
+    monkeypatch.setattr(config.resilience, "turn_deadline", 0.3)
+
+    async def turn():
+        start = time.perf_counter()
+        result, _ = await on_transcript("it's the number on my file", phone_state())
+        return result, time.perf_counter() - start
+
+    (result, seconds) = run_with_stubs(monkeypatch, turn, openai_stub=OpenAIStub(latency=1.0))
+    assert result == {"end_call": False, "retry": True, "degraded": True}
+    assert seconds < 0.8
+
+
+def test_deadline_is_shared_by_nested_calls():
+    async def nested():
+        with turn_deadline(0.5):
+            with turn_deadline(5):
+                return resilience.remaining()
+
+    assert asyncio.run(nested()) <= 0.5
+    assert resilience.remaining() is None
+
+
+def test_slow_request_is_hedged_and_the_faster_copy_wins(monkeypatch):
+    for _ in range(config.resilience.hedge_min_samples):
+        model_router._latencies.observe(("phone", "gpt-4o-mini"), 0.05)
+    stub = OpenAIStub()
+    stub.delays = [2.0]
+
+    async def call():
+        start = time.perf_counter()
+        response = await model_router.chat("phone", "What is your phone number? Transcript: nine one seven")
+        return response, time.perf_counter() - start
+
+    response, seconds = run_with_stubs(monkeypatch, call, openai_stub=stub)
+    assert response == "+19177012642"
+    assert seconds < 1.0
+    assert stub.requests == 2
+    assert model_router.get_route_stats()["phone"]["hedge_rate"] == 1.0
+
+
+def test_no_hedge_before_enough_samples(monkeypatch):
+    stub = OpenAIStub(latency=0.05)
+    run_with_stubs(monkeypatch, lambda: model_router.chat("phone", "What is your phone number?"), openai_stub=stub)
+    assert stub.requests == 1
+
+
+def test_hedged_survives_a_failing_copy():
+    calls = []
+
+    async def request():
+        calls.append(None)
+        if len(calls) == 1:
+            await asyncio.sleep(0.05)
+            raise ConnectionError("primary failed")
+        await asyncio.sleep(0.1)
+        return "hedge answer"
+
+    assert asyncio.run(hedged(request, hedge_after=0.01)) == ("hedge answer", "hedge")
+
+
+def test_smarty_breaker_opens_then_probes(monkeypatch):
+    stub = SmartyStub(error_rate=1.0)
+
+    async def lookups():
+        verifier = address_verifier.get_address_verifier()
+        for _ in range(2):
+            with pytest.raises(AddressVerificationError):
+                await verifier.verify("1245 Hayes Street", "San Francisco", "CA")
+        with pytest.raises(CircuitOpenError):
+            await verifier.verify("1245 Hayes Street", "San Francisco", "CA")
+        upstream_while_open = stub.requests
+        await asyncio.sleep(0.25)
+        stub.error_rate = 0.0
+        candidates = await verifier.verify("1245 Hayes Street", "San Francisco", "CA")
+        return upstream_while_open, candidates
+
+    upstream_while_open, candidates = run_with_stubs(monkeypatch, lookups, smarty_stub=stub)
+    assert upstream_while_open == 2
+    assert candidates[0]["components"]["zipcode"] == "94117"
+    assert resilience.get_breaker("smartystreets").state == "closed"
+
+
+def test_complete_address_is_accepted_unverified_while_smarty_is_down(monkeypatch):
+    stub = SmartyStub(error_rate=1.0)
+
+    async def validate():
+        results = [await validate_full_address("", address=dict(HAYES)) for _ in range(3)]
+        partial = await validate_full_address("", address={**HAYES, "zip": "", "missing_fields": ["zip"]})
+        return results, partial
+
+    results, partial = run_with_stubs(monkeypatch, validate, smarty_stub=stub)
+    assert all(result == ({field: HAYES[field] for field in ("street", "city", "state", "zip")}, True, "") for result in results)
+    assert stub.requests == 2
+    assert partial[1] is False
+
+
+def test_failing_llm_degrades_the_turn_and_then_fails_fast(monkeypatch):
+    stub = OpenAIStub(error_rate=1.0)
+
+    async def turns():
+        results = []
+        for _ in range(3):
+            result, _ = await on_transcript("it's the number on my file", phone_state())
+            results.append(result)
+        return results
+
+    results = run_with_stubs(monkeypatch, turns, openai_stub=stub)
+    assert all(result["degraded"] for result in results)
+    # The third turn never reached OpenAI
+    assert stub.requests == 2
+
+
+def test_availability_is_read_from_the_slot_list_when_the_llm_is_down(monkeypatch):
+    free_slots = "Dr. john, Monday 2025-08-18: 09:00-12:00\nDr. kim, Monday 2025-08-18: 13:00-17:00"
+
+    async def read_out():
+        return [sentence async for sentence in stream_appointments_in_natural_language(free_slots)]
+
+    sentences = run_with_stubs(monkeypatch, read_out, openai_stub=OpenAIStub(error_rate=1.0))
+    assert sentences == ["Dr. john, Monday 2025-08-18: 09:00-12:00.", "Dr. kim, Monday 2025-08-18: 13:00-17:00."]
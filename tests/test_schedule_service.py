@@ -0,0 +1,159 @@
+import asyncio
+import socket
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+import file_storage
+import schedule_service
+from config import config
+from file_storage import add_doctors_appointment, get_booked_intervals_by_doctor, get_free_slots, load_schedule
+from schedule_client import ScheduleClient, shard_for
+from schedule_service import ScheduleService
+
+
+def start_service(service: ScheduleService, address: str):
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    async def serve():
+        started = asyncio.Event()
+        task = asyncio.create_task(service.serve(address, started))
+        await started.wait()
+        ready.set()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=lambda: loop.run_until_complete(serve()), daemon=True)
+    thread.start()
+    ready.wait(5)
+    return loop, thread
+
+
+def stop_service(running):
+    loop, thread = running
+    for task in asyncio.all_tasks(loop):
+        loop.call_soon_threadsafe(task.cancel)
+    thread.join(5)
+
+
+def appointment(doctor, i):
+    start = datetime(2030, 1, 7, 9, 0) + timedelta(minutes=i * 10)
+    return {"doctor_name": doctor, "start": start.isoformat(), "end": (start + timedelta(minutes=10)).isoformat()}
+
+
+def test_bookings_through_the_service(tmp_path, monkeypatch):
+    for doctor in ("anna", "john"):
+        (tmp_path / f"{doctor}.json").write_text("")
+    monkeypatch.setattr(file_storage, "SCHEDULE_DIR", str(tmp_path))
+    direct_free = get_free_slots(datetime(2030, 1, 7, 9, 0), days=2)
+
+    address = f"unix:{tmp_path}/schedule.sock"
+    running = start_service(ScheduleService(str(tmp_path), flush_interval=0.01), address)
+    monkeypatch.setattr(config.scheduling, "service_address", address)
+    try:
+        assert get_free_slots(datetime(2030, 1, 7, 9, 0), days=2) == direct_free
+
+        async def book():
+            attempts = [appointment("john", i % 5) for i in range(15)]
+            return await asyncio.gather(*(add_doctors_appointment(a, "patient", "checkup") for a in attempts))
+
+        results = asyncio.run(book())
+        assert sum(booked for booked, _ in results) == 5
+        assert len(get_booked_intervals_by_doctor("john")["2030-01-07"]) == 1  # merged 9:00-9:50
+
+        free = get_free_slots(datetime(2030, 1, 7, 9, 0), days=1)
+        assert free["john"] == [(datetime(2030, 1, 7, 9, 50), datetime(2030, 1, 7, 17, 0))]
+        assert free["anna"] == direct_free["anna"][:1]
+    finally:
+        stop_service(running)
+
+    # Write-behind reached the schedule file
+    assert len(load_schedule(str(tmp_path / "john.json"))["2030-01-07"]) == 5
+
+
+def test_doctors_are_routed_to_their_shard(tmp_path, monkeypatch):
+    doctors = ["anna", "john", "kim", "lee", "maria", "omar"]
+    for doctor in doctors:
+        (tmp_path / f"{doctor}.json").write_text("")
+    addresses = [f"unix:{tmp_path}/shard{i}.sock" for i in range(2)]
+    services = [ScheduleService(str(tmp_path), i, 2, flush_interval=0) for i in range(2)]
+    running = [start_service(service, address) for service, address in zip(services, addresses)]
+    monkeypatch.setattr(config.scheduling, "service_address", ",".join(addresses))
+    try:
+        assert sorted(get_free_slots(datetime(2030, 1, 7, 9, 0), days=1)) == doctors
+        for doctor in doctors:
+            booked, _ = asyncio.run(add_doctors_appointment(appointment(doctor, 0), "patient", "checkup"))
+            assert booked
+        for i, service in enumerate(services):
+            assert service.bookings == sum(1 for doctor in doctors if shard_for(doctor, 2) == i)
+            assert set(service.doctors) == {doctor for doctor in doctors if shard_for(doctor, 2) == i}
+    finally:
+        for service in running:
+            stop_service(service)
+
+
+def test_repeated_booking_request_returns_the_first_result(tmp_path):
+    (tmp_path / "john.json").write_text("")
+    service = ScheduleService(str(tmp_path), flush_interval=0)
+    request = {
+        "op": "book", "request_id": "r1", "doctor": "john",
+        "start": "2030-01-07T09:00:00", "end": "2030-01-07T09:30:00",
+        "slot": {"available": False, "start": "09:00", "end": "09:30", "patient": "p", "reason": "checkup"},
+    }
+
+    async def book_twice():
+        return await service.handle_request(dict(request)), await service.handle_request(dict(request))
+
+    first, second = asyncio.run(book_twice())
+    assert first == second and first[0]
+    assert service.bookings == 1
+
+
+def test_timed_out_request_is_not_resent(tmp_path):
+    path = str(tmp_path / "stalled.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    received = []
+
+    def stall():
+        # Reads requests and never answers, like a service that booked and then hung
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            received.append(conn.makefile("rb").readline())
+
+    threading.Thread(target=stall, daemon=True).start()
+    client = ScheduleClient([f"unix:{path}"], timeout=0.2)
+    for _ in range(2):
+        # The second call runs on a fresh connection after the first one was dropped
+        with pytest.raises(TimeoutError):
+            client.book("john", datetime(2030, 1, 7, 9, 0), datetime(2030, 1, 7, 9, 30), {})
+    listener.close()
+    assert len(received) == 2
+
+
+def test_availability_cache_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(schedule_service, "MAX_CACHED_FREE_SLOTS", 3)
+    (tmp_path / "john.json").write_text("")
+    service = ScheduleService(str(tmp_path))
+
+    def ask(minute):
+        start = datetime(2030, 1, 7, 9, minute).isoformat()
+        return service.handle_request({"op": "free_slots", "start": start, "days": 1})
+
+    async def ask_each_minute():
+        first = await ask(0)
+        for minute in range(1, 10):
+            await ask(minute)
+            # The most recently used answer stays cached
+            assert await ask(0) is first
+
+    asyncio.run(ask_each_minute())
+    assert len(service._free_slots_cache) == 3
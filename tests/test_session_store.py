@@ -0,0 +1,55 @@
+import session_store
+from conversation import SessionState
+from session_store import MemorySessionStore, SqliteSessionStore
+
+
+def make_stores(tmp_path):
+    return [MemorySessionStore(), SqliteSessionStore(str(tmp_path / "sessions.db"))]
+
+
+def test_save_load_delete(tmp_path):
+    for store in make_stores(tmp_path):
+        session = SessionState(state="phone", name={"first_name": "rachel", "last_name": "taskale"})
+        store.save("room-1", session)
+        session.state = "email"
+
+        loaded = store.load("room-1")
+        assert loaded.state == "phone"
+        assert loaded.name == {"first_name": "rachel", "last_name": "taskale"}
+        assert store.load("room-2") is None
+
+        store.delete("room-1")
+        assert store.load("room-1") is None
+        store.close()
+
+
+def test_new_worker_resumes_from_last_checkpoint(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    worker = SqliteSessionStore(path)
+    session = SessionState()
+    for state, value in (("name", {"first_name": "rachel", "last_name": "taskale"}), ("insurance_payer", {"first_name": "john"})):
+        session[state] = value
+        session.state = session.next_state()
+        worker.save("room-1", session)
+    worker.close()
+
+    resumed = SqliteSessionStore(path).load("room-1")
+    assert resumed == session
+    assert resumed.state == "insurance_id"
+
+
+def test_expired_checkpoints_are_dropped(tmp_path):
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"))
+    store.save("room-1", SessionState())
+    assert store.expire(-1) == 1
+    assert store.load("room-1") is None
+
+
+def test_long_running_worker_expires_on_save(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, "EXPIRE_INTERVAL_SECONDS", 0)
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60)
+    store.save("room-1", SessionState())
+    store._conn.execute("UPDATE sessions SET updated_at = 0")
+    store.save("room-2", SessionState())
+    assert store.load("room-1") is None
+    assert store.load("room-2") is not None
@@ -0,0 +1,55 @@
+import pytest
+
+from spoken_forms import parse_email, parse_insurance_id, parse_phone
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("my phone number is 19177012642", "+19177012642"),
+    ("nine one seven seven zero one two six four two", "+19177012642"),
+    ("one nine one seven seven oh one two six four two", "+19177012642"),
+    ("it's 917-701-2642", "+19177012642"),
+    ("nine one seven dash seven zero one dash two six four two", "+19177012642"),
+    ("nine one seven seven zero one double six four two", "+19177016642"),
+    ("nine one seven", None),
+])
+def test_parse_phone(text, expected):
+    assert parse_phone(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("my email is racheltaskale@gmail.com", "racheltaskale@gmail.com"),
+    ("rachel at gmail dot com", "rachel@gmail.com"),
+    ("my email is rachel taskale at gmail dot com thanks", "racheltaskale@gmail.com"),
+    ("it's rachel dot taskale two at health dot co dot uk", "rachel.taskale2@health.co.uk"),
+    ("r t underscore nine at gmail dot com", "rt_9@gmail.com"),
+    ("my e-mail address is jsmith eighty four at outlook dot com", "jsmith84@outlook.com"),
+    ("it's kim nineteen at gmail dot com", "kim19@gmail.com"),
+    ("it's room four hundred at gmail dot com", None),
+    ("sure rachel at gmail dot com", "rachel@gmail.com"),
+    ("okay so rachel at gmail dot com", "rachel@gmail.com"),
+    ("rachel um taskale at gmail dot com", None),
+    ("let me think about it the one I use for work is at gmail dot com", None),
+    ("my email is rachel at gmail", None),
+    ("I don't have one", None),
+])
+def test_parse_email(text, expected):
+    assert parse_email(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("the member id is 123456723d", "123456723D"),
+    ("one two three d", "123D"),
+    ("it is a bee one two three four five", "B12345"),
+    ("it's a b c one two three four five", "ABC12345"),
+    ("it's a one two three four five", None),
+    ("it should be one two three four five", None),
+    ("let me see one two three four five", None),
+    ("I will read it to you one two three four five six", None),
+    ("my member id is bee one two three", "B123"),
+    ("it's letter bee see one two three", "BC123"),
+    ("it's b as in boy one two three", "B123"),
+    ("the id is 123456723d thanks", None),
+    ("I'm not sure", None),
+])
+def test_parse_insurance_id(text, expected):
+    assert parse_insurance_id(text) == expected
@@ -0,0 +1,91 @@
+import asyncio
+import gzip
+import os
+
+from transcript_writer import TranscriptWriter
+
+
+def test_lines_are_buffered_until_flush(tmp_path):
+    writer = TranscriptWriter(str(tmp_path), max_bytes=1 << 20)
+    writer.append("CA1", "user: hello")
+    writer.append("CA1", "assistant: hi")
+    writer.append("CA2", "user: other call")
+    assert not os.path.exists(writer.path_for("CA1"))
+    assert writer.stats()["buffered_lines"] == 3
+
+    writer.flush_sync()
+    with open(writer.path_for("CA1")) as f:
+        assert f.read() == "user: hello\nassistant: hi\n"
+    with open(writer.path_for("CA2")) as f:
+        assert f.read() == "user: other call\n"
+    assert writer.stats() == {"buffered_lines": 0, "lines_written": 3, "flushes": 1, "rotations": 0}
+
+
+def test_rotates_on_size_and_compresses(tmp_path):
+    writer = TranscriptWriter(str(tmp_path), max_bytes=20)
+    writer.append("CA1", "a" * 30)
+    writer.flush_sync()
+    writer.append("CA1", "b" * 30)
+    writer.flush_sync()
+
+    assert not os.path.exists(writer.path_for("CA1"))
+    with gzip.open(tmp_path / "CA1_transcript.1.txt.gz", "rt") as f:
+        assert f.read() == "a" * 30 + "\n"
+    with gzip.open(tmp_path / "CA1_transcript.2.txt.gz", "rt") as f:
+        assert f.read() == "b" * 30 + "\n"
+    assert writer.rotations == 2
+
+
+def test_rotates_on_age_without_compression(tmp_path):
+    writer = TranscriptWriter(str(tmp_path), max_age_seconds=0, compress=False)
+    writer.append("CA1", "hello")
+    writer.flush_sync()
+    with open(tmp_path / "CA1_transcript.1.txt") as f:
+        assert f.read() == "hello\n"
+
+
+def test_background_flush_and_close_session(tmp_path):
+    async def run():
+        writer = TranscriptWriter(str(tmp_path), flush_interval=0.01)
+        task = writer.ensure_started()
+        assert writer.ensure_started() is task
+        writer.append("CA1", "user: hello")
+        await asyncio.sleep(0.1)
+        with open(writer.path_for("CA1")) as f:
+            assert f.read() == "user: hello\n"
+
+        writer.append("CA1", "assistant: bye")
+        await writer.close_session("CA1")
+        assert not os.path.exists(writer.path_for("CA1"))
+        with gzip.open(tmp_path / "CA1_transcript.1.txt.gz", "rt") as f:
+            assert f.read() == "user: hello\nassistant: bye\n"
+
+        # Lines still buffered at shutdown are written when the flusher is cancelled
+        writer.append("CA2", "user: late line")
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        with open(writer.path_for("CA2")) as f:
+            assert f.read() == "user: late line\n"
+
+    asyncio.run(run())
+
+
+def test_lines_racing_close_session_are_rotated_out(tmp_path):
+    writer = TranscriptWriter(str(tmp_path), compress=False)
+    writer.append("CA1", "user: hello")
+    # A flush took the line but hasn't written it when the call ends
+    in_flight = writer._take_pending()
+    asyncio.run(writer.close_session("CA1"))
+    writer._write(in_flight)
+    assert not os.path.exists(writer.path_for("CA1"))
+
+    # And a line appended after the close
+    writer.append("CA1", "assistant: bye")
+    writer.flush_sync()
+    assert not os.path.exists(writer.path_for("CA1"))
+    rotated = sorted(os.listdir(tmp_path))
+    assert rotated == ["CA1_transcript.1.txt", "CA1_transcript.2.txt"]
+    assert (tmp_path / "CA1_transcript.1.txt").read_text() == "user: hello\n"
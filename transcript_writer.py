@@ -0,0 +1,156 @@
+import asyncio
+import gzip
+import os
+import shutil
+import threading
+import time
+
+from config import config
+from log import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranscriptWriter:
+    """
+    Buffered transcript sink. append() only adds the line to the session's in-memory buffer;
+    a background task writes every session's pending lines once per flush_interval, with one
+    open/write/close per session instead of one per utterance.
+
+    Each session writes to {directory}/{sid}_transcript.txt. Once that file reaches max_bytes
+    or is older than max_age_seconds it is rotated to {sid}_transcript.{n}.txt, gzipped when
+    compress is on.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = 1.0, max_bytes: int = 1024 * 1024,
+                 max_age_seconds: float = 3600, compress: bool = True):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.compress = compress
+        self._pending = {}
+        self._opened_at = {}
+        # sid -> time its call ended; lines that arrive for it later are rotated out right away
+        self._closed = {}
+        self._lock = threading.Lock()
+        # Held by whichever thread touches the files
+        self._write_lock = threading.RLock()
+        self._task = None
+        self.lines_written = 0
+        self.flushes = 0
+        self.rotations = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, sid: str) -> str:
+        return os.path.join(self.directory, f"{sid}_transcript.txt")
+
+    def append(self, sid: str, text: str):
+        with self._lock:
+            self._pending.setdefault(sid, []).append(text + "\n")
+
+    def _take_pending(self) -> dict:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    def _rotate(self, sid: str, path: str):
+        n = 1
+        while any(os.path.exists(f"{path[:-4]}.{n}.txt{suffix}") for suffix in ("", ".gz")):
+            n += 1
+        rotated = f"{path[:-4]}.{n}.txt"
+        os.replace(path, rotated)
+        if self.compress:
+            with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.unlink(rotated)
+        self._opened_at.pop(sid, None)
+        self.rotations += 1
+
+    def _write(self, pending: dict):
+        with self._write_lock:
+            now = time.time()
+            for sid, lines in pending.items():
+                path = self.path_for(sid)
+                with open(path, "a") as f:
+                    f.writelines(lines)
+                    size = f.tell()
+                self._opened_at.setdefault(sid, now)
+                self.lines_written += len(lines)
+                if sid in self._closed or size >= self.max_bytes or now - self._opened_at[sid] >= self.max_age_seconds:
+                    self._rotate(sid, path)
+            self.flushes += 1
+
+    def flush_sync(self):
+        """Write everything buffered so far from the calling thread."""
+        pending = self._take_pending()
+        if pending:
+            self._write(pending)
+
+    async def flush(self):
+        pending = self._take_pending()
+        if pending:
+            await asyncio.to_thread(self._write, pending)
+
+    def _close_session(self, sid: str):
+        with self._write_lock:
+            # A flush that took this session's lines before us has written them by now
+            with self._lock:
+                lines = self._pending.pop(sid, [])
+            now = time.time()
+            self._closed = {closed: at for closed, at in self._closed.items() if now - at < self.max_age_seconds}
+            self._closed[sid] = now
+            if lines or os.path.exists(self.path_for(sid)):
+                self._write({sid: lines})
+
+    async def close_session(self, sid: str):
+        """
+        Flush the session's last lines and rotate its file, the call is over. Lines that
+        still arrive for it are written and rotated out on the next flush.
+        """
+        await asyncio.to_thread(self._close_session, sid)
+
+    async def run(self):
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                try:
+                    await self.flush()
+                except OSError as e:
+                    logger.error("failed to write transcripts", extra={"error": str(e)})
+        finally:
+            # Last lines on shutdown; the loop may already be going away, so write inline
+            self.flush_sync()
+
+    def ensure_started(self):
+        """Start the background flusher on the running loop, once per process."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = sum(len(lines) for lines in self._pending.values())
+        return {
+            "buffered_lines": buffered,
+            "lines_written": self.lines_written,
+            "flushes": self.flushes,
+            "rotations": self.rotations,
+        }
+
+
+_transcript_writer = None
+
+
+def get_transcript_writer() -> TranscriptWriter:
+    global _transcript_writer
+    if _transcript_writer is None:
+        transcript_config = config.transcripts
+        _transcript_writer = TranscriptWriter(
+            transcript_config.directory,
+            flush_interval=transcript_config.flush_interval,
+            max_bytes=transcript_config.max_bytes,
+            max_age_seconds=transcript_config.max_age_seconds,
+            compress=transcript_config.compress,
+        )
+    return _transcript_writer
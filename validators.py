@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime
 import json
 import os
@@ -5,11 +6,14 @@ import re
 from config import config
 
 import requests
-from openai import OpenAI
+from address_verifier import AddressVerificationError, get_address_verifier
+import model_router
+from resilience import CircuitOpenError, DeadlineExceeded, get_breaker, timeout_for
 
-client = OpenAI()
+from file_storage import get_booked_intervals_by_doctor, has_conflict, is_within_working_hours
+from log import get_logger
 
-from file_storage import get_doctors_appointments_by_day_and_doctor
+logger = get_logger(__name__)
 
 PHONE_REGEX = re.compile(r"^\+1\d{10}$")
 INSURANCE_REGEX = re.compile(r"\b[A-Z0-9]{5,15}\b", re.IGNORECASE)
@@ -17,8 +21,6 @@ EMAIL_REGEX = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
 
 
 async def validate_regex(text: str, v_type: str):
-    print(f"validate_regex: {v_type}, {text}")
-    
     match v_type:
         case 'phone':
             found = re.search(PHONE_REGEX, text)
@@ -40,7 +42,6 @@ async def validate_regex(text: str, v_type: str):
         case 'topic_of_call':
             return text, True, ""
         case 'name' | 'insurance_payer':
-            print("in name case")
             try:
                 import json
                 if text.startswith('{'):
@@ -58,33 +59,106 @@ async def validate_regex(text: str, v_type: str):
         case _:
             return "", False, f"Unknown validation type: {v_type}"
 
-# Function to extract the address into json format
-def extract_and_check_address_with_openai(raw_input: str) -> dict:
+ADDRESS_FIELDS = ("street", "city", "state", "zip")
+# Structured output: the reply always parses and always carries every field
+ADDRESS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "address",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "street": {"type": "string", "description": "House number and street name with suffix, e.g. \"1245 Hayes Street\""},
+                "unit": {"type": "string", "description": "Apartment or suite, e.g. \"Apt 4B\""},
+                "city": {"type": "string"},
+                "state": {"type": "string", "description": "Two-letter abbreviation, e.g. \"CA\""},
+                "zip": {"type": "string", "description": "5-digit ZIP code"},
+                "missing_fields": {"type": "array", "items": {"type": "string", "enum": list(ADDRESS_FIELDS)}},
+            },
+            "required": ["street", "unit", "city", "state", "zip", "missing_fields"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# on_transcript and the buffer_address_input tool both see the caller's address utterance;
+# concurrent requests for the same text share one round trip
+_address_requests = {}
+
+
+async def _extract_address(raw_input: str):
     prompt = f"""
-        You are a medical office assistant extracting structured address information from patient speech.
+        You are a medical office assistant extracting normalized address components from patient speech.
 
-        Your job is to extract only what the user explicitly says. Do not guess or make up address parts.
-        If something is not clearly stated, leave it blank and include it in the "missingFields" list.
+        Extract only what the caller explicitly says. Do not guess or make up address parts: leave a
+        component empty and list it in missing_fields when it is not clearly stated.
+        Convert spelled-out numbers to digits ("twelve forty-five" -> "1245"), fix obvious transcription
+        typos in street and city names, spell out street suffixes and use the two-letter state code.
+        Transcript: "{raw_input}"
+    """
+    content = await model_router.complete(
+        "address", [{"role": "user", "content": prompt}], response_format=ADDRESS_RESPONSE_FORMAT,
+    )
+    try:
+        extracted = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    address = {field: str(extracted.get(field) or "").strip() for field in (*ADDRESS_FIELDS, "unit")}
+    missing = set(extracted.get("missing_fields") or []) & set(ADDRESS_FIELDS)
+    address["missing_fields"] = [field for field in ADDRESS_FIELDS if field in missing or not address[field]]
+    return address
 
-        Required fields:
-        - "street": street number and name (e.g., "1245 Hayes Street")
-        - "city": city name
-        - "state": two-letter abbreviation (e.g., "CA")
-        - "zip": 5-digit ZIP code
-        - "status": "VALID" if all fields are present, "INCOMPLETE" otherwise
-        - "missingFields": a list of any fields that are missing or unclear
 
-        Only respond with a strict JSON object. Do not invent or assume any part of the address.
-        Convert spelled-out numbers to digits (e.g., "twelve forty-five" → "1245").
-        Transcript: "{raw_input}"
+async def extract_address(raw_input: str):
     """
+    One structured-output call: {"street", "unit", "city", "state", "zip", "missing_fields"},
+    or None if the model's reply couldn't be parsed.
+    """
+    key = " ".join(raw_input.split())
+    task = _address_requests.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_extract_address(key))
+        _address_requests[key] = task
+        task.add_done_callback(lambda _: _address_requests.pop(key, None))
+    return await asyncio.shield(task)
+
+
+class AddressHandoff:
+    """
+    Passes the address the buffer_address_input tool settled on to the on_transcript turn
+    for the same utterance. The tool gets the LLM's copy of the utterance, not the
+    transcript, so the in-flight dedupe above can't pair the two extractions.
+
+        wait = handoff.expect(timeout)   # when the utterance reaches the address step
+        handoff.offer(address)           # in the tool; None when it extracted nothing
+        address = await wait             # None if the tool offered nothing in time
+    """
+
+    def __init__(self):
+        self._future = None
 
-    response = client.chat.completions.create(model="gpt-4",
-    messages=[{"role": "user", "content": prompt}])
-    print(f"response from openai: {response}")
+    def expect(self, timeout: float):
+        future = self._future = asyncio.get_running_loop().create_future()
+        return self._wait(future, timeout)
 
-    json_text = response.choices[0].message.content.strip()
-    return json_text
+    def offer(self, address):
+        if self._future is not None and not self._future.done():
+            self._future.set_result(address)
+
+    @staticmethod
+    async def _wait(future, timeout: float):
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def format_address(address: dict) -> str:
+    """'1245 Hayes Street Apt 4B, San Francisco, CA 94117', skipping missing components."""
+    street = " ".join(filter(None, [address.get("street"), address.get("unit")]))
+    region = " ".join(filter(None, [address.get("state"), address.get("zip")]))
+    return ", ".join(filter(None, [street, address.get("city"), region]))
 
 
 # Function to take extracted address and validate with external api to check that address actually exists
@@ -103,7 +177,17 @@ def validate_address_with_smarty(street, city, state, zip_code=None):
     if zip_code:
         params["zipcode"] = zip_code
 
-    response = requests.get("https://us-street.api.smartystreets.com/street-address", params=params)
+    try:
+        with get_breaker("smartystreets").guard((requests.RequestException,)):
+            response = requests.get(
+                f"{config.smartystreets.base_url}/street-address", params=params,
+                timeout=timeout_for(config.smartystreets.timeout, "smartystreets"),
+            )
+            if response.status_code >= 500:
+                response.raise_for_status()
+    except (requests.RequestException, CircuitOpenError, DeadlineExceeded) as e:
+        logger.warning("address verification failed", extra={"error": str(e)})
+        return False, None
     data = response.json()
 
     if response.status_code == 200 and len(data) > 0:
@@ -114,27 +198,34 @@ def validate_address_with_smarty(street, city, state, zip_code=None):
 
 
 
-async def validate_full_address(raw_input):
-    result = extract_and_check_address_with_openai(raw_input)
-    print(result)
-
-    try:
-        address = json.loads(result)
-    except json.JSONDecodeError:
+async def validate_full_address(raw_input, address: dict = None):
+    """Verify the address in raw_input, or an already extracted one (see extract_address)."""
+    if address is None:
+        address = await extract_address(raw_input)
+    if address is None:
         return None, False, "Sorry, I couldn't understand the address. Please repeat it."
 
-    is_valid, smarty_response = validate_address_with_smarty(
-        address.get("street", ""),
-        address.get("city", ""),
-        address.get("state", ""),
-        address.get("zip", "")
-    )
-
-    if not is_valid or not smarty_response.json():
+    try:
+        candidates = await get_address_verifier().verify(
+            address.get("street", ""),
+            address.get("city", ""),
+            address.get("state", ""),
+            address.get("zip", "")
+        )
+    except (AddressVerificationError, CircuitOpenError, DeadlineExceeded) as e:
+        if address.get("missing_fields"):
+            logger.warning("address verification failed", extra={"error": str(e)})
+            return None, False, "Sorry, I couldn't verify the address right now. Please repeat it."
+        # SmartyStreets is down or slow: a complete address is taken as heard rather than
+        # holding the caller
+        logger.warning("address accepted unverified", extra={"error": str(e)})
+        return {field: address[field] for field in ADDRESS_FIELDS}, True, ""
+
+    if not candidates:
         return None, False, "Address not found, please enter a valid address"
 
-    components = smarty_response.json()[0]["components"]
-    missing = address.get("missingFields", [])
+    components = candidates[0]["components"]
+    missing = address.get("missing_fields", [])
 
     if "city" in missing:
         address["city"] = components.get("city_name", "")
@@ -163,9 +254,6 @@ async def validate_full_address(raw_input):
 
 
 async def validate_appointment_time(data: dict):
-    print("validate_appointment_time")
-    # get the date from the start and end times:
-    appointments_on_date = get_doctors_appointments_by_day_and_doctor(data)
     start_dt = datetime.fromisoformat(data["start"])
     end_dt = datetime.fromisoformat(data["end"])
     
@@ -173,12 +261,11 @@ async def validate_appointment_time(data: dict):
     duration = end_dt - start_dt
     if (duration.seconds // 60) >= 60:
         return False, "Invalid appointment duration, can't schedule an appointment with a doctor for more than 1 hour"
-    if appointments_on_date:
-        for i in appointments_on_date:
-                start_time_in_between = i["start_date"] <=  input["start"] and i["start_date"] >=  input["end"]
-                end_time_in_between = i["end_date"] <=  input["start"] and i["end_date"] >=  input["end"]
-                exsiting_time_booked = i["start_date"] >=   input["start"] and i["end_date"] <=  input["end"]
-                if start_time_in_between or end_time_in_between or exsiting_time_booked :
-                    return False, "Appointment time is already booked, choose a different doctor"
+    if not is_within_working_hours(start_dt, end_dt):
+        return False, "Appointments can only be scheduled between 9am and 5pm EST"
+    # A blocking socket request in service mode, so it runs off the event loop
+    booked = await asyncio.to_thread(get_booked_intervals_by_doctor, data["doctor_name"])
+    booked_on_date = booked.get(start_dt.date().isoformat(), [])
+    if has_conflict(booked_on_date, start_dt, end_dt):
+        return False, "Appointment time is already booked, choose a different doctor"
     return True, ""
-